@@ -0,0 +1,66 @@
+import multiprocessing
+
+
+class WorkerSampling():
+    # Used inside a forked worker. Asks the parent process to start/stop the
+    # memory sampler, so that the sampler itself is not part of the worker's
+    # cgroup and doesn't count towards its memory limit.
+    def __init__(self, pipe):
+        self.pipe = pipe
+
+    def start(self, query_name, run):
+        # returns the run_id of the sampler
+        self.pipe.send(('start', query_name, run))
+        return self.pipe.recv()
+
+    def stop(self, handle):
+        # returns the peak RSS the sampler saw
+        self.pipe.send(('stop',))
+        return self.pipe.recv()
+
+    def run_id(self, handle):
+        return handle
+
+
+def run_in_cgroup_worker(target, cgroup, start_sampler, stop_sampler):
+    # Forks a worker that runs target(WorkerSampling). The worker is moved to
+    # the cgroup before it does any work, so everything it allocates is
+    # charged to (and limited by) the cgroup.
+    # start_sampler(query_name, run, pid) / stop_sampler(sampler) run in this process.
+    # the run_id of the started sampler and the result of stop_sampler are sent back to the worker.
+    parent_pipe, child_pipe = multiprocessing.Pipe()
+
+    def worker_main():
+        # wait until we are in the cgroup
+        child_pipe.recv()
+        target(WorkerSampling(child_pipe))
+
+    worker = multiprocessing.get_context('fork').Process(target=worker_main, name="duckdb_cgroup_worker")
+    worker.start()
+    cgroup.add_pid(worker.pid)
+    parent_pipe.send('go')
+
+    sampler = None
+    while True:
+        if not parent_pipe.poll(0.1):
+            if not worker.is_alive():
+                break
+            continue
+        try:
+            message = parent_pipe.recv()
+        except EOFError:
+            break
+        reply = 'ok'
+        if message[0] == 'start':
+            sampler = start_sampler(message[1], message[2], worker.pid)
+            reply = sampler.run_id
+        elif message[0] == 'stop':
+            reply = stop_sampler(sampler)
+            sampler = None
+        parent_pipe.send(reply)
+
+    # the worker died while it was being sampled (e.g. oom killed)
+    if sampler is not None:
+        stop_sampler(sampler)
+    worker.join()
+    return worker.exitcode
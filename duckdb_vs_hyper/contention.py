@@ -0,0 +1,219 @@
+import threading
+import time
+import tomllib
+import duckdb
+
+from outcomes import classify_error
+from workload import parse_workload
+
+CONTENTION_SYSTEMS = ['duckdb', 'hyper', 'postgres']
+# every system first runs alone (solo), then all systems run at the same time (contention)
+CONTENTION_PHASES = ['solo', 'contention']
+DEFAULT_CONTENTION_DURATION = 60
+# seconds between two phases, so the page cache and hyperd settle
+DEFAULT_CONTENTION_COOLDOWN = 10
+
+CONTENTION_SLOWDOWN_SQL = """
+INSERT INTO contention_slowdown
+WITH per_query AS (
+    SELECT r.system, q.query_tag,
+        count(*) FILTER (WHERE r.run_type = 'solo') AS solo_queries,
+        avg(q.runtime) FILTER (WHERE r.run_type = 'solo') AS solo_runtime,
+        count(*) FILTER (WHERE r.run_type = 'contention') AS contention_queries,
+        avg(q.runtime) FILTER (WHERE r.run_type = 'contention') AS contention_runtime
+    FROM contention_queries q JOIN runs r USING (run_id)
+    WHERE q.outcome = 'success' AND r.benchmark_name = ? AND r.benchmark = ? AND r.query_name = ?
+    GROUP BY r.system, q.query_tag
+)
+SELECT ?, ?, ?, system, query_tag, solo_queries, solo_runtime, contention_queries, contention_runtime, contention_runtime / solo_runtime
+FROM per_query
+UNION ALL
+-- one row per system over all of its queries, the slowdown is the geometric mean of the slowdowns of its queries
+SELECT ?, ?, ?, system, NULL, sum(solo_queries), NULL, sum(contention_queries), NULL, exp(avg(ln(contention_runtime / solo_runtime)))
+FROM per_query
+GROUP BY system
+"""
+
+
+class ContentionTenant():
+    # one system of a contention run. memory_limit (GB) applies to duckdb and
+    # hyper, work_mem (MB) to postgres. workload has the query streams of its
+    # connections.
+    def __init__(self, system, memory_limit, work_mem, workload):
+        self.system = system
+        self.memory_limit = memory_limit
+        self.work_mem = work_mem
+        self.workload = workload
+
+
+class ContentionSpec():
+    def __init__(self, path, name, duration, cooldown, solo, seed, systems):
+        self.path = path
+        self.name = name
+        self.duration = duration
+        self.cooldown = cooldown
+        self.solo = solo
+        self.seed = seed
+        # the [[systems]] tables of the file, the streams are parsed per benchmark
+        self.systems = systems
+
+    def get_tenants(self, benchmark, get_query_file_names, memory_limit, work_mem):
+        # memory_limit and work_mem are the defaults for systems that don't set their own
+        tenants = []
+        for i, system in enumerate(self.systems):
+            # the seeds of the systems don't overlap, every connection has its own
+            seed = self.seed + 1000 * i if self.seed is not None else None
+            workload = parse_workload({'workload': {'seed': seed}, 'streams': system['streams']}, self.path, get_query_file_names, benchmark)
+            tenants.append(ContentionTenant(system['system'], system.get('memory_limit', memory_limit), system.get('work_mem', work_mem), workload))
+        return tenants
+
+    def get_max_connections(self, system):
+        return max([sum([stream.get('connections', 1) for stream in spec['streams']]) for spec in self.systems if spec['system'] == system], default=0)
+
+
+def load_contention(path):
+    # [contention]
+    # name = "tpch-colocated"    # query_name of the runs, default contention
+    # duration = 120             # seconds every phase runs
+    # cooldown = 10              # seconds between phases
+    # solo = true                # run every system alone first, for the slowdown
+    # seed = 1
+    # [[systems]]
+    # system = "duckdb"
+    # memory_limit = 32          # GB, default --memory_limit
+    # [[systems.streams]]        # streams as in a workload file (see workload.py)
+    # connections = 4
+    # mix = [{ queries = ["q09.sql", "q18.sql"] }]   # benchmark defaults to --benchmark
+    with open(path, "rb") as f:
+        spec = tomllib.load(f)
+    settings = spec.get('contention', {})
+    systems = spec.get('systems', [])
+    if len(systems) == 0:
+        raise ValueError(f"contention {path} has no [[systems]]")
+    for i, system in enumerate(systems):
+        if system.get('system') not in CONTENTION_SYSTEMS:
+            raise ValueError(f"system {i} of contention {path} must be one of {CONTENTION_SYSTEMS}")
+        if len(system.get('streams', [])) == 0:
+            raise ValueError(f"system {system['system']} of contention {path} has no [[systems.streams]]")
+        for j, stream in enumerate(system['streams']):
+            stream.setdefault('name', system['system'] if len(system['streams']) == 1 else f"{system['system']}_{j}")
+    names = [system['system'] for system in systems]
+    if len(set(names)) != len(names):
+        raise ValueError(f"every system can only be in contention {path} once")
+    duration = settings.get('duration', DEFAULT_CONTENTION_DURATION)
+    if duration <= 0:
+        raise ValueError(f"duration of contention {path} must be greater than 0")
+    return ContentionSpec(path, settings.get('name', 'contention'), duration, settings.get('cooldown', DEFAULT_CONTENTION_COOLDOWN),
+                          settings.get('solo', True), settings.get('seed'), systems)
+
+
+class DuckDBContentionConnection():
+    def __init__(self, con):
+        self.con = con
+
+    def execute(self, query):
+        # con.sql() returns None for statements without a result (create table ans as ...)
+        self.con.execute(query)
+
+    def cancel(self):
+        self.con.interrupt()
+
+    def close(self):
+        self.con.close()
+
+
+class HyperContentionConnection():
+    def __init__(self, con):
+        self.con = con
+
+    def execute(self, query):
+        self.con.execute_command(query)
+
+    def cancel(self):
+        self.con.cancel()
+
+    def close(self):
+        self.con.close()
+
+
+class PostgresContentionConnection():
+    # connection is a pooled PostgresConnection, it goes back to the pool instead of being closed
+    def __init__(self, connection):
+        self.connection = connection
+
+    def execute(self, query):
+        self.connection.cursor.execute(query)
+
+    def cancel(self):
+        # sends a cancel request for the running query to the postmaster
+        self.connection.con.cancel()
+
+    def close(self):
+        pass
+
+
+class ContentionClient(threading.Thread):
+    # Runs the queries of its stream on one connection until it is stopped.
+    # connection has execute(query), cancel() and close(). Every query is
+    # recorded with its start and end on the monotonic clock, the same clock
+    # the samplers use, so the queries of all systems line up with the samples.
+    # A query that is still running when the phase ends is cancelled and
+    # recorded as cancelled.
+    def __init__(self, name, connection, queries, query_tags, stream):
+        threading.Thread.__init__(self, name=name)
+        self._stop_event = threading.Event()
+        self.connection = connection
+        self.queries = queries
+        self.query_tags = query_tags
+        self.stream = stream
+        # (query tag, start, end, outcome)
+        self.executions = []
+
+    def stop(self):
+        self._stop_event.set()
+        try:
+            self.connection.cancel()
+        except Exception as e:
+            print(f"Error: {self.name} could not cancel its query: {e}")
+
+    def run(self):
+        if self._stop_event.wait(self.stream.start_offset):
+            return
+        while not self._stop_event.is_set():
+            query = self.stream.next_query()
+            start = time.monotonic_ns()
+            outcome = 'success'
+            try:
+                self.connection.execute(self.queries[query])
+            except Exception as e:
+                outcome = 'cancelled' if self._stop_event.is_set() else classify_error(e).outcome
+                if outcome != 'cancelled':
+                    print(f"Error: {self.name} failed: {e}")
+            self.executions.append((self.query_tags[query], start, time.monotonic_ns(), outcome))
+            if outcome == 'killed':
+                # the engine is gone, every further query would fail right away
+                break
+            self._stop_event.wait(self.stream.get_think_time())
+
+
+def write_contention_queries(data_db, run_id, clients):
+    con = duckdb.connect(data_db)
+    rows = []
+    for client in clients:
+        for query_tag, start, end, outcome in client.executions:
+            rows.append([run_id, client.name, query_tag, start, end, (end - start) / 1000000000, outcome])
+    if len(rows) > 0:
+        con.executemany("INSERT INTO contention_queries VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    con.close()
+
+
+def write_contention_slowdown(data_db, benchmark_name, benchmark, name):
+    # slowdown of every query and system under contention against its solo run.
+    # queries without a successful solo and contention run have no slowdown.
+    identifiers = [benchmark_name, benchmark, name]
+    con = duckdb.connect(data_db)
+    con.execute("DELETE FROM contention_slowdown WHERE benchmark_name = ? AND benchmark = ? AND contention_name = ?", identifiers)
+    con.execute(CONTENTION_SLOWDOWN_SQL, identifiers * 3)
+    con.sql("""SELECT system, query_tag, solo_queries, solo_runtime, contention_queries, contention_runtime, slowdown FROM contention_slowdown
+               WHERE benchmark_name = ? AND benchmark = ? AND contention_name = ? ORDER BY system, query_tag NULLS FIRST""", params=identifiers).show(max_rows=1000)
+    con.close()
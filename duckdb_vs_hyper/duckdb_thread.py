@@ -1,55 +1,24 @@
-import duckdb
 import threading
 import time
 
+from workload import QueryStream
 
-class QueryPerformance():
-    def __init__(self, query_number, execution_time, thread_name):
-        self.query_number = query_number
-        self.execution_time = execution_time
-        self.thread_name = thread_name
-
-    def get_header():
-        return "thread_name,query_number,execution_time"
-    
-    def __str__(self):
-        return f"{self.thread_name},{self.query_number},{self.execution_time}"
-
-class ThreadPerformance():
-    def __init__(self, thread_name):
-        self.thread_name = thread_name
-        self.stats = []
-
-    def add_execution(self, query_number, execution_time):
-        self.stats.append(QueryPerformance(query_number, execution_time, self.thread_name))
-
-    def dump_performance(self):
-        con = duckdb.connect()
-        csv_results = QueryPerformance.get_header() + "\n"
-        for stat in self.stats:
-            csv_results += str(stat) + "\n"
-
-        csv_file_name = f"{self.thread_name}_performance.csv"
-        with open(csv_file_name, "w+") as f:
-            f.write(csv_results)
-
-        csv_columns = "columns = { \
-            'thread_name' : 'VARCHAR', \
-            'query_number': 'VARCHAR', \
-            'execution_time': 'DOUBLE' \
-        }"
-        con.sql(f"copy (SELECT * FROM read_csv('{csv_file_name}', {csv_columns})) to '{csv_file_name.replace('.csv', '.parquet')}' (FORMAT PARQUET)")
-        con.close()
 
 class duckdb_thread(threading.Thread):
-    def __init__(self, name, con, continuous, queries):
+    # Runs the queries of its stream on its connection until stopped (or one
+    # query if not continuous). Without a stream the queries run one after the
+    # other. The latency of every query goes to the LatencyRecorder under the
+    # tag of the query.
+    def __init__(self, name, con, continuous, queries, query_tags, recorder, stream=None):
         threading.Thread.__init__(self)
         self._stop_event = threading.Event()
         self.name = name
         self.con = con
         self.continuous = continuous
         self.queries = queries
-        self.performance = ThreadPerformance(self.name.strip())
+        self.query_tags = query_tags
+        self.recorder = recorder
+        self.stream = stream if stream is not None else QueryStream(name, len(queries))
         if len(self.queries) == 0:
             print("you must pass at least 1 query to a duckdb_thread")
             exit(1)
@@ -57,30 +26,24 @@ class duckdb_thread(threading.Thread):
     def stop(self):
         self._stop_event.set()
 
+    def run_query(self, query):
+        start = time.perf_counter_ns()
+        self.con.sql(self.queries[query]).execute()
+        self.recorder.record(self.query_tags[query], start, time.perf_counter_ns())
 
     def run(self):
         try:
+            if self._stop_event.wait(self.stream.start_offset):
+                return
             if not self.continuous:
-                query = self.queries[0]
-                start = time.time()
-                self.con.sql(query).execute()
-                end = time.time()
-                self.performance.add_execution(0, round(end-start, 2))
+                self.run_query(self.stream.next_query())
             else:
-                num_queries = len(self.queries)
-                i = 0
-                while(i < 10000000):
-                    query = self.queries[i % num_queries]
-                    start = time.time()
-                    self.con.sql(query).execute()
-                    end = time.time()
-                    self.performance.add_execution(i, round(end-start, 2))
-                    if self._stop_event.is_set():
-                        break 
-                    i+=1
-            self.performance.dump_performance()
+                while not self._stop_event.is_set():
+                    self.run_query(self.stream.next_query())
+                    self._stop_event.wait(self.stream.get_think_time())
         except Exception as e:
             print(f"{self.name} raised an exception")
             print(f"{e}")
         finally:
+            self.recorder.close(time.perf_counter_ns())
             print(f"{self.name} finished")
@@ -0,0 +1,114 @@
+import time
+import fnmatch
+import itertools
+import tomllib
+
+from outcomes import SKIPPED
+
+DEFAULT_MAX_ATTEMPTS = 2
+
+# dimension of the matrix -> default if the experiment file doesn't set it
+MATRIX_DEFAULTS = {
+    'systems': None,
+    'benchmarks': None,
+    'queries': ['*'],
+    'memory_limits': [0],
+    'connections': [1],
+    'threads': [0],
+    'work_mem': [0],
+    'hash_mem_multiplier': [0],
+}
+# dimensions that only apply to postgres, the other systems run them once with 0
+POSTGRES_DIMENSIONS = ['work_mem', 'hash_mem_multiplier']
+
+
+class ExperimentCell():
+    # one combination of the experiment matrix. memory_limit in GB, 0 means no
+    # limit. threads 0 means the default of the system. work_mem (MB) and
+    # hash_mem_multiplier are postgres session settings, 0 keeps the server default.
+    def __init__(self, benchmark, query_file, system, memory_limit, connections, threads, work_mem=0, hash_mem_multiplier=0):
+        self.benchmark = benchmark
+        self.query_file = query_file
+        self.system = system
+        self.memory_limit = memory_limit
+        self.connections = connections
+        self.threads = threads
+        self.work_mem = work_mem
+        self.hash_mem_multiplier = hash_mem_multiplier
+
+    def key(self):
+        return [self.benchmark, self.query_file, self.system, self.memory_limit, self.connections, self.threads, self.work_mem, self.hash_mem_multiplier]
+
+    def __str__(self):
+        description = f"{self.system} {self.benchmark}/{self.query_file} memory_limit={self.memory_limit}GB connections={self.connections} threads={self.threads}"
+        if self.system == "postgres":
+            description += f" work_mem={self.work_mem}MB hash_mem_multiplier={self.hash_mem_multiplier}"
+        return description
+
+
+def load_experiment(path):
+    # [experiment]
+    # benchmark_name = "jan-1-memory-limits"
+    # max_attempts = 2
+    # [matrix]
+    # systems = ["duckdb", "hyper"]
+    # benchmarks = ["tpch"]
+    # queries = ["q0*.sql"]
+    # memory_limits = [10, 20]
+    # connections = [1, 4]
+    # threads = [0]
+    # work_mem = [0, 64, 1024]
+    # hash_mem_multiplier = [0]
+    with open(path, "rb") as f:
+        experiment = tomllib.load(f)
+    settings = experiment.get('experiment', {})
+    settings.setdefault('max_attempts', DEFAULT_MAX_ATTEMPTS)
+    matrix = experiment.get('matrix', {})
+    for dimension, default in MATRIX_DEFAULTS.items():
+        if dimension not in matrix:
+            if default is None:
+                raise ValueError(f"experiment {path} has no matrix.{dimension}")
+            matrix[dimension] = default
+        if not isinstance(matrix[dimension], list) or len(matrix[dimension]) == 0:
+            raise ValueError(f"matrix.{dimension} of experiment {path} must be a non empty list")
+    unknown = [dimension for dimension in matrix if dimension not in MATRIX_DEFAULTS]
+    if len(unknown) > 0:
+        raise ValueError(f"experiment {path} has unknown matrix dimensions {unknown}")
+    return settings, matrix
+
+
+def get_experiment_cells(matrix, benchmark, query_file_names):
+    query_files = [query_file for query_file in query_file_names if any([fnmatch.fnmatch(query_file, pattern) for pattern in matrix['queries']])]
+    cells = []
+    # every system runs a query right after the other, like a run without a matrix
+    for memory_limit, threads, connections, query_file, system in itertools.product(matrix['memory_limits'], matrix['threads'], matrix['connections'], query_files, matrix['systems']):
+        if system != "postgres":
+            cells.append(ExperimentCell(benchmark, query_file, system, memory_limit, connections, threads))
+            continue
+        for work_mem, hash_mem_multiplier in itertools.product(*[matrix[dimension] for dimension in POSTGRES_DIMENSIONS]):
+            cells.append(ExperimentCell(benchmark, query_file, system, memory_limit, connections, threads, work_mem, hash_mem_multiplier))
+    return cells
+
+
+def get_checkpoint(con, cell):
+    # returns (status, attempts) of the cell, (None, 0) if it never ran
+    result = con.execute("""SELECT status, attempts FROM experiment_checkpoints
+        WHERE benchmark = ? AND query_file = ? AND system = ? AND memory_limit = ? AND connections = ? AND threads = ? AND work_mem = ? AND hash_mem_multiplier = ?""", cell.key()).fetchone()
+    if result is None:
+        return None, 0
+    return result
+
+
+def start_checkpoint(con, cell):
+    # a cell that is still 'running' when the benchmark is restarted crashed the runner
+    con.execute("""INSERT INTO experiment_checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'running', 1, ?, NULL, NULL)
+        ON CONFLICT DO UPDATE SET status = 'running', attempts = attempts + 1, started = excluded.started, finished = NULL, error = NULL""",
+                cell.key() + [time.time()])
+
+
+def finish_checkpoint(con, cell, success, error=None):
+    # success is SKIPPED if the query didn't run. the next run of the experiment retries the cell
+    status = SKIPPED if success == SKIPPED else 'done' if success else 'failed'
+    con.execute("""UPDATE experiment_checkpoints SET status = ?, finished = ?, error = ?, attempts = attempts - ?
+        WHERE benchmark = ? AND query_file = ? AND system = ? AND memory_limit = ? AND connections = ? AND threads = ? AND work_mem = ? AND hash_mem_multiplier = ?""",
+                [status, time.time(), error, 1 if status == SKIPPED else 0] + cell.key())
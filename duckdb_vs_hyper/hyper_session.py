@@ -0,0 +1,144 @@
+import os
+import time
+import psutil
+import duckdb
+from tableauhyperapi import HyperProcess, Telemetry, Connection, CreateMode
+
+
+def get_process_tree(root_pids):
+    # pids of the processes and all their children that are still alive
+    pids = []
+    for root_pid in root_pids:
+        try:
+            root = psutil.Process(root_pid)
+            pids += [process.pid for process in [root] + root.children(recursive=True)]
+        except psutil.NoSuchProcess:
+            pass
+    return pids
+
+
+def get_process_tree_rss(root_pids):
+    # resident set size of the processes and all their children in kB
+    rss = 0
+    for pid in get_process_tree(root_pids):
+        try:
+            rss += psutil.Process(pid).memory_info().rss
+        except psutil.NoSuchProcess:
+            pass
+    return rss // 1024
+
+
+def get_cpu_set(threads):
+    # the first threads cpus the runner may use, all of them for 0
+    cpus = sorted(os.sched_getaffinity(0))
+    if threads == 0 or threads >= len(cpus):
+        return set(cpus)
+    return set(cpus[:threads])
+
+
+class HyperSession():
+    # Keeps one hyperd and a connection to the benchmark database alive across
+    # queries. hyperd is only restarted when its parameters (e.g. the memory
+    # limit) or the database change, when a cold start is requested or after
+    # a query failed. The pids of hyperd are discovered once per start and are
+    # reused by the samplers of every query that runs on it.
+    # hyperd has no setting for its number of threads and sizes its worker
+    # pool from the cpus it may run on at startup. A thread count other than
+    # 0 starts hyperd pinned to that many cpus, a different one restarts it.
+    def __init__(self):
+        self.hyper = None
+        self.con = None
+        self.db_path = None
+        self.parameters = None
+        self.pid = None
+        self.roots = []
+        self.threads = 0
+        self.failed = False
+        self.start_time = None
+        self.startup_time = None
+        self.startup_rss = None
+
+    def get_restart_reason(self, db_path, parameters, cold, threads):
+        if self.hyper is None:
+            return 'start'
+        if self.failed or not psutil.pid_exists(self.pid):
+            return 'failure'
+        if cold:
+            return 'cold'
+        if db_path != self.db_path or parameters != self.parameters:
+            return 'parameters'
+        if threads != self.threads:
+            return 'threads'
+        return None
+
+    def open(self, db_path, parameters, cold=False, threads=0):
+        # makes sure a hyperd with the parameters serves db_path. returns why
+        # hyperd was (re)started, None if the running one is reused.
+        reason = self.get_restart_reason(db_path, parameters, cold, threads)
+        if reason is not None:
+            self.close()
+            self.start(db_path, parameters, threads)
+        return reason
+
+    def start(self, db_path, parameters, threads=0):
+        runner = psutil.Process()
+        running = set([child.pid for child in runner.children()])
+        self.start_time = time.time()
+        start = time.perf_counter()
+        # hyperd inherits the affinity of the thread that starts it
+        runner_cpus = os.sched_getaffinity(0)
+        os.sched_setaffinity(0, get_cpu_set(threads))
+        try:
+            self.hyper = HyperProcess(telemetry=Telemetry.DO_NOT_SEND_USAGE_DATA_TO_TABLEAU, parameters=parameters)
+        finally:
+            os.sched_setaffinity(0, runner_cpus)
+        try:
+            self.con = Connection(self.hyper.endpoint, db_path, CreateMode.CREATE_IF_NOT_EXISTS)
+        except Exception:
+            self.close()
+            raise
+        self.startup_time = time.perf_counter() - start
+        # hyperd and its helpers. the tree sampler walks down from the direct children of the runner
+        self.roots = [child.pid for child in runner.children() if child.pid not in running]
+        self.pid = self.roots[0]
+        self.startup_rss = get_process_tree_rss(self.roots)
+        self.db_path = db_path
+        self.parameters = dict(parameters)
+        self.threads = threads
+        self.failed = False
+
+    def connect(self):
+        # another connection to the database of the running hyperd, closed by the caller
+        return Connection(self.hyper.endpoint, self.db_path)
+
+    def get_processes(self):
+        return get_process_tree(self.roots)
+
+    def mark_failed(self):
+        # the next open() starts a new hyperd
+        self.failed = True
+
+    def close(self):
+        # a hyperd that died during a query can't be shut down cleanly
+        if self.con is not None:
+            try:
+                self.con.close()
+            except Exception as e:
+                print(f"Error: could not close the hyper connection: {e}")
+        if self.hyper is not None:
+            try:
+                self.hyper.close()
+            except Exception as e:
+                print(f"Error: could not shut down hyperd: {e}")
+        self.hyper = None
+        self.con = None
+        self.pid = None
+        self.roots = []
+
+
+def write_hyper_startup(data_db, identifiers, session, reason):
+    # identifiers are benchmark_name, benchmark, query_file, memory_limit
+    con = duckdb.connect(data_db)
+    con.execute("INSERT INTO hyper_startups VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                identifiers + [reason, session.start_time, session.startup_time, session.startup_rss])
+    con.close()
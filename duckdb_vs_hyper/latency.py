@@ -0,0 +1,204 @@
+import math
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+NS_PER_SECOND = 1000000000
+# latencies between 1us and 2**43ns (~2.4h) fall into buckets that are 2**(1/16)
+# apart, so a percentile is off by at most ~4.4%. longer latencies end up in the last bucket.
+MIN_LATENCY_NS = 1000
+MAX_LATENCY_NS = 2 ** 43
+SUB_BUCKETS = 16
+NUM_BUCKETS = math.ceil(math.log2(MAX_LATENCY_NS / MIN_LATENCY_NS) * SUB_BUCKETS) + 1
+DEFAULT_WINDOW_NS = NS_PER_SECOND
+# window rows buffered before they are written to the parquet file
+DEFAULT_FLUSH_ROWS = 1024
+# latency is from the arrival of a query until it finished, queue the time it
+# waited for a connection and service the time it ran. in closed loop a query
+# arrives when it starts, so the queue time is 0.
+LATENCY_KINDS = ['latency', 'queue', 'service']
+
+window_schema = pa.schema([
+    ('thread_name', pa.string()),
+    ('query_tag', pa.string()),
+    ('window_number', pa.int64()),
+    ('window_start', pa.float64()),  # seconds since the first query started
+    ('queries', pa.int64()),
+    ('qps', pa.float64()),
+    ('latency_mean', pa.float64()),  # seconds
+    ('latency_p50', pa.float64()),
+    ('latency_p90', pa.float64()),
+    ('latency_p99', pa.float64()),
+    ('latency_max', pa.float64()),
+    ('queue_mean', pa.float64()),
+    ('queue_p99', pa.float64()),
+    ('service_mean', pa.float64()),
+    ('service_p99', pa.float64()),
+])
+
+histogram_schema = pa.schema([
+    ('thread_name', pa.string()),
+    ('query_tag', pa.string()),
+    ('kind', pa.string()),  # latency, queue or service
+    ('bucket', pa.int64()),
+    ('lower', pa.float64()),  # seconds
+    ('upper', pa.float64()),
+    ('count', pa.int64()),
+])
+
+
+def get_bucket(latency_ns):
+    if latency_ns <= MIN_LATENCY_NS:
+        return 0
+    return min(int(math.log2(latency_ns / MIN_LATENCY_NS) * SUB_BUCKETS), NUM_BUCKETS - 1)
+
+
+def get_bucket_bounds(bucket):
+    # lower and upper bound of the bucket in ns
+    return MIN_LATENCY_NS * 2 ** (bucket / SUB_BUCKETS), MIN_LATENCY_NS * 2 ** ((bucket + 1) / SUB_BUCKETS)
+
+
+class LatencyHistogram():
+    # Fixed size histogram of latencies in log scaled buckets. Recording is
+    # O(1) and the memory does not grow with the number of queries.
+    def __init__(self):
+        self.counts = [0] * NUM_BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, latency_ns):
+        self.counts[get_bucket(latency_ns)] += 1
+        self.count += 1
+        self.total_ns += latency_ns
+        self.max_ns = max(self.max_ns, latency_ns)
+
+    def reset(self):
+        for i in range(NUM_BUCKETS):
+            self.counts[i] = 0
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def percentile(self, p):
+        # geometric middle of the bucket the p-th percentile falls into, in ns
+        if self.count == 0:
+            return None
+        rank = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                lower, upper = get_bucket_bounds(bucket)
+                return min(math.sqrt(lower * upper), self.max_ns)
+        return self.max_ns
+
+    def mean(self):
+        return self.total_ns / self.count if self.count > 0 else None
+
+
+def create_histograms():
+    return {kind: LatencyHistogram() for kind in LATENCY_KINDS}
+
+
+class LatencyRecorder():
+    # Records the latency, queue and service time of every query of one
+    # thread into histograms per query tag, and the queries per window (1s by
+    # default) together with the percentiles of the window. Windows are counted from epoch_ns
+    # (time.perf_counter_ns() when the threads started), so the windows of
+    # all threads line up. A query counts towards the window it finished in.
+    # Window rows are appended to window_file with a ParquetWriter every
+    # flush_rows rows, the histograms of the whole run go to histogram_file on
+    # close. The memory used does not grow with the run time.
+    def __init__(self, thread_name, epoch_ns, window_file, histogram_file, window_ns=DEFAULT_WINDOW_NS, flush_rows=DEFAULT_FLUSH_ROWS):
+        self.thread_name = thread_name
+        self.epoch_ns = epoch_ns
+        self.window_file = window_file
+        self.histogram_file = histogram_file
+        self.window_ns = window_ns
+        self.flush_rows = flush_rows
+        self.window = 0
+        # query tag -> histogram of the current window / of the whole run
+        self.window_histograms = {}
+        self.histograms = {}
+        self.rows = {field.name: [] for field in window_schema}
+        self.writer = None
+
+    def record(self, query_tag, start_ns, end_ns, arrival_ns=None):
+        # arrival_ns is when the query was scheduled to arrive (open loop), by default when it started
+        if arrival_ns is None:
+            arrival_ns = start_ns
+        window = (end_ns - self.epoch_ns) // self.window_ns
+        if window != self.window:
+            self.close_window(window)
+        if query_tag not in self.histograms:
+            self.histograms[query_tag] = create_histograms()
+            self.window_histograms[query_tag] = create_histograms()
+        for histograms in [self.histograms[query_tag], self.window_histograms[query_tag]]:
+            histograms['latency'].record(end_ns - arrival_ns)
+            histograms['queue'].record(start_ns - arrival_ns)
+            histograms['service'].record(end_ns - start_ns)
+
+    def close_window(self, next_window):
+        # writes the rows of the current window. windows without any finished
+        # query get a row without query tag, so the throughput has no gaps.
+        for window in range(self.window, next_window):
+            finished = [(tag, histograms) for tag, histograms in self.window_histograms.items() if histograms['latency'].count > 0]
+            if len(finished) == 0:
+                self.append_row(window, None, None)
+            for query_tag, histograms in finished:
+                self.append_row(window, query_tag, histograms)
+                for histogram in histograms.values():
+                    histogram.reset()
+        self.window = next_window
+        if len(self.rows['window_number']) >= self.flush_rows:
+            self.flush()
+
+    def append_row(self, window, query_tag, histograms):
+        count = histograms['latency'].count if histograms is not None else 0
+        row = {
+            'thread_name': self.thread_name,
+            'query_tag': query_tag,
+            'window_number': window,
+            'window_start': window * self.window_ns / NS_PER_SECOND,
+            'queries': count,
+            'qps': count * NS_PER_SECOND / self.window_ns,
+        }
+        if count > 0:
+            latency = histograms['latency']
+            row['latency_mean'] = latency.mean() / NS_PER_SECOND
+            row['latency_p50'] = latency.percentile(50) / NS_PER_SECOND
+            row['latency_p90'] = latency.percentile(90) / NS_PER_SECOND
+            row['latency_p99'] = latency.percentile(99) / NS_PER_SECOND
+            row['latency_max'] = latency.max_ns / NS_PER_SECOND
+            for kind in ['queue', 'service']:
+                row[f'{kind}_mean'] = histograms[kind].mean() / NS_PER_SECOND
+                row[f'{kind}_p99'] = histograms[kind].percentile(99) / NS_PER_SECOND
+        for name in self.rows:
+            self.rows[name].append(row.get(name))
+
+    def flush(self):
+        if len(self.rows['window_number']) == 0:
+            return
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.window_file, window_schema, compression='zstd')
+        self.writer.write_table(pa.table(self.rows, schema=window_schema))
+        self.rows = {field.name: [] for field in window_schema}
+
+    def close(self, end_ns):
+        # the last (partial) window is written as well
+        self.close_window((end_ns - self.epoch_ns) // self.window_ns + 1)
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        rows = {field.name: [] for field in histogram_schema}
+        for query_tag, histograms in self.histograms.items():
+            for kind, histogram in histograms.items():
+                for bucket, count in enumerate(histogram.counts):
+                    if count == 0:
+                        continue
+                    lower, upper = get_bucket_bounds(bucket)
+                    for name, value in [('thread_name', self.thread_name), ('query_tag', query_tag), ('kind', kind), ('bucket', bucket),
+                                        ('lower', lower / NS_PER_SECOND), ('upper', upper / NS_PER_SECOND), ('count', count)]:
+                        rows[name].append(value)
+        pq.write_table(pa.table(rows, schema=histogram_schema), self.histogram_file, compression='zstd')
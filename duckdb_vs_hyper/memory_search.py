@@ -0,0 +1,99 @@
+import duckdb
+
+DEFAULT_LOWER_LIMIT_MB = 256
+DEFAULT_RESOLUTION_MB = 256
+DEFAULT_DEGRADATION_FACTOR = 2.0
+
+
+class ProbeResult():
+    def __init__(self, memory_limit_mb, success, runtime, peak_rss, error, run_id=None):
+        self.memory_limit_mb = memory_limit_mb
+        self.run_id = run_id
+        self.success = success
+        self.runtime = runtime
+        self.peak_rss = peak_rss
+        self.error = error
+
+
+class MemoryLimitSearch():
+    # Finds the smallest memory limit a query succeeds with, and the smallest
+    # limit at which its runtime stays within degradation_factor times the
+    # runtime at upper_mb. probe(limit_mb) runs the query once with that limit
+    # and returns a ProbeResult. Every limit is probed at most once.
+    #
+    # The search first brackets by halving the limit from upper_mb until a
+    # probe fails (or lower_mb is reached), then binary searches inside the
+    # bracket down to resolution_mb.
+    def __init__(self, probe, lower_mb, upper_mb, resolution_mb=DEFAULT_RESOLUTION_MB, degradation_factor=DEFAULT_DEGRADATION_FACTOR):
+        self.probe = probe
+        self.lower_mb = lower_mb
+        self.upper_mb = upper_mb
+        self.resolution_mb = resolution_mb
+        self.degradation_factor = degradation_factor
+        self.probes = {}
+        self.baseline = None
+
+    def run_probe(self, limit_mb):
+        if limit_mb not in self.probes:
+            print(f"probing memory limit {limit_mb}MB")
+            self.probes[limit_mb] = self.probe(limit_mb)
+        return self.probes[limit_mb]
+
+    def succeeds(self, limit_mb):
+        return self.run_probe(limit_mb).success
+
+    def not_degraded(self, limit_mb):
+        result = self.run_probe(limit_mb)
+        return result.success and result.runtime <= self.baseline.runtime * self.degradation_factor
+
+    def bisect(self, predicate, failing_mb, passing_mb):
+        # predicate(failing_mb) is False (or failing_mb was never probed), predicate(passing_mb) is True
+        while passing_mb - failing_mb > self.resolution_mb:
+            middle = (failing_mb + passing_mb) // 2
+            if predicate(middle):
+                passing_mb = middle
+            else:
+                failing_mb = middle
+        return passing_mb
+
+    def bracket(self, predicate):
+        # returns (failing_mb, passing_mb). failing_mb is lower_mb - 1 if even lower_mb passes.
+        passing_mb = self.upper_mb
+        limit_mb = self.upper_mb // 2
+        while limit_mb >= self.lower_mb:
+            if not predicate(limit_mb):
+                return limit_mb, passing_mb
+            passing_mb = limit_mb
+            limit_mb = limit_mb // 2
+        if passing_mb > self.lower_mb and not predicate(self.lower_mb):
+            return self.lower_mb, passing_mb
+        return self.lower_mb - 1, min(passing_mb, self.lower_mb)
+
+    def search(self):
+        self.baseline = self.run_probe(self.upper_mb)
+        if not self.baseline.success:
+            print(f"query fails with the upper memory limit of {self.upper_mb}MB")
+            return None, None
+        failing_mb, passing_mb = self.bracket(self.succeeds)
+        min_success_mb = self.bisect(self.succeeds, failing_mb, passing_mb)
+
+        # runtime only gets worse with less memory, so the limit without degradation is
+        # between the smallest successful limit and the baseline.
+        if self.not_degraded(min_success_mb):
+            return min_success_mb, min_success_mb
+        passing_mb = min([limit for limit, result in self.probes.items() if limit > min_success_mb and self.not_degraded(limit)])
+        failing_mb = max([limit for limit, result in self.probes.items() if limit < passing_mb and not self.not_degraded(limit)])
+        min_no_degradation_mb = self.bisect(self.not_degraded, failing_mb, passing_mb)
+        return min_success_mb, min_no_degradation_mb
+
+
+def write_search_results(data_db, identifiers, search, min_success_mb, min_no_degradation_mb):
+    # identifiers are benchmark_name, benchmark, system, query_name
+    con = duckdb.connect(data_db)
+    for limit_mb, result in sorted(search.probes.items()):
+        con.execute("INSERT INTO memory_limit_probes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    identifiers + [result.run_id, limit_mb, result.success, result.runtime, result.peak_rss, result.error])
+    baseline_runtime = search.baseline.runtime if search.baseline is not None else None
+    con.execute("INSERT INTO min_memory_limits VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                identifiers + [search.upper_mb, baseline_runtime, min_success_mb, min_no_degradation_mb, search.degradation_factor])
+    con.close()
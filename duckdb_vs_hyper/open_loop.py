@@ -0,0 +1,140 @@
+import queue
+import random
+import threading
+import time
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from latency import NS_PER_SECOND, DEFAULT_WINDOW_NS
+
+# closed: every connection starts its next query when the previous one finished.
+# the other modes are open loop, queries arrive at a rate independent of how
+# fast they are served.
+ARRIVAL_MODES = ['closed', 'constant', 'poisson', 'ramp']
+DEFAULT_RAMP_STEPS = 5
+# arrivals that don't fit into the queue are dropped, so an overloaded system
+# can't grow the memory of the runner without bound
+DEFAULT_MAX_QUEUE = 100000
+# seconds an idle worker waits for the next query before it checks whether it should stop
+WORKER_POLL_INTERVAL = 0.1
+
+arrival_schema = pa.schema([
+    ('window_number', pa.int64()),
+    ('window_start', pa.float64()),  # seconds since the start of the run
+    ('target_rate', pa.float64()),  # queries per second
+    ('arrivals', pa.int64()),
+    ('dropped', pa.int64()),
+    ('max_queue_depth', pa.int64()),
+])
+
+
+class ArrivalSchedule():
+    # Arrival times in ns relative to the start of the run. constant arrives
+    # every 1/rate seconds, poisson with exponentially distributed gaps of mean
+    # 1/rate. ramp splits the duration into steps with Poisson arrivals whose
+    # rate goes from rate to end_rate.
+    def __init__(self, mode, rate, end_rate=None, steps=DEFAULT_RAMP_STEPS, duration=0, seed=None):
+        self.mode = mode
+        self.rate = rate
+        self.end_rate = end_rate if end_rate is not None else rate
+        self.steps = steps
+        self.step_ns = duration * NS_PER_SECOND / steps
+        self.random = random.Random(seed)
+
+    def get_rate(self, time_ns):
+        if self.mode != 'ramp' or self.steps == 1:
+            return self.rate
+        step = min(int(time_ns / self.step_ns), self.steps - 1)
+        return self.rate + (self.end_rate - self.rate) * step / (self.steps - 1)
+
+    def get_next(self, time_ns):
+        rate = self.get_rate(time_ns)
+        if self.mode == 'constant':
+            return time_ns + int(NS_PER_SECOND / rate)
+        return time_ns + int(self.random.expovariate(rate) * NS_PER_SECOND)
+
+
+class OpenLoopDispatcher(threading.Thread):
+    # Puts (query index, arrival time) into the queue at the times of the
+    # schedule. The arrival time is the scheduled one, so queries the
+    # dispatcher enqueues late still count the delay as queueing time.
+    # Arrivals, dropped arrivals and the queue depth per window are written to
+    # arrival_file when the dispatcher stops.
+    def __init__(self, schedule, num_queries, epoch_ns, arrival_file, max_queue=DEFAULT_MAX_QUEUE, window_ns=DEFAULT_WINDOW_NS):
+        threading.Thread.__init__(self, name="open_loop_dispatcher")
+        self._stop_event = threading.Event()
+        self.schedule = schedule
+        self.num_queries = num_queries
+        self.epoch_ns = epoch_ns
+        self.arrival_file = arrival_file
+        self.window_ns = window_ns
+        self.queue = queue.Queue(max_queue)
+        # window -> [arrivals, dropped, max queue depth]
+        self.windows = {}
+
+    def stop(self):
+        self._stop_event.set()
+
+    def get_query(self, arrival):
+        return arrival % self.num_queries
+
+    def run(self):
+        next_ns = 0
+        arrival = 0
+        while not self._stop_event.is_set():
+            now_ns = time.perf_counter_ns() - self.epoch_ns
+            if now_ns < next_ns:
+                self._stop_event.wait((next_ns - now_ns) / NS_PER_SECOND)
+                continue
+            window = self.windows.setdefault(next_ns // self.window_ns, [0, 0, 0])
+            try:
+                self.queue.put_nowait((self.get_query(arrival), self.epoch_ns + next_ns))
+                window[0] += 1
+            except queue.Full:
+                window[1] += 1
+            window[2] = max(window[2], self.queue.qsize())
+            arrival += 1
+            next_ns = self.schedule.get_next(next_ns)
+        self.write_arrivals()
+
+    def write_arrivals(self):
+        rows = {field.name: [] for field in arrival_schema}
+        for window, (arrivals, dropped, max_queue_depth) in sorted(self.windows.items()):
+            for name, value in [('window_number', window), ('window_start', window * self.window_ns / NS_PER_SECOND),
+                                ('target_rate', self.schedule.get_rate(window * self.window_ns)), ('arrivals', arrivals),
+                                ('dropped', dropped), ('max_queue_depth', max_queue_depth)]:
+                rows[name].append(value)
+        pq.write_table(pa.table(rows, schema=arrival_schema), self.arrival_file, compression='zstd')
+
+
+class OpenLoopWorker(threading.Thread):
+    # Takes the next query from the queue of the dispatcher and runs it on its
+    # connection. Queue and service time of every query go to the recorder.
+    def __init__(self, name, con, dispatcher, queries, query_tags, recorder):
+        threading.Thread.__init__(self, name=name)
+        self._stop_event = threading.Event()
+        self.con = con
+        self.dispatcher = dispatcher
+        self.queries = queries
+        self.query_tags = query_tags
+        self.recorder = recorder
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    query, arrival_ns = self.dispatcher.queue.get(timeout=WORKER_POLL_INTERVAL)
+                except queue.Empty:
+                    continue
+                start = time.perf_counter_ns()
+                self.con.sql(self.queries[query]).execute()
+                self.recorder.record(self.query_tags[query], start, time.perf_counter_ns(), arrival_ns)
+        except Exception as e:
+            print(f"{self.name} raised an exception")
+            print(f"{e}")
+        finally:
+            self.recorder.close(time.perf_counter_ns())
+            print(f"{self.name} finished")
@@ -0,0 +1,119 @@
+import threading
+import duckdb
+
+OUTCOMES = ['success', 'timeout', 'oom', 'spill_full', 'killed', 'error']
+# outcomes that happen again when the query runs with the same or less memory
+RESOURCE_OUTCOMES = ['timeout', 'oom', 'spill_full', 'killed']
+# returned instead of success or failure for a query that didn't run because of an earlier outcome
+SKIPPED = 'skipped'
+
+# postgres sqlstates (psycopg2 pgcode)
+POSTGRES_OUT_OF_MEMORY = '53200'
+POSTGRES_DISK_FULL = '53100'
+POSTGRES_CONFIGURATION_LIMIT_EXCEEDED = '53400'  # temp_file_limit
+POSTGRES_ADMIN_SHUTDOWN = '57P01'
+POSTGRES_CRASH_SHUTDOWN = '57P02'
+
+SPILL_MESSAGES = ['max_temp_directory_size', 'temp_directory', 'temporary file', 'no space left on device', 'disk full', 'temp_file_limit']
+OOM_MESSAGES = ['out of memory', 'memory limit', 'could not allocate', 'memory exhausted']
+KILLED_MESSAGES = ['server closed the connection unexpectedly', 'connection to the server was lost', 'terminating connection', 'connection already closed']
+
+
+class QueryWatchdog():
+    # Cancels a running query after timeout seconds by calling cancel() from a
+    # timer thread, e.g. duckdb's con.interrupt(), hyper's Connection.cancel()
+    # or psycopg2's con.cancel(). A timeout of 0 disables the watchdog.
+    def __init__(self, timeout, cancel):
+        self.timeout = timeout
+        self.cancel = cancel
+        self.timer = None
+        self.timed_out = False
+
+    def fire(self):
+        self.timed_out = True
+        print(f"query exceeded the timeout of {self.timeout}s, cancelling it")
+        try:
+            self.cancel()
+        except Exception as e:
+            print(f"Error: could not cancel the query: {e}")
+
+    def __enter__(self):
+        if self.timeout > 0:
+            self.timer = threading.Timer(self.timeout, self.fire)
+            self.timer.daemon = True
+            self.timer.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.timer is not None:
+            self.timer.cancel()
+        return False
+
+
+class QueryOutcome():
+    def __init__(self, outcome, error_class=None, message=None, signal=None):
+        self.outcome = outcome
+        self.error_class = error_class
+        self.message = message
+        self.signal = signal
+
+    def is_success(self):
+        return self.outcome == 'success'
+
+
+def classify_error(error, timed_out=False):
+    # Maps an exception of duckdb, tableauhyperapi or psycopg2 to an outcome.
+    # The engine libraries are not imported here, hyper and postgres errors are
+    # recognized by their sqlstate and message.
+    error_class = type(error).__name__
+    message = str(error)
+    lower_message = message.lower()
+    pgcode = getattr(error, 'pgcode', None)
+    if timed_out:
+        outcome = 'timeout'
+    elif any([text in lower_message for text in SPILL_MESSAGES]) or pgcode in [POSTGRES_DISK_FULL, POSTGRES_CONFIGURATION_LIMIT_EXCEEDED]:
+        outcome = 'spill_full'
+    elif isinstance(error, duckdb.OutOfMemoryException) or pgcode == POSTGRES_OUT_OF_MEMORY or any([text in lower_message for text in OOM_MESSAGES]):
+        outcome = 'oom'
+    elif pgcode in [POSTGRES_ADMIN_SHUTDOWN, POSTGRES_CRASH_SHUTDOWN] or any([text in lower_message for text in KILLED_MESSAGES]):
+        # the backend or hyperd died, e.g. it was picked by the oom killer
+        outcome = 'killed'
+    else:
+        outcome = 'error'
+    return QueryOutcome(outcome, error_class, message)
+
+
+def write_query_outcome(data_db, identifiers, run_id, outcome, runtime, timeout, work_mem=0, hash_mem_multiplier=0):
+    # identifiers are benchmark_name, benchmark, system, query_file, memory_limit, connections, threads
+    con = duckdb.connect(data_db)
+    con.execute("INSERT INTO query_outcome VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                identifiers + [run_id, outcome.outcome, outcome.error_class, outcome.message, outcome.signal, runtime, timeout, work_mem, hash_mem_multiplier])
+    con.close()
+
+
+def get_skip_reason(data_db, benchmark, system, query_file, memory_limit, connections, threads, work_mem, hash_mem_multiplier, known_outcomes_db=None):
+    # Returns why the query should not run again, None if it should run.
+    # Only outcomes with the same connections, threads, work_mem and
+    # hash_mem_multiplier count.
+    # An error is only repeated at the same memory limit. Timeouts, out of
+    # memory and killed queries are skipped if they happened with at least
+    # as much memory as memory_limit (0 means no limit).
+    databases = [data_db] + ([known_outcomes_db] if known_outcomes_db is not None else [])
+    previous = []
+    for database in databases:
+        con = duckdb.connect(database, read_only=database != data_db)
+        # outcomes of older benchmarks have no work_mem and hash_mem_multiplier, they ran with the server default
+        columns = [row[0] for row in con.execute("SELECT column_name FROM duckdb_columns() WHERE database_name = current_database() AND table_name = 'query_outcome'").fetchall()]
+        settings = [column if column in columns else '0' for column in ['work_mem', 'hash_mem_multiplier']]
+        previous += con.execute(f"""SELECT outcome, memory_limit FROM query_outcome
+            WHERE benchmark = ? AND system = ? AND query_file = ? AND outcome != 'success' AND connections = ? AND threads = ? AND {settings[0]} = ? AND {settings[1]} = ?""",
+                                [benchmark, system, query_file, connections, threads, work_mem, hash_mem_multiplier]).fetchall()
+        con.close()
+    unlimited = float('inf')
+    limit = memory_limit if memory_limit > 0 else unlimited
+    for outcome, failed_limit in previous:
+        if outcome == 'error' and failed_limit == memory_limit:
+            return f"it failed with an error at a memory limit of {failed_limit}GB before"
+        if outcome in RESOURCE_OUTCOMES and (failed_limit if failed_limit > 0 else unlimited) >= limit:
+            return f"it failed with {outcome} at a memory limit of {failed_limit}GB before"
+    return None
@@ -0,0 +1,123 @@
+import duckdb
+from psycopg2.pool import ThreadedConnectionPool
+
+from scale_factors import get_base_benchmark, get_postgres_database
+
+POSTGRES_DATABASES = ["tpch", "tpcds", "synthetic"]
+
+
+class PostgresSessionSettings():
+    # settings every pooled connection gets before it runs a query. work_mem in
+    # MB, 0 keeps the default of the server for all of them.
+    def __init__(self, work_mem=0, hash_mem_multiplier=0, max_parallel_workers_per_gather=0):
+        self.work_mem = work_mem
+        self.hash_mem_multiplier = hash_mem_multiplier
+        self.max_parallel_workers_per_gather = max_parallel_workers_per_gather
+
+    def get_statements(self):
+        # a connection may come back from an earlier query with other settings
+        statements = ["RESET ALL"]
+        if self.work_mem > 0:
+            statements.append(f"SET work_mem = '{self.work_mem}MB'")
+        if self.hash_mem_multiplier > 0:
+            statements.append(f"SET hash_mem_multiplier = {self.hash_mem_multiplier}")
+        if self.max_parallel_workers_per_gather > 0:
+            statements.append(f"SET max_parallel_workers_per_gather = {self.max_parallel_workers_per_gather}")
+        return statements
+
+    def get_query_suffix(self):
+        # appended to the query name, like the number of connections of duckdb
+        suffix = ""
+        if self.work_mem > 0:
+            suffix += f"_work_mem_{self.work_mem}MB"
+        if self.hash_mem_multiplier > 0:
+            suffix += f"_hash_mem_{self.hash_mem_multiplier}x"
+        return suffix
+
+
+class PostgresConnection():
+    def __init__(self, con):
+        self.con = con
+        self.cursor = con.cursor()
+        self.cursor.execute("select pg_backend_pid();")
+        self.pid = self.cursor.fetchone()[0]
+
+    def get_settings(self):
+        # the values the server uses, including its defaults
+        self.cursor.execute("SELECT current_setting('work_mem'), current_setting('hash_mem_multiplier')::DOUBLE PRECISION, current_setting('max_parallel_workers_per_gather')::BIGINT")
+        return list(self.cursor.fetchone())
+
+    def get_temp_directory(self):
+        # temp files of sorts and hashes that don't fit into work_mem, unless temp_tablespaces is set
+        self.cursor.execute("SELECT current_setting('data_directory')")
+        return f"{self.cursor.fetchone()[0]}/base/pgsql_tmp"
+
+    def get_database_directory(self):
+        # the files of the tables and indexes of the database
+        self.cursor.execute("SELECT current_setting('data_directory') || '/base/' || oid FROM pg_database WHERE datname = current_database()")
+        return self.cursor.fetchone()[0]
+
+
+class PostgresPool():
+    # One ThreadedConnectionPool per benchmark database. Connections (and the
+    # backends serving them) are reused across queries and runs, a connection
+    # is only closed after its query failed.
+    def __init__(self, host, port, user, password, max_connections):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.max_connections = max_connections
+        self.pools = {}
+        # benchmark -> directory of the database, known once a connection to it was opened
+        self.database_directories = {}
+
+    def get_pool(self, benchmark):
+        if get_base_benchmark(benchmark) not in POSTGRES_DATABASES:
+            print("benchmark provided has no postgres database")
+            exit(1)
+        if benchmark not in self.pools:
+            # password None lets libpq fall back to PGPASSWORD or ~/.pgpass.
+            # tpch-sf10 is in the database tpch_sf10
+            self.pools[benchmark] = ThreadedConnectionPool(0, self.max_connections, database=get_postgres_database(benchmark), user=self.user, password=self.password, host=self.host, port=self.port)
+        return self.pools[benchmark]
+
+    def get_connections(self, benchmark, count, settings):
+        pool = self.get_pool(benchmark)
+        connections = []
+        try:
+            for i in range(count):
+                con = pool.getconn()
+                # queries must not leave an open transaction behind on the pooled connection
+                con.autocommit = True
+                connections.append(PostgresConnection(con))
+                if benchmark not in self.database_directories:
+                    self.database_directories[benchmark] = connections[-1].get_database_directory()
+                for statement in settings.get_statements():
+                    connections[-1].cursor.execute(statement)
+        except Exception:
+            self.put_connections(benchmark, connections, failed=True)
+            raise
+        return connections
+
+    def put_connections(self, benchmark, connections, failed=False):
+        pool = self.pools[benchmark]
+        for connection in connections:
+            connection.cursor.close()
+            pool.putconn(connection.con, close=failed or connection.con.closed != 0)
+
+    def get_database_directory(self, benchmark):
+        # None if no connection to the database of the benchmark was opened yet
+        return self.database_directories.get(benchmark)
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.closeall()
+        self.pools = {}
+
+
+def write_postgres_settings(data_db, run_id, settings):
+    # settings as returned by PostgresConnection.get_settings()
+    con = duckdb.connect(data_db)
+    con.execute("INSERT INTO postgres_settings VALUES (?, ?, ?, ?)", [run_id] + settings)
+    con.close()
@@ -0,0 +1,170 @@
+import multiprocessing
+import os
+import threading
+import time
+import duckdb
+
+# threads: one duckdb instance in the runner, every connection runs in a thread of the runner.
+# processes: every connection is a worker process with its own duckdb instance on the same
+# database (read only), each with the full --memory_limit.
+# instances: like processes, but the workers are tenants that share --memory_limit
+# (or get their own limits with --instance_memory_limits).
+CLIENT_MODES = ['threads', 'processes', 'instances']
+# seconds between two checks for an interrupt while the query of a worker runs
+WORKER_POLL_INTERVAL = 0.1
+
+
+def get_worker_error(error):
+    # exceptions of the worker are sent as (class name, message) and recreated
+    # with the duckdb exception class of the same name, so classify_error sees
+    # the same type as in thread mode.
+    error_class = getattr(duckdb, error[0], None)
+    if not isinstance(error_class, type) or not issubclass(error_class, Exception):
+        error_class = Exception
+    return error_class(error[1])
+
+
+def worker_main(pipe, db_file, memory_limit, threads, temp_directory):
+    # runs in the worker process. waits until it was moved to a cgroup (if
+    # any) before the database is opened, then runs the queries it receives
+    # until it is closed.
+    pipe.recv()
+    try:
+        con = duckdb.connect(db_file, read_only=True)
+        if memory_limit > 0:
+            con.sql(f"SET memory_limit='{memory_limit}GB'")
+        if threads > 0:
+            con.sql(f"SET threads={threads}")
+        # duckdb removes the temp files it finds in its temp directory when it starts, so every worker needs its own
+        con.sql(f"SET temp_directory='{temp_directory}'")
+    except Exception as e:
+        pipe.send(('error', (type(e).__name__, str(e))))
+        return
+    pipe.send(('ready',))
+
+    while True:
+        message = pipe.recv()
+        if message[0] == 'close':
+            break
+        if message[0] != 'run':
+            # an interrupt that arrived after the query finished
+            continue
+        errors = []
+        runtimes = []
+
+        def execute():
+            start = time.perf_counter()
+            try:
+                # con.sql() returns None for statements without a result (create table ans as ...)
+                con.execute(message[1])
+            except Exception as e:
+                errors.append(e)
+            runtimes.append(time.perf_counter() - start)
+
+        query_thread = threading.Thread(target=execute, name="worker_query")
+        query_thread.start()
+        # join returns as soon as the query ends, interrupts are only checked while it runs
+        while True:
+            query_thread.join(WORKER_POLL_INTERVAL)
+            if not query_thread.is_alive():
+                break
+            if pipe.poll() and pipe.recv()[0] == 'interrupt':
+                con.interrupt()
+        runtime = runtimes[0]
+        error = (type(errors[0]).__name__, str(errors[0])) if len(errors) > 0 else None
+        pipe.send(('done', runtime, error))
+    con.close()
+
+
+class WorkerResult():
+    def __init__(self, worker, pid, runtime, error=None, signal=None):
+        self.worker = worker
+        self.pid = pid
+        self.runtime = runtime
+        self.error = error
+        # set if the worker was killed while it ran the query (e.g. by the oom killer)
+        self.signal = signal
+
+
+class DuckDBProcessPool():
+    # N worker processes, each with its own duckdb instance on db_file. The
+    # workers stay alive across the runs of a query, so the hot runs find
+    # their buffer pools warm. Workers are spawned rather than forked, so they
+    # don't inherit the duckdb instances and threads of the runner.
+    def __init__(self, db_file, memory_limits, threads, temp_directories):
+        self.db_file = db_file
+        self.memory_limits = memory_limits
+        self.threads = threads
+        self.temp_directories = temp_directories
+        self.workers = []
+        self.pipes = []
+
+    def start(self, cgroup=None):
+        context = multiprocessing.get_context('spawn')
+        for i, (memory_limit, temp_directory) in enumerate(zip(self.memory_limits, self.temp_directories)):
+            os.makedirs(temp_directory, exist_ok=True)
+            parent_pipe, child_pipe = context.Pipe()
+            worker = context.Process(target=worker_main, args=(child_pipe, self.db_file, memory_limit, self.threads, temp_directory), name=f"duckdb_worker_{i}")
+            worker.start()
+            self.workers.append(worker)
+            self.pipes.append(parent_pipe)
+        if cgroup is not None:
+            for worker in self.workers:
+                cgroup.add_pid(worker.pid)
+        for pipe in self.pipes:
+            pipe.send('go')
+        for i, pipe in enumerate(self.pipes):
+            try:
+                message = pipe.recv()
+            except EOFError:
+                raise RuntimeError(f"duckdb worker {i} exited before it opened {self.db_file}")
+            if message[0] == 'error':
+                raise get_worker_error(message[1])
+
+    def get_pids(self):
+        return [worker.pid for worker in self.workers]
+
+    def run(self, query):
+        # runs query on every worker at the same time and returns a WorkerResult per worker
+        for pipe in self.pipes:
+            pipe.send(('run', query))
+        results = []
+        for i, (worker, pipe) in enumerate(zip(self.workers, self.pipes)):
+            try:
+                message = pipe.recv()
+            except (EOFError, ConnectionResetError):
+                worker.join()
+                signal = -worker.exitcode if worker.exitcode is not None and worker.exitcode < 0 else None
+                results.append(WorkerResult(i, worker.pid, None, RuntimeError(f"duckdb worker {i} exited with exit code {worker.exitcode}"), signal))
+                continue
+            error = get_worker_error(message[2]) if message[2] is not None else None
+            results.append(WorkerResult(i, worker.pid, message[1], error))
+        return results
+
+    def interrupt(self):
+        for worker, pipe in zip(self.workers, self.pipes):
+            if worker.is_alive():
+                pipe.send(('interrupt',))
+
+    def close(self):
+        for worker, pipe in zip(self.workers, self.pipes):
+            if worker.is_alive():
+                try:
+                    pipe.send(('close',))
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+        for worker in self.workers:
+            worker.join()
+            worker.close()
+        self.workers = []
+        self.pipes = []
+
+
+def write_client_workers(data_db, run_id, client_mode, memory_limits, temp_directories, results):
+    # one row per worker process of a run, the memory of a worker is in proc_tree_mem_info (see client_worker_mem)
+    con = duckdb.connect(data_db)
+    for result in results:
+        con.execute("INSERT INTO client_workers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [run_id, client_mode, result.worker, result.pid, memory_limits[result.worker], temp_directories[result.worker],
+                     result.runtime, str(result.error) if result.error is not None else None, result.signal])
+    con.close()
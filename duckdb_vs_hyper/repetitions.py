@@ -0,0 +1,96 @@
+import time
+import duckdb
+import numpy as np
+
+DEFAULT_MAX_HOT_RUNS = 30
+# relative half width of the 95% confidence interval adaptive runs stop at
+DEFAULT_CI_TARGET = 0.05
+# seconds a query may spend on adaptive hot runs
+DEFAULT_HOT_TIME_BUDGET = 600
+
+# two sided 95% quantiles of the t distribution for 1..30 degrees of freedom
+T_95 = [12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+        2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+        2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042]
+Z_95 = 1.960
+
+
+def relative_ci(values):
+    # half width of the 95% confidence interval of the mean, relative to the mean
+    if len(values) < 2 or np.mean(values) == 0:
+        return None
+    degrees_of_freedom = len(values) - 1
+    t = T_95[degrees_of_freedom - 1] if degrees_of_freedom <= len(T_95) else Z_95
+    return float(t * np.std(values, ddof=1) / np.sqrt(len(values)) / np.mean(values))
+
+
+def describe(values):
+    # median, p95, coefficient of variation and relative ci of the values
+    values = [value for value in values if value is not None]
+    if len(values) == 0:
+        return [None, None, None, None]
+    cv = float(np.std(values, ddof=1) / np.mean(values)) if len(values) > 1 and np.mean(values) != 0 else None
+    return [float(np.median(values)), float(np.percentile(values, 95)), cv, relative_ci(values)]
+
+
+class HotRunStatistics():
+    # Decides how often a query runs and collects runtime and peak RSS of the
+    # measured hot runs. Every query runs cold once, then warmup_runs times
+    # without being measured and then hot_runs times. In adaptive mode hot runs
+    # continue until the confidence interval of runtime and peak RSS is within
+    # ci_target of their mean, max_hot_runs is reached or time_budget seconds
+    # were spent on hot runs.
+    def __init__(self, warmup_runs=0, hot_runs=1, adaptive=False, max_hot_runs=DEFAULT_MAX_HOT_RUNS, ci_target=DEFAULT_CI_TARGET, time_budget=DEFAULT_HOT_TIME_BUDGET):
+        self.warmup_runs = warmup_runs
+        self.hot_runs = hot_runs
+        self.adaptive = adaptive
+        self.max_hot_runs = max(max_hot_runs, hot_runs)
+        self.ci_target = ci_target
+        self.time_budget = time_budget
+        self.runtimes = []
+        self.peak_rss = []
+        self.hot_start = None
+        self.stop_reason = None
+
+    def is_done(self):
+        measured = len(self.runtimes)
+        if measured < self.hot_runs:
+            return False
+        if not self.adaptive:
+            self.stop_reason = 'runs'
+            return True
+        runtime_ci = relative_ci(self.runtimes)
+        rss_ci = relative_ci([value for value in self.peak_rss if value is not None])
+        if runtime_ci is not None and runtime_ci <= self.ci_target and (rss_ci is None or rss_ci <= self.ci_target):
+            self.stop_reason = 'ci'
+        elif measured >= self.max_hot_runs:
+            self.stop_reason = 'max_runs'
+        elif time.monotonic() - self.hot_start >= self.time_budget:
+            self.stop_reason = 'time_budget'
+        return self.stop_reason is not None
+
+    def runs(self):
+        # the run types to execute, the caller reports every run with add()
+        yield "cold"
+        for i in range(self.warmup_runs):
+            yield "warmup"
+        self.hot_start = time.monotonic()
+        while not self.is_done():
+            yield "hot"
+
+    def add(self, run, runtime, peak_rss):
+        if run != "hot":
+            return
+        self.runtimes.append(runtime)
+        self.peak_rss.append(peak_rss)
+
+    def write(self, data_db, identifiers):
+        # identifiers are benchmark_name, benchmark, system, query_name, connections, memory_limit, threads
+        con = duckdb.connect(data_db)
+        con.execute("INSERT INTO query_statistics VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    identifiers + [len(self.runtimes), self.stop_reason] + describe(self.runtimes) + describe(self.peak_rss) + [float(np.mean(self.runtimes)) if len(self.runtimes) > 0 else None])
+        con.close()
+
+
+def create_hot_run_statistics(config):
+    return HotRunStatistics(config.warmup_runs, config.hot_runs, config.adaptive_hot_runs, config.max_hot_runs, config.ci_target, config.hot_time_budget)
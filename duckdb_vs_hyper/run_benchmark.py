@@ -1,95 +1,166 @@
 import os
+import sys
 import psutil
 import duckdb
 import threading
 import subprocess
 import argparse
 import time
-import psycopg2
 import glob
-from tableauhyperapi import HyperProcess, Telemetry, Connection, CreateMode
 from duckdb_thread import duckdb_thread
+from latency import LatencyRecorder
+from workload import load_workload
+from open_loop import ArrivalSchedule, OpenLoopDispatcher, OpenLoopWorker, ARRIVAL_MODES, DEFAULT_RAMP_STEPS
+from process_pool import DuckDBProcessPool, CLIENT_MODES, write_client_workers
+from contention import load_contention, ContentionClient, DuckDBContentionConnection, HyperContentionConnection, PostgresContentionConnection, write_contention_queries, write_contention_slowdown
+
+SYSTEM_DIR = os.path.dirname(__file__)
+sys.path.append(f'{SYSTEM_DIR}/..')
+from memory_utils.sampler import create_memory_sampler, DEFAULT_SAMPLE_INTERVAL, SAMPLER_MODES
+from memory_utils.cgroup import BenchmarkCgroup, DEFAULT_CGROUP_PARENT, DEFAULT_MEMORY_HIGH_RATIO
+from memory_utils.export import export_parquet, export_csv
+from memory_utils.page_cache import evict_files, get_residency, write_page_cache_eviction, DEFAULT_RESIDENCY_SCAN_INTERVAL
+from cgroup_worker import run_in_cgroup_worker
+from experiment import load_experiment, get_experiment_cells, get_checkpoint, start_checkpoint, finish_checkpoint
+from repetitions import create_hot_run_statistics, DEFAULT_MAX_HOT_RUNS, DEFAULT_CI_TARGET, DEFAULT_HOT_TIME_BUDGET
+from hyper_session import HyperSession, write_hyper_startup
+from postgres_pool import PostgresPool, PostgresSessionSettings, write_postgres_settings
+from outcomes import QueryWatchdog, QueryOutcome, classify_error, write_query_outcome, get_skip_reason, SKIPPED
+from memory_search import MemoryLimitSearch, ProbeResult, write_search_results, DEFAULT_LOWER_LIMIT_MB, DEFAULT_RESOLUTION_MB, DEFAULT_DEGRADATION_FACTOR
+from synthetic import SYNTHETIC_BENCHMARK, SYNTHETIC_DATABASE, SYNTHETIC_HYPER_DATABASE, DEFAULT_SYNTHETIC_SPEC, load_synthetic, prepare_synthetic_benchmark, copy_synthetic_queries
+from thread_scaling import write_thread_scaling
+from scale_factors import SCALABLE_BENCHMARKS, SCALE_FACTORS, get_base_benchmark, get_scale_factor, get_scaled_benchmark, get_query_directory, get_duckdb_scaled_database, get_hyper_scaled_database, prepare_scaled_databases, write_scaling_fits
 
 
-TPCH_SF100_DATABASE = "tpch-sf100.duckdb"
-TPCDS_SF100_DATABASE = "tpcds-sf100.duckdb"
-TPCH_SF10_DATABASE = "tpch-sf10.duckdb"
 TMM_DATABASE = "tmm.duckdb"
-HYPER_TPCH_DATABASE = "tpch-sf100.hyper"
-HYPER_TPCDS_DATABASE = "tpcds-sf100.hyper"
 
 VALID_SYSTEMS = ['duckdb', 'hyper', 'postgres']
+COLD_MODES = ['drop_caches', 'evict']
 
 DROP_ANSWER_SQL = "Drop table if exists ans;"
 
-HYPER_FAILING_OPERATOR_QUERIES = [
-'aggr-l_orderkey-l_partkey.sql',
-'aggr-l_orderkey-l_suppkey.sql',
-'aggr-l_suppkey-l_partkey-l_orderkey.sql',
-'aggr-l_suppkey-l_partkey-l_shipinstruct.sql',
-'aggr-l_suppkey-l_partkey-l_returnflag-l_linestatus.sql',
-'aggr-l_suppkey-l_partkey-l_shipinstruct-l_shipmode.sql',
-'aggr-l_suppkey-l_partkey-l_shipmode.sql',
-'hash-join-large.sql'
-]
-
-def get_mem_lock_file(query_file):
-    return query_file.replace('.sql', '_lock')
-
 def get_mem_usage_db_file(benchmark_name, benchmark):
     return benchmark_name + "/" + benchmark + "/data.duckdb"
 
-def create_mem_poll_lock(query_file):
-    file_name = query_file.replace('.sql', '_lock')
-    try:
-        # Open the file in write mode, creating it if it doesn't exist
-        # it is a lock file so we don't do anything once the file is created.
-        with open(file_name, 'w'):
-            pass
-        return
-    except Exception as e:
-        print(f"Error: {e}")
+def create_mem_usage_db(benchmark_name, benchmark):
+    mem_db = get_mem_usage_db_file(benchmark_name, benchmark)
+
+    if not os.path.exists(benchmark_name + "/" + benchmark):
+        os.makedirs(f"{benchmark_name}/{benchmark}")
 
-def stop_polling_mem(query_file):
+    # create db and tables if they do not yet exist.
+    con = duckdb.connect(mem_db)
+    with open('memory_utils/data_schema.sql') as f: schema = f.read()
+    con.sql(f"{schema}")
+    con.close()
+    return mem_db
+
+def stop_polling_mem(sampler):
+    # returns the peak RSS (kB) of the sampled process
     try:
-        # Remove the file
-        file_name = query_file.replace('.sql', '_lock')
-        os.remove(file_name)
-    except FileNotFoundError:
-        print(f"Error: File '{file_name}' not found.")
+        sampler.stop()
+        return sampler.peak_rss()
     except Exception as e:
         print(f"Error: {e}")
+        return None
 
 
-def start_polling_mem(query_file, system, benchmark_name, benchmark, run, hyper_pid):
-    def run_script():
-        try:
-            mem_db = get_mem_usage_db_file(benchmark_name, benchmark)
-
-            if not os.path.exists(benchmark_name + "/" + benchmark):
-                os.makedirs(f"{benchmark_name}/{benchmark}")
-
-            # create db if it does not yet exist.
-            if not os.path.exists(mem_db):
-                con = duckdb.connect(mem_db)
-                with open('memory_utils/data_schema.sql') as f: schema = f.read()
-                con.sql(f"{schema}")
-                con.close()
-
-            query = query_file.replace('.sql', '')
-            mem_lock_file = get_mem_lock_file(query_file)
-
-            args = ['python3', 'memory_utils/poll_process_mem.py', mem_db, mem_lock_file, benchmark_name, benchmark, system, run, query, str(hyper_pid)]
-            
-            # Run the script using subprocess.Popen
-            subprocess.run(args, check=True)
-        except subprocess.CalledProcessError as e:
-            print(f"Error running script: {e}")
+def get_database_files(system, benchmark, config):
+    # the files the system reads the database of the benchmark from. their page
+    # cache residency is sampled and --cold_mode=evict evicts them.
+    if system == 'duckdb':
+        db_file = get_duckdb_database_file(benchmark)
+        return [db_file, f"{db_file}.wal"]
+    elif system == 'hyper':
+        return [get_hyper_database_file(benchmark)]
+    # the directory is known once the pool opened a connection to the database
+    directory = config.postgres_pool.get_database_directory(benchmark)
+    return [directory] if directory is not None else []
+
+def clear_page_cache(systems, benchmark, config):
+    # drop_caches empties the page cache (and slab caches) of the whole host and needs root.
+    # evict only drops the database files of the systems.
+    if config.cold_mode == 'drop_caches':
+        # hack to (hopefully) clear mmap caches
+        subprocess.call("sudo ./scripts/clear_page_cache.sh", shell=True)
+        return
+    mem_db = create_mem_usage_db(config.benchmark_name, benchmark)
+    for system in systems:
+        paths = get_database_files(system, benchmark, config)
+        files, size, resident_before = get_residency(paths)
+        if evict_files(paths) == 0:
+            print(f"Error: could not evict any database file of {system} ({paths})")
+        _, _, resident_after = get_residency(paths)
+        print(f"evicted {system} database: {resident_before / 2**30:.2f}GB -> {resident_after / 2**30:.2f}GB of {size / 2**30:.2f}GB resident")
+        write_page_cache_eviction(mem_db, [config.benchmark_name, benchmark, system], files, size, resident_before, resident_after)
+
+def start_polling_mem(query_file, system, benchmark_name, benchmark, run, pid, config, tree_roots=None, cgroup_path=None, connections=1, memory_limit=None, spill_directories=[], sampler_mode=None):
+    mem_db = create_mem_usage_db(benchmark_name, benchmark)
+    query = query_file.replace('.sql', '')
+    if memory_limit is None:
+        memory_limit = config.memory_limit
+    if sampler_mode is None:
+        sampler_mode = config.sampler_mode
+    cache_paths = get_database_files(system, benchmark, config) if config.residency_interval > 0 else []
+    # the runner is the parent of hyperd, a tree below the runner (duckdb) must not include it
+    excluded_roots = list(config.hyper_session.roots) if pid == os.getpid() else []
+    sampler = create_memory_sampler(mem_db, benchmark_name, benchmark, system, run, query, pid, config.sample_interval, sampler_mode, tree_roots, cgroup_path,
+                                    connections, memory_limit, config.threads, spill_directories, cache_paths, config.residency_interval, excluded_roots=excluded_roots)
+    sampler.start()
+    return sampler
+
+class LocalSampling():
+    # starts and stops the memory sampler for queries that run in the runner process itself
+    def __init__(self, system, benchmark, config, pid, tree_roots=None, cgroup_path=None, connections=1, spill_directories=[]):
+        self.system = system
+        self.benchmark = benchmark
+        self.config = config
+        self.pid = pid
+        self.tree_roots = tree_roots
+        self.cgroup_path = cgroup_path
+        self.connections = connections
+        self.spill_directories = spill_directories
+
+    def start(self, query_name, run):
+        return start_polling_mem(query_name, self.system, self.config.benchmark_name, self.benchmark, run, self.pid, self.config, self.tree_roots, self.cgroup_path, self.connections,
+                                 spill_directories=self.spill_directories)
+
+    def stop(self, sampler):
+        return stop_polling_mem(sampler)
+
+    def run_id(self, sampler):
+        return sampler.run_id if sampler is not None else None
+
+def record_query_outcome(system, benchmark, query_file, config, run_id, outcome, runtime, connections=1):
+    mem_db = create_mem_usage_db(config.benchmark_name, benchmark)
+    write_query_outcome(mem_db, [config.benchmark_name, benchmark, system, query_file, config.memory_limit, connections, config.threads], run_id, outcome, runtime, config.query_timeout,
+                        *get_outcome_settings(system, config))
+
+def get_outcome_settings(system, config):
+    # work_mem and hash_mem_multiplier only change the outcome of postgres
+    if system == "postgres":
+        return [config.work_mem, config.hash_mem_multiplier]
+    return [0, 0]
+
+def write_hot_run_statistics(statistics, system, benchmark, query_name, config, connections=1):
+    mem_db = create_mem_usage_db(config.benchmark_name, benchmark)
+    statistics.write(mem_db, [config.benchmark_name, benchmark, system, query_name, connections, config.memory_limit, config.threads])
+
+def create_benchmark_cgroup(system, benchmark, query_file, config):
+    name = f"{system}-{benchmark}-{query_file.replace('.sql', '')}-{os.getpid()}"
+    cgroup = BenchmarkCgroup(name, config.memory_limit, config.cgroup_parent, config.cgroup_high_ratio)
+    try:
+        cgroup.create()
+    except Exception as e:
+        print(f"Error: could not create cgroup {cgroup.path}: {e}. --cgroup needs cgroup v2 and root")
+        exit(1)
+    return cgroup
 
-    create_mem_poll_lock(query_file)
-    # Create a new thread and run the script inside it
-    script_thread = threading.Thread(target=run_script)
-    script_thread.start()
+def add_process_tree_to_cgroup(cgroup, root_pids):
+    for root_pid in root_pids:
+        root = psutil.Process(root_pid)
+        for process in [root] + root.children(recursive=True):
+            cgroup.add_pid(process.pid)
 
 def get_query_from_file(file_name):
     try:
@@ -105,17 +176,22 @@ def get_query_from_file(file_name):
         return None
 
 
-def run_query(query_file, system, benchmark, config):
-    if query_file in HYPER_FAILING_OPERATOR_QUERIES:
-        print(f"hyper fails, skipping query")
-        return
+def run_query(query_file, system, benchmark, config, retry=False):
+    # returns False if the query could not be run, SKIPPED if it failed the same way before.
+    # a retried query runs no matter what the earlier outcomes were.
+    mem_db = create_mem_usage_db(config.benchmark_name, benchmark)
+    skip_reasons = [get_skip_reason(mem_db, benchmark, system, query_file, config.memory_limit, connections, config.threads, *get_outcome_settings(system, config), config.known_outcomes)
+                    for connections in config.connections_list]
+    if not retry and all([skip_reason is not None for skip_reason in skip_reasons]):
+        print(f"skipping query, {skip_reasons[0]}")
+        return SKIPPED
     
     if system == "duckdb":
-        run_duckdb_hot_cold(query_file, benchmark, config)
+        return run_duckdb_hot_cold(query_file, benchmark, config)
     elif system == "hyper":
-        run_hyper_hot_cold(query_file, benchmark, config)
+        return run_hyper_hot_cold(query_file, benchmark, config)
     elif system == "postgres":
-        run_postgres_hot_cold(query_file, benchmark, config)
+        return run_postgres_hot_cold(query_file, benchmark, config)
     else:
         print("System must be hyper or duckdb")
         exit(1)
@@ -126,76 +202,128 @@ def set_duckdb_memory_limit(connections, memory_limit):
             memory_limit_str = f"'{memory_limit}GB'"
             con.sql(f"SET memory_limit={memory_limit_str}")
 
-def set_duckdb_thre(connections, memory_limit):
-    if memory_limit > 0:
+def set_duckdb_threads(connections, threads):
+    if threads > 0:
         for con in connections:
-            memory_limit_str = f"'{memory_limit}GB'"
-            con.sql(f"SET memory_limit={memory_limit_str}")
+            con.sql(f"SET threads={threads}")
 
-def execute_query_on_con(con, query):
+def execute_query_on_con(con, query, errors):
+    # exceptions don't leave the thread, failed queries are collected in errors
     thread_name = str(threading.current_thread().name)
-    res = con.sql(query).execute()
+    try:
+        res = con.sql(query).execute()
+    except Exception as e:
+        print(f"Error: {thread_name} failed: {e}")
+        errors.append(e)
+        return
     print(f"{thread_name} done")
 
 def run_duckdb_hot_cold(query_file, benchmark, config):
+    success = True
     for concurrent_connections in config.connections_list:
-        try:
+        if config.client_mode != 'threads':
+            success = run_duckdb_process_pool(query_file, benchmark, config, concurrent_connections) and success
+        elif config.cgroup:
+            # run the queries in a forked worker that is the only process in the cgroup
+            cgroup = create_benchmark_cgroup("duckdb", benchmark, query_file, config)
+            started_run_ids = []
+            def start_sampler(query_name, run, pid):
+                sampler = start_polling_mem(query_name, "duckdb", config.benchmark_name, benchmark, run, pid, config, None, cgroup.path, concurrent_connections,
+                                            spill_directories=get_duckdb_spill_directories(benchmark))
+                started_run_ids.append(sampler.run_id)
+                return sampler
+            def run_worker(sampling):
+                if not run_duckdb_connections(query_file, benchmark, config, concurrent_connections, sampling):
+                    exit(1)
+            try:
+                exitcode = run_in_cgroup_worker(run_worker, cgroup, start_sampler, stop_polling_mem)
+                if exitcode != 0:
+                    print(f"Error: duckdb worker exited with exit code {exitcode}")
+                    success = False
+                if exitcode < 0:
+                    # the worker was killed by a signal (SIGKILL from the oom killer) and could not record it itself
+                    run_id = started_run_ids[-1] if len(started_run_ids) > 0 else None
+                    record_query_outcome("duckdb", benchmark, query_file, config, run_id, QueryOutcome('killed', signal=-exitcode), None, concurrent_connections)
+            finally:
+                cgroup.remove()
+        else:
+            success = run_duckdb_connections(query_file, benchmark, config, concurrent_connections, LocalSampling("duckdb", benchmark, config, os.getpid(), connections=concurrent_connections,
+                                                                                                                spill_directories=get_duckdb_spill_directories(benchmark))) and success
+        print(f"done.")
+        time.sleep(5)
+    return success
+
+def get_duckdb_database_file(benchmark):
+    db_file = "__NOT_EXISTS__.duckdb"
+    if benchmark == "tmm":
+        db_file = TMM_DATABASE
+    elif benchmark == SYNTHETIC_BENCHMARK:
+        db_file = SYNTHETIC_DATABASE
+    elif get_base_benchmark(benchmark) in SCALABLE_BENCHMARKS:
+        # tpch-sf100.duckdb for tpch, tpch-sf10.duckdb for tpch-sf10
+        db_file = get_duckdb_scaled_database(benchmark)
+    else:
+        print("benchmark provided has no database file")
+        exit(1)
 
-            # setup connections here.
-            connections = []
-            db_file = "__NOT_EXISTS__.duckdb"
-            if benchmark == "tmm":
-                db_file = TMM_DATABASE
-            elif benchmark == "tpch":
-                db_file = TPCH_SF100_DATABASE
-            elif benchmark == "tpch-sf10":
-                db_file = TPCH_SF10_DATABASE
-            elif benchmark == "tpcds":
-                db_file = TPCDS_SF100_DATABASE
-            else:
-                print("benchmark provided has no database file")
-                exit(1)
+    if not os.path.isfile(db_file):
+        print(f"Could not find database file {db_file}. Please create the database file first")
+        exit(1)
+    return db_file
 
-            # db_file = TMM_DATABASE if benchmark == "tmm" else TPCH_SF100_DATABASE
-            read_only = benchmark == "tmm"
-            if not os.path.isfile(db_file):
-                print(f"Could not find database file {db_file}. Please create the database file first")
-                exit(1)
+def get_duckdb_spill_directories(benchmark):
+    # duckdb spills to <database>.tmp next to a persistent database
+    return [f"{get_duckdb_database_file(benchmark)}.tmp"]
 
-            for i in range(concurrent_connections):
-                con = duckdb.connect(db_file, read_only=read_only)
-                connections.append(con)
+def run_duckdb_connections(query_file, benchmark, config, concurrent_connections, sampling):
+    # returns False if the query failed
+    connections = []
+    errors = []
+    try:
+        # setup connections here.
+        db_file = get_duckdb_database_file(benchmark)
+        read_only = benchmark == "tmm"
 
-            # set memory limit for the connections
+        for i in range(concurrent_connections):
+            con = duckdb.connect(db_file, read_only=read_only)
+            connections.append(con)
 
-            set_duckdb_memory_limit(connections, config.memory_limit)
-            
-            query = get_query_from_file(f"benchmark-queries/{benchmark}-queries/{query_file}")
-            pid = os.getpid()
+        # set memory limit for the connections
 
-            # hack to (hopefully) clear mmap caches
-            subprocess.call("sudo ./scripts/clear_page_cache.sh", shell=True)
-            for run in ["cold", "hot"]:
-                print(f"{run} run")
+        set_duckdb_memory_limit(connections, config.memory_limit)
+        set_duckdb_threads(connections, config.threads)
+        
+        query = get_query_from_file(f"{get_query_directory(benchmark)}/{query_file}")
 
-                if benchmark == 'operators' and query_file.find("join") >= 1:
-                    for con in connections:
-                        con.sql(DROP_ANSWER_SQL)
-                        time.sleep(3)
+        clear_page_cache(["duckdb"], benchmark, config)
+        statistics = create_hot_run_statistics(config)
+        for run in statistics.runs():
+            print(f"{run} run")
 
-                # Create Threads
-                threads = []
-                for i in range(concurrent_connections):
-                    con = connections[i]
-                    threads.append(threading.Thread(target=execute_query_on_con, args=(con, query,), name=f'thread with con {i}'))
+            if benchmark == 'operators' and query_file.find("join") >= 1:
+                for con in connections:
+                    con.sql(DROP_ANSWER_SQL)
+                    time.sleep(3)
 
+            # Create Threads
+            threads = []
+            for i in range(concurrent_connections):
+                con = connections[i]
+                threads.append(threading.Thread(target=execute_query_on_con, args=(con, query, errors,), name=f'thread with con {i}'))
 
-                query_file_for_memory_polling = query_file
-                query_file_for_memory_polling = query_file_for_memory_polling.replace(".sql", "")
-                if len(config.connections_list) > 1:
-                    query_file_for_memory_polling += f"_{str(concurrent_connections).zfill(2)}_connections"
-                start_polling_mem(query_file_for_memory_polling, "duckdb", config.benchmark_name, benchmark, run, pid)
 
+            query_file_for_memory_polling = query_file
+            query_file_for_memory_polling = query_file_for_memory_polling.replace(".sql", "")
+            if len(config.connections_list) > 1:
+                query_file_for_memory_polling += f"_{str(concurrent_connections).zfill(2)}_connections"
+            sampler = sampling.start(query_file_for_memory_polling, run)
+            start = time.perf_counter()
+
+            def interrupt_connections():
+                for con in connections:
+                    con.interrupt()
+
+            with QueryWatchdog(config.query_timeout, interrupt_connections) as watchdog:
                 # Start threads
                 for t in threads:
                     t.start()
@@ -204,116 +332,425 @@ def run_duckdb_hot_cold(query_file, benchmark, config):
                 for t in threads:
                     t.join()
 
-                # stop polling memory
-                stop_polling_mem(query_file_for_memory_polling)
+            runtime = time.perf_counter() - start
+            # stop polling memory
+            peak_rss = sampling.stop(sampler)
+            statistics.add(run, runtime, peak_rss)
 
+            outcome = classify_error(errors[0], watchdog.timed_out) if len(errors) > 0 else QueryOutcome('success')
+            record_query_outcome("duckdb", benchmark, query_file, config, sampling.run_id(sampler), outcome, runtime, concurrent_connections)
+            if not outcome.is_success():
+                break
 
-                time.sleep(4)
+            time.sleep(4)
 
-            if benchmark == 'operators' and query_file.find("join") >= 1:
-                for con in connections:
-                    con.sql(DROP_ANSWER_SQL)
-                    time.sleep(3)
-            
-        except Exception as e:
-            print(f"Error: {e}")
-        finally:
+        if len(errors) == 0:
+            write_hot_run_statistics(statistics, "duckdb", benchmark, query_file_for_memory_polling, config, concurrent_connections)
+
+        if benchmark == 'operators' and query_file.find("join") >= 1:
             for con in connections:
-                con.close()
-        print(f"done.")
-        time.sleep(5)
+                con.sql(DROP_ANSWER_SQL)
+                time.sleep(3)
+        
+    except Exception as e:
+        print(f"Error: {e}")
+        return False
+    finally:
+        for con in connections:
+            con.close()
+    return len(errors) == 0
+
+def get_worker_memory_limits(config, workers):
+    # memory limit (GB) of the duckdb instance of every worker. 0 means no limit.
+    if config.client_mode == 'processes':
+        return [config.memory_limit] * workers
+    if config.instance_memory_limits is not None:
+        return [config.instance_memory_limits[i % len(config.instance_memory_limits)] for i in range(workers)]
+    # the tenants split the memory limit
+    return [config.memory_limit / workers] * workers
+
+def run_duckdb_process_pool(query_file, benchmark, config, concurrent_connections):
+    # Runs the query on concurrent_connections worker processes at the same
+    # time, each with its own duckdb instance on the database (read only).
+    # The whole pool is sampled in tree mode, proc_tree_mem_info has the
+    # memory of every worker and client_workers maps the pids to the workers.
+    # returns False if the query failed
+    db_file = get_duckdb_database_file(benchmark)
+    memory_limits = get_worker_memory_limits(config, concurrent_connections)
+    temp_directories = [f"{db_file}.tmp/worker_{i}" for i in range(concurrent_connections)]
+    query = get_read_only_query(benchmark, query_file)
+    query_name = query_file.replace(".sql", "")
+    if len(config.connections_list) > 1:
+        query_name += f"_{str(concurrent_connections).zfill(2)}_connections"
+    query_name += f"_{config.client_mode}"
+    mem_db = create_mem_usage_db(config.benchmark_name, benchmark)
+
+    pool = DuckDBProcessPool(db_file, memory_limits, config.threads, temp_directories)
+    cgroup = None
+    success = True
+    try:
+        if config.cgroup:
+            cgroup = create_benchmark_cgroup("duckdb", benchmark, query_file, config)
+        pool.start(cgroup)
+        pids = pool.get_pids()
+        cgroup_path = cgroup.path if cgroup is not None else None
 
-def run_hyper_hot_cold(query_file, benchmark, config):
-    if benchmark == "tpch":
-        db_path = f"{HYPER_TPCH_DATABASE}"
-    elif benchmark == "tpcds":
-        db_path = f"{HYPER_TPCDS_DATABASE}"
+        clear_page_cache(["duckdb"], benchmark, config)
+        statistics = create_hot_run_statistics(config)
+        for run in statistics.runs():
+            print(f"{run} run")
 
-    memory_limit_str = f"{config.memory_limit}g"
-    if config.memory_limit == 0:
+            if benchmark == 'operators' and query_file.find("join") >= 1:
+                pool.run(DROP_ANSWER_SQL)
+                time.sleep(3)
+
+            sampler = start_polling_mem(query_name, "duckdb", config.benchmark_name, benchmark, run, pids[0], config, pids, cgroup_path, concurrent_connections,
+                                        spill_directories=temp_directories, sampler_mode='tree')
+            start = time.perf_counter()
+            with QueryWatchdog(config.query_timeout, pool.interrupt) as watchdog:
+                results = pool.run(query)
+            runtime = time.perf_counter() - start
+            # peak_rss is the one of the first worker, the other workers are in client_worker_mem
+            peak_rss = stop_polling_mem(sampler)
+            statistics.add(run, runtime, peak_rss)
+            write_client_workers(mem_db, sampler.run_id, config.client_mode, memory_limits, temp_directories, results)
+
+            outcome = QueryOutcome('success')
+            for result in results:
+                if result.signal is not None:
+                    outcome = QueryOutcome('killed', signal=result.signal)
+                    break
+                if result.error is not None:
+                    print(f"Error: duckdb worker {result.worker} failed: {result.error}")
+                    outcome = classify_error(result.error, watchdog.timed_out)
+                    break
+            record_query_outcome("duckdb", benchmark, query_file, config, sampler.run_id, outcome, runtime, concurrent_connections)
+            if not outcome.is_success():
+                success = False
+                break
+
+            time.sleep(4)
+
+        if success:
+            write_hot_run_statistics(statistics, "duckdb", benchmark, query_name, config, concurrent_connections)
+
+        if success and benchmark == 'operators' and query_file.find("join") >= 1:
+            pool.run(DROP_ANSWER_SQL)
+    except Exception as e:
+        print(f"Error: {e}")
+        return False
+    finally:
+        pool.close()
+        if cgroup is not None:
+            cgroup.remove()
+    return success
+
+def get_hyper_database_file(benchmark):
+    if get_base_benchmark(benchmark) in SCALABLE_BENCHMARKS:
+        return get_hyper_scaled_database(benchmark)
+    elif benchmark == SYNTHETIC_BENCHMARK:
+        return SYNTHETIC_HYPER_DATABASE
+    print("benchmark provided has no hyper database file")
+    exit(1)
+
+def get_hyper_spill_directories(config):
+    # hyperd doesn't report where it spills to, the directory has to be passed with --hyper_spill_dir
+    return [config.hyper_spill_dir] if config.hyper_spill_dir is not None else []
+
+def get_hyper_process_parameters(memory_limit_str):
+    return {"default_database_version": "2", "memory_limit": memory_limit_str}
+
+def open_hyper_session(query_file, benchmark, config, parameters, memory_limit, cold=False):
+    # starts hyperd if the session can't be reused and records how long the start took
+    session = config.hyper_session
+    reason = session.open(get_hyper_database_file(benchmark), parameters, cold, config.threads)
+    if reason is not None:
+        print(f"started hyperd ({reason}) in {session.startup_time:.2f}s with {session.startup_rss}kB rss")
+        mem_db = create_mem_usage_db(config.benchmark_name, benchmark)
+        write_hyper_startup(mem_db, [config.benchmark_name, benchmark, query_file, memory_limit], session, reason)
+    return session
+
+def get_hyper_memory_limit_str(memory_limit):
+    if memory_limit == 0:
         # default value as quoted here https://help.tableau.com/current/server/en-us/cli_configuration-set_tsm.htm?_gl=1*1lb2mz5*_ga*NjExMDIxMzgzLjE3MDAyMjE1Mjc.*_ga_8YLN0SNXVS*MTcwNDgwMTAwNC40LjEuMTcwNDgwMjE1OC4wLjAuMA
-        memory_limit_str = "80%"
-
-    process_parameters = {"default_database_version": "2", "memory_limit": memory_limit_str}
-    query = get_query_from_file(f"benchmark-queries/{benchmark}-queries/{query_file}")
-    with HyperProcess(telemetry=Telemetry.DO_NOT_SEND_USAGE_DATA_TO_TABLEAU, parameters=process_parameters) as hyper:
-        with Connection(hyper.endpoint, db_path, CreateMode.CREATE_IF_NOT_EXISTS) as con:
-            current_process = psutil.Process()
-            children = current_process.children(recursive=True)
-            if len(children) > 1:
-                print("hyper has too many child processes. aborting")
-                exit(0)
-
-            hyper_pid = children[0].pid
-
-            subprocess.call("sudo ./scripts/clear_page_cache.sh", shell=True)
-            for run in ["cold", "hot"]:
-                print(f"{run} run")
-                if benchmark == 'operators':
-                    con.execute_command(DROP_ANSWER_SQL)
-                    time.sleep(3)
-                start_polling_mem(query_file, "hyper", config.benchmark_name, benchmark, run, hyper_pid)
-                res = con.execute_command(query)
-                stop_polling_mem(query_file)
-                
-                time.sleep(4)
-            if benchmark == 'operators':
-                con.execute_command(DROP_ANSWER_SQL)
+        return "80%"
+    return f"{memory_limit}g"
+
+def run_hyper_hot_cold(query_file, benchmark, config):
+    memory_limit_str = get_hyper_memory_limit_str(config.memory_limit)
+
+    query = get_query_from_file(f"{get_query_directory(benchmark)}/{query_file}")
+    outcome = None
+    try:
+        try:
+            session = open_hyper_session(query_file, benchmark, config, get_hyper_process_parameters(memory_limit_str), config.memory_limit, config.hyper_cold_restart)
+        except Exception as e:
+            # hyperd didn't start, the query fails without a run and the benchmark goes on
+            print(f"Error: could not start hyperd: {e}")
+            outcome = classify_error(e)
+            record_query_outcome("hyper", benchmark, query_file, config, None, outcome, None)
+            return False
+        outcome = run_hyper_connection(query_file, benchmark, config, session, query)
+    finally:
+        if outcome is None or not outcome.is_success():
+            config.hyper_session.mark_failed()
     print(f"done.")
-    time.sleep(5)
+    return outcome.is_success()
 
+def run_hyper_connection(query_file, benchmark, config, session, query):
+    # returns the outcome of the last run
+    if len(session.get_processes()) > 1 and config.sampler_mode != 'tree':
+        print("hyper has too many child processes. aborting. Use --sampler_mode=tree to sample all of them")
+        exit(0)
 
-def run_postgres_hot_cold(query_file, benchmark, config):
-    con = None
-    cursor = None
-    pid = -1
-    if benchmark == "tpch":
-        db_name = "tpch"
-        con = psycopg2.connect(database=db_name, user="postgres", password="password", host="localhost", port=5432)
-        cursor = con.cursor()
-        cursor.execute("select pg_backend_pid();")
-        pid = cursor.fetchmany(1)[0][0]
-    elif benchmark == "tpcds":
-        db_name = "tpcds"
-        con = psycopg2.connect(database="tpcds", user="postgres", password="password", host="localhost", port=5432)
-        cursor = con.cursor()
-        cursor.execute("select pg_backend_pid();")
-        pid = cursor.fetchmany(1)[0][0]
-
-    # current_process = psutil.Process()
-    # children = current_process.children(recursive=True)
-    # if len(children) > 1:
-    #     print("postgres has many child processes. get the frist one")
-
-    postgres_pid = pid
-
-    correlated_queries = ""
-    # Open the file in read mode and read the contents
-    with open(f'postgres_utils/{benchmark}_correlated_subqueries.txt', 'r') as file:
-        correlated_queries = file.read()
-    
-    if correlated_queries.find(query_file) >= 0:
-        print("skipping query. correlated subquery detected")
-        # if the query file has a correlated subquery, then bounce.
+    con = session.con
+    hyper_pid = session.pid
+    hyper_roots = session.roots
+
+    cgroup = None
+    if config.cgroup:
+        cgroup = create_benchmark_cgroup("hyper", benchmark, query_file, config)
+        add_process_tree_to_cgroup(cgroup, hyper_roots)
+    cgroup_path = cgroup.path if cgroup is not None else None
+
+    try:
+        clear_page_cache(["hyper"], benchmark, config)
+        statistics = create_hot_run_statistics(config)
+        for run in statistics.runs():
+            print(f"{run} run")
+            if benchmark == 'operators':
+                con.execute_command(DROP_ANSWER_SQL)
+                time.sleep(3)
+            sampler = start_polling_mem(query_file, "hyper", config.benchmark_name, benchmark, run, hyper_pid, config, hyper_roots, cgroup_path,
+                                        spill_directories=get_hyper_spill_directories(config))
+            start = time.perf_counter()
+            outcome = QueryOutcome('success')
+            with QueryWatchdog(config.query_timeout, con.cancel) as watchdog:
+                try:
+                    res = con.execute_command(query)
+                except Exception as e:
+                    print(f"Error: {e}")
+                    outcome = classify_error(e, watchdog.timed_out)
+                    if not psutil.pid_exists(hyper_pid):
+                        outcome.outcome = 'killed'
+            runtime = time.perf_counter() - start
+            statistics.add(run, runtime, stop_polling_mem(sampler))
+            record_query_outcome("hyper", benchmark, query_file, config, sampler.run_id, outcome, runtime)
+            if not outcome.is_success():
+                return outcome
+
+            time.sleep(4)
+        write_hot_run_statistics(statistics, "hyper", benchmark, query_file.replace('.sql', ''), config)
+        if benchmark == 'operators':
+            con.execute_command(DROP_ANSWER_SQL)
+    finally:
+        if cgroup is not None:
+            cgroup.remove()
+    return outcome
+
+
+def get_postgres_session_settings(config, work_mem=None):
+    # the backend itself is single threaded, threads are the parallel workers per gather node
+    if work_mem is None:
+        work_mem = config.work_mem
+    return PostgresSessionSettings(work_mem, config.hash_mem_multiplier, config.threads)
+
+def execute_query_on_postgres(connection, query, errors):
+    # exceptions don't leave the thread, failed queries are collected in errors
+    thread_name = str(threading.current_thread().name)
+    try:
+        connection.cursor.execute(query)
+    except Exception as e:
+        print(f"Error: {thread_name} failed: {e}")
+        errors.append(e)
         return
+    print(f"{thread_name} done")
 
-    query = get_query_from_file(f"benchmark-queries/{benchmark}-queries/{query_file}")
+def run_postgres_hot_cold(query_file, benchmark, config):
+    success = True
+    for concurrent_connections in config.connections_list:
+        success = run_postgres_connections(query_file, benchmark, config, concurrent_connections) and success
+        print(f"done.")
+        time.sleep(5)
+    return success
+
+def run_postgres_connections(query_file, benchmark, config, concurrent_connections):
+    # returns False if the query failed
+    settings = get_postgres_session_settings(config)
+    connections = config.postgres_pool.get_connections(benchmark, concurrent_connections, settings)
+    errors = []
+    outcome = None
+    cgroup = None
+    try:
+        postgres_pid = connections[0].pid
+        if concurrent_connections > 1 and config.sampler_mode != 'tree':
+            print("only the backend of the first connection is sampled. Use --sampler_mode=tree to sample all of them")
+        # the postmaster is the parent of every backend, parallel worker and background process
+        postmaster_pid = psutil.Process(postgres_pid).ppid()
+        # the values the server actually uses, including the ones it keeps its default for
+        effective_settings = connections[0].get_settings()
+        spill_directories = [connections[0].get_temp_directory()]
+
+        query = get_query_from_file(f"{get_query_directory(benchmark)}/{query_file}")
+        query_name = query_file.replace('.sql', '') + settings.get_query_suffix()
+        if len(config.connections_list) > 1:
+            query_name += f"_{str(concurrent_connections).zfill(2)}_connections"
+
+        # the whole postmaster tree is moved so parallel workers it forks end up in the cgroup as well
+        if config.cgroup:
+            cgroup = create_benchmark_cgroup("postgres", benchmark, query_file, config)
+            add_process_tree_to_cgroup(cgroup, [postmaster_pid])
+        cgroup_path = cgroup.path if cgroup is not None else None
+
+        mem_db = create_mem_usage_db(config.benchmark_name, benchmark)
+        if config.cold_mode == 'evict':
+            # postgres never dropped the whole page cache, it only evicts its own database.
+            # shared_buffers stay warm either way.
+            clear_page_cache(["postgres"], benchmark, config)
+        statistics = create_hot_run_statistics(config)
+        for run in statistics.runs():
+            print(f"{run} run")
+            threads = []
+            for i in range(concurrent_connections):
+                threads.append(threading.Thread(target=execute_query_on_postgres, args=(connections[i], query, errors,), name=f'thread with con {i}'))
 
-    for run in ["cold", "hot"]:
-        print(f"{run} run")
-        start_polling_mem(query_file, "postgres", config.benchmark_name, benchmark, run, postgres_pid)
-        res = cursor.execute(query)
-        stop_polling_mem(query_file)
-        
-        time.sleep(4)
+            sampler = start_polling_mem(query_name, "postgres", config.benchmark_name, benchmark, run, postgres_pid, config, [postmaster_pid], cgroup_path, concurrent_connections,
+                                        spill_directories=spill_directories)
+            start = time.perf_counter()
 
-    con.close()
+            def cancel_connections():
+                # cancel() sends a cancel request for the running query to the postmaster
+                for connection in connections:
+                    connection.con.cancel()
 
-    print(f"done.")
-    time.sleep(5)
+            with QueryWatchdog(config.query_timeout, cancel_connections) as watchdog:
+                for t in threads:
+                    t.start()
+                for t in threads:
+                    t.join()
+
+            runtime = time.perf_counter() - start
+            statistics.add(run, runtime, stop_polling_mem(sampler))
+
+            outcome = classify_error(errors[0], watchdog.timed_out) if len(errors) > 0 else QueryOutcome('success')
+            if not outcome.is_success() and any([not psutil.pid_exists(connection.pid) for connection in connections]):
+                outcome.outcome = 'killed'
+            record_query_outcome("postgres", benchmark, query_file, config, sampler.run_id, outcome, runtime, concurrent_connections)
+            write_postgres_settings(mem_db, sampler.run_id, effective_settings)
+            if not outcome.is_success():
+                break
+
+            time.sleep(4)
+        if outcome.is_success():
+            write_hot_run_statistics(statistics, "postgres", benchmark, query_name, config, concurrent_connections)
+    finally:
+        if cgroup is not None:
+            cgroup.remove()
+        # connections of a failed query may be broken, the pool opens new ones
+        config.postgres_pool.put_connections(benchmark, connections, failed=len(errors) > 0)
+    return outcome is not None and outcome.is_success()
+
+def probe_query(execute, cancel, query_file, system, benchmark, config, limit_mb, pid, tree_roots=None, spill_directories=[]):
+    # runs the query once with the memory limit that is already set and records the samples under run type 'probe'
+    query_name = f"{query_file.replace('.sql', '')}_{limit_mb}MB"
+    sampler = start_polling_mem(query_name, system, config.benchmark_name, benchmark, 'probe', pid, config, tree_roots, memory_limit=limit_mb / 1024, spill_directories=spill_directories)
+    error = None
+    start = time.perf_counter()
+    with QueryWatchdog(config.query_timeout, cancel) as watchdog:
+        try:
+            execute()
+        except Exception as e:
+            outcome = classify_error(e, watchdog.timed_out)
+            error = f"{outcome.outcome}: {outcome.error_class}: {outcome.message}"
+    runtime = time.perf_counter() - start
+    stop_polling_mem(sampler)
+    if error is not None:
+        print(f"probe with {limit_mb}MB failed: {error}")
+    return ProbeResult(limit_mb, error is None, runtime, sampler.peak_rss(), error, sampler.run_id)
+
+def probe_duckdb_memory_limit(query_file, benchmark, config, limit_mb):
+    db_file = get_duckdb_database_file(benchmark)
+    query = get_query_from_file(f"{get_query_directory(benchmark)}/{query_file}")
+    con = duckdb.connect(db_file, read_only=benchmark == "tmm")
+    try:
+        con.sql(f"SET memory_limit='{limit_mb}MB'")
+        if benchmark == 'operators':
+            con.sql(DROP_ANSWER_SQL)
+        return probe_query(lambda: con.execute(query), con.interrupt, query_file, "duckdb", benchmark, config, limit_mb, os.getpid(),
+                           spill_directories=get_duckdb_spill_directories(benchmark))
+    finally:
+        if benchmark == 'operators':
+            con.sql(DROP_ANSWER_SQL)
+        con.close()
+
+def probe_hyper_memory_limit(query_file, benchmark, config, limit_mb):
+    # the memory limit of hyper is a process parameter, the session restarts hyperd for every probed limit
+    query = get_query_from_file(f"{get_query_directory(benchmark)}/{query_file}")
+    result = None
+    try:
+        session = open_hyper_session(query_file, benchmark, config, get_hyper_process_parameters(f"{limit_mb}m"), limit_mb / 1024)
+        con = session.con
+        if benchmark == 'operators':
+            con.execute_command(DROP_ANSWER_SQL)
+        result = probe_query(lambda: con.execute_command(query), con.cancel, query_file, "hyper", benchmark, config, limit_mb, session.pid, session.roots,
+                             get_hyper_spill_directories(config))
+        if benchmark == 'operators':
+            con.execute_command(DROP_ANSWER_SQL)
+    except Exception as e:
+        # hyperd did not start or failed after the query
+        print(f"Error: {e}")
+        if result is None:
+            result = ProbeResult(limit_mb, False, None, None, f"{type(e).__name__}: {e}")
+    if not result.success:
+        config.hyper_session.mark_failed()
+    return result
+
+def probe_postgres_work_mem(query_file, benchmark, config, limit_mb):
+    # postgres has no global memory limit, work_mem limits every sort and hash operator of the query
+    connections = config.postgres_pool.get_connections(benchmark, 1, get_postgres_session_settings(config, work_mem=limit_mb))
+    connection = connections[0]
+    query = get_query_from_file(f"{get_query_directory(benchmark)}/{query_file}")
+    result = None
+    try:
+        postmaster_pid = psutil.Process(connection.pid).ppid()
+        result = probe_query(lambda: connection.cursor.execute(query), connection.con.cancel, query_file, "postgres", benchmark, config, limit_mb, connection.pid, [postmaster_pid],
+                             [connection.get_temp_directory()])
+        return result
+    finally:
+        config.postgres_pool.put_connections(benchmark, connections, failed=result is None or not result.success)
+
+def find_min_memory(query_file, system, benchmark, config):
+    mem_db = create_mem_usage_db(config.benchmark_name, benchmark)
+    skip_reason = get_skip_reason(mem_db, benchmark, system, query_file, config.min_memory_upper_mb / 1024, 1, config.threads, *get_outcome_settings(system, config), config.known_outcomes)
+    if skip_reason is not None:
+        print(f"skipping query, {skip_reason}")
+        return
+    if system == "duckdb":
+        probe = probe_duckdb_memory_limit
+    elif system == "hyper":
+        probe = probe_hyper_memory_limit
+    elif system == "postgres":
+        probe = probe_postgres_work_mem
+    else:
+        print("System must be hyper, duckdb or postgres")
+        exit(1)
+
+    search = MemoryLimitSearch(lambda limit_mb: probe(query_file, benchmark, config, limit_mb), config.min_memory_lower_mb, config.min_memory_upper_mb,
+                               config.min_memory_resolution_mb, config.degradation_factor)
+    min_success_mb, min_no_degradation_mb = search.search()
+    print(f"{system} {query_file}: succeeds with {min_success_mb}MB, no degradation with {min_no_degradation_mb}MB")
+    write_search_results(mem_db, [config.benchmark_name, benchmark, system, query_file.replace('.sql', '')], search, min_success_mb, min_no_degradation_mb)
+
+def get_read_only_query(benchmark, query_file):
+    query = get_query_from_file(f"{get_query_directory(benchmark)}/{query_file}")
+    if benchmark == 'operators':
+        # join operators store their result in ans. a temp table is private to
+        # the connection, so connections running the same join don't collide.
+        query = query.replace("create table ans as", "create or replace temp table ans as")
+    return query
 
 def continuous_benchmark_run(query_file_names, benchmark, config):
-    if benchmark == 'operators' and query_file.find("join") >= 1:
+    if config.workload is None and benchmark == 'operators' and any([query_file.find("join") >= 1 for query_file in query_file_names]):
         print("Cannot run continous benchmark on operators queries")
         exit(1)
     if config.systems[0] != 'duckdb' or len(config.systems) > 1:
@@ -323,21 +760,10 @@ def continuous_benchmark_run(query_file_names, benchmark, config):
             # setup connections here.
             connections = []
             
-            db_file = "__NOT_EXISTS__.duckdb"
-            if benchmark == "tmm":
-                db_file = TMM_DATABASE
-            elif benchmark == "tpch":
-                db_file = TPCH_SF100_DATABASE
-            elif benchmark == "tpch-sf10":
-                db_file = TPCH_SF10_DATABASE
-            else:
-                print("benchmark provided has no database file")
-                exit(1)
+            db_file = get_duckdb_database_file(benchmark)
 
             # continuous benchmark read only is always true
             read_only = True
-            if not os.path.isfile(db_file):
-                print(f"Could not find database file {db_file}. Please create the database file")
 
             for i in range(concurrent_connections):
                 con = duckdb.connect(db_file, read_only=read_only)
@@ -346,23 +772,55 @@ def continuous_benchmark_run(query_file_names, benchmark, config):
             # set memory limit for the connections
 
             set_duckdb_memory_limit(connections, config.memory_limit)
+            set_duckdb_threads(connections, config.threads)
             queries = []
-            for query_file in query_file_names:
-                queries.append(get_query_from_file(f"benchmark-queries/{benchmark}-queries/{query_file}"))
+            query_tags = []
+            query_streams = [None] * concurrent_connections
+            thread_names = [f"thread_{i}" for i in range(concurrent_connections)]
+            if config.workload is not None:
+                # the workload brings its own queries and a stream for every connection
+                for query_benchmark, query_file in config.workload.queries:
+                    queries.append(get_read_only_query(query_benchmark, query_file))
+                query_tags = config.workload.get_query_tags()
+                query_streams = config.workload.create_query_streams()
+                thread_names = [stream.name for stream in query_streams]
+            else:
+                for query_file in query_file_names:
+                    queries.append(get_query_from_file(f"{get_query_directory(benchmark)}/{query_file}"))
+                    query_tags.append(query_file.replace('.sql', ''))
 
             pid = os.getpid()
 
+            # the latencies of every thread are streamed to parquet files while it runs
+            performance_dir = f"{config.benchmark_name}/{benchmark}/continuous_{str(concurrent_connections).zfill(2)}_connections"
+            os.makedirs(performance_dir, exist_ok=True)
+            epoch = time.perf_counter_ns()
+
             # Create Threads
             threads = []
+            dispatcher = None
+            if config.arrival != 'closed':
+                # open loop: queries arrive on a schedule and wait for the next free connection
+                schedule = ArrivalSchedule(config.arrival, config.arrival_rate, config.ramp_end_rate, config.ramp_steps, config.continuous_time_limit, config.arrival_seed)
+                dispatcher = OpenLoopDispatcher(schedule, len(queries), epoch, f"{performance_dir}/arrivals.parquet")
             for i in range(concurrent_connections):
                 con = connections[i]
-                threads.append(duckdb_thread(f"thread_{i}", con, config.continuous, queries))
+                name = thread_names[i]
+                recorder = LatencyRecorder(name, epoch, f"{performance_dir}/{name}_performance.parquet", f"{performance_dir}/{name}_latency_histogram.parquet")
+                if dispatcher is not None:
+                    threads.append(OpenLoopWorker(name, con, dispatcher, queries, query_tags, recorder))
+                else:
+                    threads.append(duckdb_thread(name, con, config.continuous, queries, query_tags, recorder, query_streams[i]))
+            if dispatcher is not None:
+                # started after the workers and stopped before them
+                threads.append(dispatcher)
 
 
             query_file_for_memory_polling = config.benchmark_name + "_continuous_memory_profile.sql"
             query_file_for_memory_polling = query_file_for_memory_polling.replace(".sql", "")
             query_file_for_memory_polling += f"_{str(concurrent_connections).zfill(2)}_connections"
-            start_polling_mem(query_file_for_memory_polling, "duckdb", config.benchmark_name, benchmark, 'hot', pid)
+            sampler = start_polling_mem(query_file_for_memory_polling, "duckdb", config.benchmark_name, benchmark, 'hot', pid, config, connections=concurrent_connections,
+                                        spill_directories=[f"{db_file}.tmp"])
 
             # Start threads
             for t in threads:
@@ -373,7 +831,7 @@ def continuous_benchmark_run(query_file_names, benchmark, config):
                 time.sleep(config.continuous_time_limit)
 
                 # stop Threads
-                for t in threads:
+                for t in reversed(threads):
                     print(f"stopping thread {t.name}")
                     t.stop()
 
@@ -382,20 +840,25 @@ def continuous_benchmark_run(query_file_names, benchmark, config):
                 t.join()
 
             # stop polling memory
-            stop_polling_mem(query_file_for_memory_polling)
+            stop_polling_mem(sampler)
             time.sleep(5)
             mem_db = get_mem_usage_db_file(config.benchmark_name, benchmark)
 
             con = duckdb.connect(mem_db)
-            table_name = f"thread_performance_{concurrent_connections}_threads"
+            table_prefix = ""
             if not config.continuous and len(query_file_names) == 1:
-                table_name = f"{query_file_names[0].replace('.sql', '')}_thread_performance_{concurrent_connections}_threads"
-            con.sql(f"create table {table_name} as (select * from read_parquet('*_performance.parquet', UNION_BY_NAME=TRUE))")
+                table_prefix = f"{query_file_names[0].replace('.sql', '')}_"
+            # queries and latency percentiles per thread, query and second
+            con.sql(f"create table {table_prefix}thread_performance_{concurrent_connections}_threads as (select * from read_parquet('{performance_dir}/*_performance.parquet'))")
+            # latency histogram per thread and query over the whole run
+            con.sql(f"create table {table_prefix}latency_histogram_{concurrent_connections}_threads as (select * from read_parquet('{performance_dir}/*_latency_histogram.parquet'))")
+            if dispatcher is not None:
+                # offered load per second
+                con.sql(f"create table arrivals_{concurrent_connections}_threads as (select * from read_parquet('{performance_dir}/arrivals.parquet'))")
             con.close()
-            for f in glob.glob('_performance.parquet'):
-                os.remove(f)
-            for f in glob.glob('_performance.csv'):
+            for f in glob.glob(f'{performance_dir}/*.parquet'):
                 os.remove(f)
+            os.rmdir(performance_dir)
 
         except Exception as e:
             print(f"Error: {e}")
@@ -405,15 +868,162 @@ def continuous_benchmark_run(query_file_names, benchmark, config):
         print(f"done.")
         time.sleep(5)
 
+class ContentionSystem():
+    # the connections of one system during a contention phase and what its sampler samples
+    def __init__(self, tenant, connections, pid, tree_roots, sampler_mode, spill_directories, release):
+        self.tenant = tenant
+        self.connections = connections
+        self.pid = pid
+        self.tree_roots = tree_roots
+        self.sampler_mode = sampler_mode
+        self.spill_directories = spill_directories
+        # release(failed) closes the connections or gives them back
+        self.release = release
+
+def open_contention_system(tenant, benchmark, config, name):
+    count = tenant.workload.get_connections()
+    if tenant.system == 'duckdb':
+        db_file = get_duckdb_database_file(benchmark)
+        cons = [duckdb.connect(db_file, read_only=True) for i in range(count)]
+        set_duckdb_memory_limit(cons, tenant.memory_limit)
+        set_duckdb_threads(cons, config.threads)
+        connections = [DuckDBContentionConnection(con) for con in cons]
+        def release(failed):
+            for connection in connections:
+                connection.close()
+        # duckdb runs inside the runner. status mode, a tree below the runner would include hyperd
+        return ContentionSystem(tenant, connections, os.getpid(), None, 'status', get_duckdb_spill_directories(benchmark), release)
+    elif tenant.system == 'hyper':
+        session = open_hyper_session(name, benchmark, config, get_hyper_process_parameters(get_hyper_memory_limit_str(tenant.memory_limit)), tenant.memory_limit)
+        connections = [HyperContentionConnection(session.connect()) for i in range(count)]
+        def release(failed):
+            for connection in connections:
+                connection.close()
+            if failed:
+                session.mark_failed()
+        return ContentionSystem(tenant, connections, session.pid, session.roots, 'tree', get_hyper_spill_directories(config), release)
+    else:
+        pooled = config.postgres_pool.get_connections(benchmark, count, get_postgres_session_settings(config, tenant.work_mem))
+        def release(failed):
+            config.postgres_pool.put_connections(benchmark, pooled, failed)
+        # the postmaster is the parent of every backend and parallel worker
+        postmaster_pid = psutil.Process(pooled[0].pid).ppid()
+        return ContentionSystem(tenant, [PostgresContentionConnection(connection) for connection in pooled], pooled[0].pid, [postmaster_pid], 'tree',
+                                [pooled[0].get_temp_directory()], release)
+
+def run_contention_phase(phase, tenants, benchmark, config):
+    # Runs the query streams of all tenants at the same time for the duration
+    # of the contention. Every system gets its own sampler (and run in runs),
+    # all samplers use the monotonic clock, so their samples and the queries
+    # in contention_queries share one timeline.
+    spec = config.contention
+    mem_db = create_mem_usage_db(config.benchmark_name, benchmark)
+    systems = []
+    clients = {}
+    samplers = {}
+    try:
+        for tenant in tenants:
+            systems.append(open_contention_system(tenant, benchmark, config, spec.name))
+        # after the connections are open, the postgres database directory is only known then
+        clear_page_cache([tenant.system for tenant in tenants], benchmark, config)
+        for system in systems:
+            workload = system.tenant.workload
+            queries = []
+            for query_benchmark, query_file in workload.queries:
+                if system.tenant.system == 'duckdb':
+                    queries.append(get_read_only_query(query_benchmark, query_file))
+                else:
+                    queries.append(get_query_from_file(f"{get_query_directory(query_benchmark)}/{query_file}"))
+            clients[system.tenant.system] = [ContentionClient(stream.name, connection, queries, workload.get_query_tags(), stream)
+                                             for stream, connection in zip(workload.create_query_streams(), system.connections)]
+        for system in systems:
+            samplers[system.tenant.system] = start_polling_mem(spec.name, system.tenant.system, config.benchmark_name, benchmark, phase, system.pid, config, system.tree_roots,
+                                                               connections=len(system.connections), memory_limit=system.tenant.memory_limit,
+                                                               spill_directories=system.spill_directories, sampler_mode=system.sampler_mode)
+        for system_clients in clients.values():
+            for client in system_clients:
+                client.start()
+        time.sleep(spec.duration)
+        for system_clients in clients.values():
+            for client in system_clients:
+                client.stop()
+        for system_clients in clients.values():
+            for client in system_clients:
+                client.join()
+    finally:
+        for system_name, sampler in samplers.items():
+            stop_polling_mem(sampler)
+            write_contention_queries(mem_db, sampler.run_id, clients[system_name])
+        for system in systems:
+            system_clients = clients.get(system.tenant.system, [])
+            failed = any([outcome not in ['success', 'cancelled'] for client in system_clients for _, _, _, outcome in client.executions])
+            system.release(failed)
+
+def run_contention(benchmark, config):
+    # every system runs its streams alone (solo) and then together with the
+    # others (contention). the slowdown of each system is its runtime under
+    # contention against its solo runtime.
+    spec = config.contention
+    tenants = spec.get_tenants(benchmark, get_query_file_names, config.memory_limit, config.work_mem)
+    if spec.solo:
+        for tenant in tenants:
+            print(f"running {tenant.system} alone for {spec.duration}s")
+            run_contention_phase('solo', [tenant], benchmark, config)
+            time.sleep(spec.cooldown)
+    print(f"running {', '.join([tenant.system for tenant in tenants])} together for {spec.duration}s")
+    run_contention_phase('contention', tenants, benchmark, config)
+    if spec.solo:
+        write_contention_slowdown(create_mem_usage_db(config.benchmark_name, benchmark), config.benchmark_name, benchmark, spec.name)
+
 def profile_query_mem(query_file, benchmark, config):
-    for system in config.systems:
-        print(f"profiling memory for {system}. query {query_file}")
-        run_query(query_file, system, benchmark, config)
-        print(f"done profiling")
+    for threads in config.threads_list:
+        config.threads = threads
+        for system in config.systems:
+            print(f"profiling memory for {system}. query {query_file} threads {threads}")
+            run_query(query_file, system, benchmark, config)
+            print(f"done profiling")
+
+def run_experiment(query_file_names, benchmark, config):
+    # runs every cell of the experiment matrix once. cells that completed in an
+    # earlier run of the same experiment are skipped, failed ones are retried
+    # until they used up max_attempts.
+    mem_db = create_mem_usage_db(config.benchmark_name, benchmark)
+    cells = get_experiment_cells(config.experiment_matrix, benchmark, query_file_names)
+    print(f"experiment has {len(cells)} combinations for {benchmark}")
+    for cell in cells:
+        con = duckdb.connect(mem_db)
+        status, attempts = get_checkpoint(con, cell)
+        if status == 'done' or (status is not None and attempts >= config.max_attempts):
+            con.close()
+            print(f"skipping {cell}: {status} after {attempts} attempts")
+            continue
+        start_checkpoint(con, cell)
+        con.close()
+
+        print(f"running {cell}")
+        config.memory_limit = cell.memory_limit
+        config.connections_list = [cell.connections]
+        config.threads = cell.threads
+        config.work_mem = cell.work_mem
+        config.hash_mem_multiplier = cell.hash_mem_multiplier
+        error = None
+        try:
+            # a cell that failed or was interrupted is retried even if its outcome would skip it,
+            # a skipped one is checked against the earlier outcomes again
+            success = run_query(cell.query_file, cell.system, benchmark, config, retry=status in ('failed', 'running'))
+        except Exception as e:
+            print(f"Error: {e}")
+            success = False
+            error = f"{type(e).__name__}: {e}"
+
+        con = duckdb.connect(mem_db)
+        finish_checkpoint(con, cell, success, error)
+        con.close()
 
 def get_query_file_names(benchmark):
     # Get the absolute path to the specified directory
-    directory_path = os.path.abspath(f"./benchmark-queries/{benchmark}-queries/")
+    # every scale factor of a benchmark runs the same queries
+    directory_path = os.path.abspath(get_query_directory(benchmark))
 
     # Initialize an empty list to store file names
     file_list = []
@@ -434,7 +1044,10 @@ def get_query_file_names(benchmark):
 
 def main(config):
     overwrite = False
-    if os.path.isdir(config.benchmark_name):
+    if config.experiment_matrix is not None:
+        # experiments resume from their checkpoints, the results of earlier runs are kept
+        os.makedirs(config.benchmark_name, exist_ok=True)
+    elif os.path.isdir(config.benchmark_name):
         print(f"benchmark {config.benchmark_name} already exists. Going to overwrite")
         overwrite = True
     else:
@@ -444,28 +1057,69 @@ def main(config):
         if not os.path.isdir(f"{config.benchmark_name}/{benchmark}"):
             os.makedirs(f"{config.benchmark_name}/{benchmark}")
 
+        # databases of other scale factors than sf100 are generated the first time they are needed
+        systems = config.systems if config.contention is None else [system['system'] for system in config.contention.systems]
+        prepare_scaled_databases(benchmark, systems, config.args.postgres_host, config.args.postgres_port, config.args.postgres_user, config.args.postgres_password)
+        if benchmark == SYNTHETIC_BENCHMARK:
+            # the tables and queries are generated from the spec before the queries are listed
+            prepare_synthetic_benchmark(config.synthetic, systems, config.args.postgres_host, config.args.postgres_port, config.args.postgres_user, config.args.postgres_password)
+
         query_file_names = get_query_file_names(benchmark)
         mem_db = get_mem_usage_db_file(config.benchmark_name, benchmark)
         if overwrite and os.path.exists(mem_db):
             os.remove(mem_db)
+        if benchmark == SYNTHETIC_BENCHMARK:
+            copy_synthetic_queries(create_mem_usage_db(config.benchmark_name, benchmark), config.benchmark_name)
 
         # if we are continuously running the benchmark,
         if config.continuous:
             continuous_benchmark_run(query_file_names, benchmark, config)
+        elif config.contention is not None:
+            run_contention(benchmark, config)
+        elif config.experiment_matrix is not None:
+            run_experiment(query_file_names, benchmark, config)
+        elif config.find_min_memory:
+            for query_file in query_file_names:
+                for system in config.systems:
+                    print(f"searching the minimum memory limit for {system}. query {query_file}")
+                    find_min_memory(query_file, system, benchmark, config)
+            con = duckdb.connect(mem_db)
+            con.sql("select system, query_name, baseline_runtime, min_success_mb, min_no_degradation_mb from min_memory_limits order by query_name, system").show(max_rows=1000)
+            con.close()
         else:
             for query_file in query_file_names:
                 profile_query_mem(query_file, benchmark, config)
 
-        # write the duckdb to csv 
+        # a hyperd and the postgres pool are bound to the database of the benchmark
+        config.hyper_session.close()
+        config.postgres_pool.close()
+
+        # speedup and peak rss of the queries that ran with more than one thread count
+        write_thread_scaling(create_mem_usage_db(config.benchmark_name, benchmark), config.benchmark_name, benchmark)
+
+        # export the results of all systems
         con = duckdb.connect(mem_db)
-        print("copying data to csv")
-        csv_result_file_duckdb = f"{config.benchmark_name}/{benchmark}-duckdb-results"
-        csv_result_file_hyper = f"{config.benchmark_name}/{benchmark}-hyper-results"
-        con.sql(f"copy time_info to '{csv_result_file_duckdb}.csv' (FORMAT CSV, HEADER 1)")
-        con.sql(f"copy proc_mem_info to '{csv_result_file_hyper}.csv' (FORMAT CSV, HEADER 1)")
+        print("exporting data to parquet")
+        export_parquet(con, f"{config.benchmark_name}/results", benchmark)
+        if config.csv:
+            print("copying data to csv")
+            export_csv(con, f"{config.benchmark_name}/{benchmark}/csv")
         # os.remove(mem_db)
         con.close()
 
+    # fit the memory and runtime of every query against the data size of the scale factors it ran at
+    for base_benchmark in dict.fromkeys([get_base_benchmark(benchmark) for benchmark in config.benchmarks]):
+        scaled_data_dbs = {get_scale_factor(benchmark): get_mem_usage_db_file(config.benchmark_name, benchmark) for benchmark in config.benchmarks
+                           if get_base_benchmark(benchmark) == base_benchmark and get_scale_factor(benchmark) is not None}
+        if len(scaled_data_dbs) < 2:
+            continue
+        print(f"fitting the scaling of {base_benchmark} over scale factors {sorted(scaled_data_dbs)}")
+        mem_db = create_mem_usage_db(config.benchmark_name, base_benchmark)
+        write_scaling_fits(mem_db, config.benchmark_name, base_benchmark, scaled_data_dbs)
+        con = duckdb.connect(mem_db)
+        export_parquet(con, f"{config.benchmark_name}/results", base_benchmark)
+        con.close()
+
 
 
 class BenchmarkConfig:
@@ -481,18 +1135,99 @@ class BenchmarkConfig:
         parser.add_argument('--connections_list', nargs="+", help="number of concurrent connections", default=['1'])
         parser.add_argument('--continuous', type=bool, help='run queries continuously for some time limit', default=False)
         parser.add_argument('--continuous_time_limit', type=int, help='time limit (in seconds) for continuous queries', default=600)
+        parser.add_argument('--sample_interval_ms', type=int, help='interval (in milliseconds) between two memory samples', default=int(DEFAULT_SAMPLE_INTERVAL * 1000))
+        parser.add_argument('--cgroup', action='store_true', help='run each system in its own cgroup v2 with memory.max set to --memory_limit. needs root')
+        parser.add_argument('--cgroup_parent', type=str, help='parent cgroup (below /sys/fs/cgroup) of the per run cgroups', default=DEFAULT_CGROUP_PARENT)
+        parser.add_argument('--cgroup_high_ratio', type=float, help='memory.high of the cgroup as a fraction of --memory_limit', default=DEFAULT_MEMORY_HIGH_RATIO)
+        parser.add_argument('--cold_mode', type=str, help='how the page cache is emptied before the first run of a query. \'drop_caches\' drops the whole page cache of the host (needs sudo). \'evict\' only evicts the database files of the system with fadvise', default='drop_caches')
+        parser.add_argument('--residency_interval', type=float, help='seconds between two scans of how much of the database files is in the page cache (page_cache_info). 0 disables it', default=DEFAULT_RESIDENCY_SCAN_INTERVAL)
+        parser.add_argument('--sampler_mode', type=str, help='\'status\' samples /proc/<pid>/status of the engine process. \'tree\' also samples smaps_rollup (rss, pss, uss) of every process of the engine', default='status')
+        parser.add_argument('--find_min_memory', action='store_true', help='search the smallest memory limit (work_mem for postgres) each query succeeds with instead of running the benchmark')
+        parser.add_argument('--min_memory_lower_mb', type=int, help='smallest memory limit (in MB) --find_min_memory probes', default=DEFAULT_LOWER_LIMIT_MB)
+        parser.add_argument('--min_memory_upper_mb', type=int, help='memory limit (in MB) of the baseline run of --find_min_memory. defaults to --memory_limit or the memory of the machine')
+        parser.add_argument('--min_memory_resolution_mb', type=int, help='--find_min_memory stops when the limits are this close (in MB)', default=DEFAULT_RESOLUTION_MB)
+        parser.add_argument('--degradation_factor', type=float, help='a query is degraded if it runs this many times slower than at the baseline limit', default=DEFAULT_DEGRADATION_FACTOR)
+        parser.add_argument('--csv', action='store_true', help='also export every result table to <benchmark_name>/<benchmark>/csv/<table>.csv')
+        parser.add_argument('--contention', type=str, help='toml file with the systems that run at the same time and their query streams, see experiments/tpch-contention.toml. ignores --system')
+        parser.add_argument('--client_mode', type=str, help='how duckdb runs concurrent connections. \'threads\': threads of the runner on one instance. \'processes\': a worker process per connection, each with its own instance on the same database (read only) and --memory_limit. \'instances\': like processes, but the workers split --memory_limit', default='threads')
+        parser.add_argument('--instance_memory_limits', type=float, nargs='+', help='memory limit (GB) of every instance with --client_mode=instances, repeated if there are more connections than limits')
+        parser.add_argument('--threads', type=int, help='threads per query (duckdb threads, postgres parallel workers per gather, cpus hyperd is pinned to). 0 uses the default of the system', default=0)
+        parser.add_argument('--threads_list', type=int, nargs='+', help='run every query with each of these --threads')
+        parser.add_argument('--experiment', type=str, help='toml file with an experiment matrix. runs are checkpointed, running the same experiment again resumes it')
+        parser.add_argument('--warmup_runs', type=int, help='unmeasured runs between the cold and the hot runs of a query', default=0)
+        parser.add_argument('--hot_runs', type=int, help='measured hot runs per query', default=1)
+        parser.add_argument('--adaptive_hot_runs', action='store_true', help='repeat hot runs until the 95%% confidence interval of runtime and peak rss is within --ci_target of the mean')
+        parser.add_argument('--max_hot_runs', type=int, help='upper bound of the hot runs of a query with --adaptive_hot_runs', default=DEFAULT_MAX_HOT_RUNS)
+        parser.add_argument('--ci_target', type=float, help='half width of the confidence interval relative to the mean that --adaptive_hot_runs stops at', default=DEFAULT_CI_TARGET)
+        parser.add_argument('--hot_time_budget', type=int, help='seconds a query may spend on hot runs with --adaptive_hot_runs', default=DEFAULT_HOT_TIME_BUDGET)
+        parser.add_argument('--query_timeout', type=int, help='seconds after which a running query is cancelled. 0 means no timeout', default=0)
+        parser.add_argument('--hyper_cold_restart', action='store_true', help='restart hyperd before the cold run of every query. by default hyperd keeps running across queries and only restarts after a failure')
+        parser.add_argument('--postgres_host', type=str, help='host of the postgres server', default='localhost')
+        parser.add_argument('--postgres_port', type=int, help='port of the postgres server', default=5432)
+        parser.add_argument('--postgres_user', type=str, help='postgres user', default='postgres')
+        parser.add_argument('--postgres_password', type=str, help='password of the postgres user. defaults to PGPASSWORD or ~/.pgpass')
+        parser.add_argument('--work_mem', type=int, help='postgres work_mem (in MB) of every connection. 0 uses the default of the server', default=0)
+        parser.add_argument('--hash_mem_multiplier', type=float, help='postgres hash_mem_multiplier of every connection. 0 uses the default of the server', default=0)
+        parser.add_argument('--hyper_spill_dir', type=str, help='directory hyperd spills to. its size is sampled like the temp directories of duckdb and postgres')
+        parser.add_argument('--arrival', type=str, help='how queries arrive in continuous mode. \'closed\' starts the next query when the previous one finished, \'constant\', \'poisson\' and \'ramp\' arrive at --arrival_rate independent of the connections (open loop)', default='closed')
+        parser.add_argument('--arrival_rate', type=float, help='queries per second in open loop mode. the first step of a ramp')
+        parser.add_argument('--ramp_end_rate', type=float, help='queries per second of the last step of a ramp')
+        parser.add_argument('--ramp_steps', type=int, help='number of steps of a ramp, each lasts --continuous_time_limit / --ramp_steps seconds', default=DEFAULT_RAMP_STEPS)
+        parser.add_argument('--arrival_seed', type=int, help='seed of the random arrivals')
+        parser.add_argument('--workload', type=str, help='toml file with a weighted query mix per connection for continuous mode, see workloads/')
+        parser.add_argument('--scale_factors', type=int, nargs='+', help=f'run tpch and tpcds at these scale factors (e.g. {" ".join([str(sf) for sf in SCALE_FACTORS])}) and fit memory and runtime of every query against the data size. missing databases are generated')
+        parser.add_argument('--synthetic', type=str, help='toml file with the aggregations and joins of the synthetic benchmark', default=DEFAULT_SYNTHETIC_SPEC)
+        parser.add_argument('--known_outcomes', type=str, help='data.duckdb of an earlier benchmark. queries that failed there are skipped as well')
         self.args = parser.parse_args()
 
     def parse_args_and_setup(self):
+        self.experiment_matrix = None
+        self.max_attempts = 1
+        if self.args.experiment is not None:
+            try:
+                settings, self.experiment_matrix = load_experiment(self.args.experiment)
+            except (OSError, ValueError) as e:
+                print(f"Error: could not load experiment: {e}")
+                exit(1)
+            self.max_attempts = settings['max_attempts']
+            if 'query_timeout' in settings:
+                self.args.query_timeout = settings['query_timeout']
+            if self.args.benchmark_name is None:
+                self.args.benchmark_name = settings.get('benchmark_name')
+            self.args.system = ",".join(self.experiment_matrix['systems'])
+            self.args.benchmark = ",".join(self.experiment_matrix['benchmarks'])
+
+        if self.args.benchmark_name is None:
+            print("please pass benchmark name")
+            exit(1)
         self.benchmark_name = "benchmarks/" + self.args.benchmark_name
         
-        if self.args.system not in ["hyper", "duckdb", "all", "postgres"]:
+        if self.args.system is None or any([system not in ["hyper", "duckdb", "all", "postgres"] for system in self.args.system.split(",")]):
             print("Usage: python3 duckdb_vs_hyper/run_benchmark.py --benchmark_name=[name] --benchmark=[tpch|aggr-thin|aggr-wide|join|tpcds] --system=[duckdb|hyper|all]")
             exit(1)
 
         self.benchmarks = self.args.benchmark.split(",")
         if self.args.benchmark == 'all':
             benchmarks = ['tpch', 'operators', 'tpcds']
+        self.synthetic = None
+        if SYNTHETIC_BENCHMARK in self.benchmarks:
+            try:
+                self.synthetic = load_synthetic(self.args.synthetic)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Could not load synthetic {self.args.synthetic}: {e}")
+                exit(1)
+        if self.args.scale_factors is not None:
+            if min(self.args.scale_factors) < 1:
+                print("--scale_factors must be at least 1.")
+                exit(1)
+            # tpch -> tpch-sf1, tpch-sf10, ... the other benchmarks have no scale factor and run once
+            scaled_benchmarks = []
+            for benchmark in self.benchmarks:
+                if get_base_benchmark(benchmark) in SCALABLE_BENCHMARKS:
+                    scaled_benchmarks += [get_scaled_benchmark(benchmark, scale_factor) for scale_factor in self.args.scale_factors]
+                else:
+                    scaled_benchmarks.append(benchmark)
+            self.benchmarks = list(dict.fromkeys(scaled_benchmarks))
 
 
         self.memory_limit = self.args.memory_limit
@@ -508,11 +1243,6 @@ class BenchmarkConfig:
             if system_ not in VALID_SYSTEMS:
                 print("please pass valid system names. Valid systems are " + str(VALID_SYSTEMS))
 
-        if self.benchmark_name is None:
-            # create benchmark name
-            print("please pass benchmark name")
-            exit(1)
-
         self.connections_list = list(map(lambda x: int(x), self.args.connections_list))
         self.continuous = self.args.continuous
 
@@ -521,6 +1251,157 @@ class BenchmarkConfig:
             print("continuous time limit must be greater than or equal to 1 second. Deafult is 600 seconds.")
             exit(1)
 
+        self.sample_interval = self.args.sample_interval_ms / 1000
+        if self.sample_interval <= 0:
+            print("sample interval must be greater than 0 milliseconds.")
+            exit(1)
+
+        self.sampler_mode = self.args.sampler_mode
+        self.cold_mode = self.args.cold_mode
+        if self.cold_mode not in COLD_MODES:
+            print(f"--cold_mode must be one of {COLD_MODES}.")
+            exit(1)
+        self.residency_interval = self.args.residency_interval
+        if self.residency_interval < 0:
+            print("--residency_interval must be 0 (disabled) or more.")
+            exit(1)
+        if self.sampler_mode not in SAMPLER_MODES:
+            print("please pass a valid sampler mode. Valid modes are " + str(SAMPLER_MODES))
+            exit(1)
+
+        self.cgroup = self.args.cgroup
+        self.cgroup_parent = self.args.cgroup_parent
+        self.cgroup_high_ratio = self.args.cgroup_high_ratio
+        if self.cgroup and self.memory_limit <= 0 and self.experiment_matrix is None:
+            print("--cgroup needs a --memory_limit greater than 0.")
+            exit(1)
+        if self.cgroup and self.experiment_matrix is not None and min(self.experiment_matrix['memory_limits']) <= 0:
+            print("--cgroup needs every memory limit of the experiment to be greater than 0.")
+            exit(1)
+        if self.cgroup_high_ratio <= 0 or self.cgroup_high_ratio > 1:
+            print("--cgroup_high_ratio must be between 0 and 1.")
+            exit(1)
+
+        self.csv = self.args.csv
+        self.query_timeout = self.args.query_timeout
+        if self.query_timeout < 0:
+            print("--query_timeout must be 0 (no timeout) or more.")
+            exit(1)
+        self.known_outcomes = self.args.known_outcomes
+        self.hyper_cold_restart = self.args.hyper_cold_restart
+        self.hyper_spill_dir = self.args.hyper_spill_dir
+        self.arrival = self.args.arrival
+        self.arrival_rate = self.args.arrival_rate
+        self.ramp_end_rate = self.args.ramp_end_rate
+        self.ramp_steps = self.args.ramp_steps
+        self.arrival_seed = self.args.arrival_seed
+        if self.arrival not in ARRIVAL_MODES:
+            print(f"--arrival must be one of {ARRIVAL_MODES}.")
+            exit(1)
+        if self.arrival != 'closed' and (not self.continuous or self.arrival_rate is None or self.arrival_rate <= 0):
+            print("open loop arrivals need --continuous=True and an --arrival_rate greater than 0.")
+            exit(1)
+        self.workload = None
+        if self.args.workload is not None:
+            if not self.continuous or self.arrival != 'closed':
+                print("--workload needs --continuous=True and closed loop arrivals.")
+                exit(1)
+            try:
+                self.workload = load_workload(self.args.workload, get_query_file_names)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Could not load workload {self.args.workload}: {e}")
+                exit(1)
+            # every connection of the workload runs its own stream
+            self.connections_list = [self.workload.get_connections()]
+        if self.arrival == 'ramp' and (self.ramp_end_rate is None or self.ramp_end_rate <= 0 or self.ramp_steps < 1):
+            print("a ramp needs a --ramp_end_rate greater than 0 and at least 1 step.")
+            exit(1)
+        self.hyper_session = HyperSession()
+        self.work_mem = self.args.work_mem
+        self.hash_mem_multiplier = self.args.hash_mem_multiplier
+        if self.work_mem < 0 or self.hash_mem_multiplier < 0:
+            print("--work_mem and --hash_mem_multiplier must be 0 (server default) or more.")
+            exit(1)
+        if self.known_outcomes is not None and not os.path.isfile(self.known_outcomes):
+            print(f"Could not find {self.known_outcomes}")
+            exit(1)
+        self.warmup_runs = self.args.warmup_runs
+        self.hot_runs = self.args.hot_runs
+        self.adaptive_hot_runs = self.args.adaptive_hot_runs
+        self.max_hot_runs = self.args.max_hot_runs
+        self.ci_target = self.args.ci_target
+        self.hot_time_budget = self.args.hot_time_budget
+        if self.warmup_runs < 0 or self.hot_runs < 1:
+            print("--warmup_runs must be 0 or more and --hot_runs at least 1.")
+            exit(1)
+        if self.ci_target <= 0:
+            print("--ci_target must be greater than 0.")
+            exit(1)
+        self.threads = self.args.threads
+        self.threads_list = self.args.threads_list if self.args.threads_list is not None else [self.threads]
+        if min([self.threads] + self.threads_list) < 0:
+            print("--threads and --threads_list must be 0 (system default) or more.")
+            exit(1)
+        if self.args.threads_list is not None:
+            self.threads = self.threads_list[0]
+        self.find_min_memory = self.args.find_min_memory
+        self.min_memory_lower_mb = self.args.min_memory_lower_mb
+        self.min_memory_upper_mb = self.args.min_memory_upper_mb
+        if self.min_memory_upper_mb is None:
+            if self.memory_limit > 0:
+                self.min_memory_upper_mb = self.memory_limit * 1024
+            else:
+                self.min_memory_upper_mb = psutil.virtual_memory().total // (1024 * 1024)
+        self.min_memory_resolution_mb = self.args.min_memory_resolution_mb
+        self.degradation_factor = self.args.degradation_factor
+        if self.min_memory_lower_mb <= 0 or self.min_memory_lower_mb > self.min_memory_upper_mb:
+            print("--min_memory_lower_mb must be greater than 0 and at most the upper limit.")
+            exit(1)
+        if self.min_memory_resolution_mb <= 0:
+            print("--min_memory_resolution_mb must be greater than 0.")
+            exit(1)
+        if self.degradation_factor < 1:
+            print("--degradation_factor must be at least 1.")
+            exit(1)
+        if self.find_min_memory and (self.continuous or self.cgroup or self.experiment_matrix is not None):
+            print("--find_min_memory cannot be combined with --continuous, --cgroup or --experiment.")
+            exit(1)
+        self.client_mode = self.args.client_mode
+        if self.client_mode not in CLIENT_MODES:
+            print(f"--client_mode must be one of {CLIENT_MODES}.")
+            exit(1)
+        if self.client_mode != 'threads' and (self.continuous or self.find_min_memory):
+            print("--client_mode processes and instances cannot be combined with --continuous or --find_min_memory.")
+            exit(1)
+        self.instance_memory_limits = self.args.instance_memory_limits
+        if self.instance_memory_limits is not None and self.client_mode != 'instances':
+            print("--instance_memory_limits needs --client_mode=instances.")
+            exit(1)
+        if self.instance_memory_limits is not None and min(self.instance_memory_limits) < 0:
+            print("--instance_memory_limits must not be negative.")
+            exit(1)
+        self.contention = None
+        if self.args.contention is not None:
+            if self.continuous or self.experiment_matrix is not None or self.find_min_memory or self.workload is not None or self.client_mode != 'threads':
+                print("--contention cannot be combined with --continuous, --experiment, --find_min_memory, --workload or --client_mode.")
+                exit(1)
+            try:
+                self.contention = load_contention(self.args.contention)
+                for benchmark in self.benchmarks:
+                    self.contention.get_tenants(benchmark, get_query_file_names, self.memory_limit, self.work_mem)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Could not load contention {self.args.contention}: {e}")
+                exit(1)
+        if self.args.threads_list is not None and (self.continuous or self.experiment_matrix is not None or self.find_min_memory or self.contention is not None):
+            print("--threads_list cannot be combined with --continuous, --experiment (use matrix.threads), --find_min_memory or --contention.")
+            exit(1)
+        max_connections = max(self.connections_list)
+        if self.experiment_matrix is not None:
+            max_connections = max(self.experiment_matrix['connections'])
+        if self.contention is not None:
+            max_connections = max(max_connections, self.contention.get_max_connections('postgres'))
+        self.postgres_pool = PostgresPool(self.args.postgres_host, self.args.postgres_port, self.args.postgres_user, self.args.postgres_password, max_connections)
+
         ### extra checks
         if self.continuous and (len(self.systems) > 1 and (self.systems[0] == 'hyper'  or self.systems[0] == 'postgres')):
             print("cannot continuously run hyper queries.")
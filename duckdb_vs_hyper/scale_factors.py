@@ -0,0 +1,210 @@
+import os
+import re
+import shutil
+import subprocess
+import duckdb
+import psutil
+
+# tpch and tpcds can run at any scale factor. the scale factor is part of the
+# benchmark name (tpch-sf10), the names without one are the sf100 databases.
+SCALABLE_BENCHMARKS = ['tpch', 'tpcds']
+SCALE_FACTORS = [1, 10, 30, 100, 300]
+DEFAULT_SCALE_FACTOR = 100
+# table function of the duckdb extension of the same name that generates the data
+GENERATORS = {'tpch': 'dbgen', 'tpcds': 'dsdgen'}
+# a query scales linearly if its exponent is within this distance of 1
+LINEAR_TOLERANCE = 0.2
+# runtime growing faster than data_bytes^2 from one scale factor to the next is a cliff (spilling, swapping)
+CLIFF_EXPONENT = 2.0
+
+SCALING_POINTS_SQL = """
+INSERT INTO scaling_points
+SELECT ?, ?, ?, r.system, r.query_name, r.run_type, r.memory_limit, r.threads, count(*),
+    median(s.peak_rss), median(s.wall_time), ?,
+    CASE WHEN r.memory_limit > 0 THEN r.memory_limit * 1000000000 ELSE ? END
+FROM sf.runs r JOIN sf.query_summary s USING (run_id)
+WHERE r.run_type IN ('cold', 'hot')
+    AND r.run_id NOT IN (SELECT run_id FROM sf.query_outcome WHERE outcome != 'success' AND run_id IS NOT NULL)
+GROUP BY r.system, r.query_name, r.run_type, r.memory_limit, r.threads
+"""
+
+SCALING_FITS_SQL = f"""
+INSERT INTO scaling_fits
+WITH steps AS (
+    SELECT *,
+        ln(peak_rss / lag(peak_rss) OVER w) / ln(data_bytes / lag(data_bytes) OVER w) AS memory_step_exponent,
+        ln(wall_time / lag(wall_time) OVER w) / ln(data_bytes / lag(data_bytes) OVER w) AS runtime_step_exponent
+    FROM scaling_points
+    WHERE benchmark_name = ? AND benchmark = ? AND peak_rss > 0 AND wall_time > 0
+    WINDOW w AS (PARTITION BY system, query_name, run_type, memory_limit, threads ORDER BY scale_factor)
+), fits AS (
+    SELECT benchmark_name, benchmark, system, query_name, run_type, memory_limit, threads,
+        count(*) AS scale_factors,
+        regr_slope(ln(peak_rss), ln(data_bytes)) AS memory_exponent,
+        regr_intercept(ln(peak_rss), ln(data_bytes)) AS memory_intercept,
+        regr_r2(ln(peak_rss), ln(data_bytes)) AS memory_r2,
+        regr_slope(ln(wall_time), ln(data_bytes)) AS runtime_exponent,
+        regr_intercept(ln(wall_time), ln(data_bytes)) AS runtime_intercept,
+        regr_r2(ln(wall_time), ln(data_bytes)) AS runtime_r2,
+        max(memory_step_exponent) AS max_memory_step_exponent,
+        max(runtime_step_exponent) AS max_runtime_step_exponent,
+        min(scale_factor) FILTER (WHERE runtime_step_exponent > {CLIFF_EXPONENT}) AS cliff_scale_factor,
+        min(scale_factor) FILTER (WHERE data_bytes > memory_bytes) AS outgrows_memory_scale_factor
+    FROM steps
+    GROUP BY benchmark_name, benchmark, system, query_name, run_type, memory_limit, threads
+    HAVING count(*) >= 2
+)
+SELECT *,
+    CASE WHEN memory_exponent < {1 - LINEAR_TOLERANCE} THEN 'sublinear'
+         WHEN memory_exponent <= {1 + LINEAR_TOLERANCE} THEN 'linear'
+         ELSE 'superlinear' END
+FROM fits
+"""
+
+
+def get_scale_factor(benchmark):
+    # the scale factor in the name of the benchmark (tpch-sf10 -> 10), None if it has none
+    match = re.fullmatch(r'(\w+)-sf(\d+)', benchmark)
+    if match is None or match.group(1) not in SCALABLE_BENCHMARKS:
+        return None
+    return int(match.group(2))
+
+
+def get_base_benchmark(benchmark):
+    # the benchmark without the scale factor, its queries are the queries of every scale factor
+    if get_scale_factor(benchmark) is not None:
+        return benchmark.rsplit('-sf', 1)[0]
+    return benchmark
+
+
+def get_scaled_benchmark(benchmark, scale_factor):
+    return f"{get_base_benchmark(benchmark)}-sf{scale_factor}"
+
+
+def get_query_directory(benchmark):
+    return f"benchmark-queries/{get_base_benchmark(benchmark)}-queries"
+
+
+def get_benchmark_scale_factor(benchmark):
+    scale_factor = get_scale_factor(benchmark)
+    return scale_factor if scale_factor is not None else DEFAULT_SCALE_FACTOR
+
+
+def get_duckdb_scaled_database(benchmark):
+    return f"{get_base_benchmark(benchmark)}-sf{get_benchmark_scale_factor(benchmark)}.duckdb"
+
+
+def get_hyper_scaled_database(benchmark):
+    return f"{get_base_benchmark(benchmark)}-sf{get_benchmark_scale_factor(benchmark)}.hyper"
+
+
+def get_postgres_database(benchmark):
+    # the sf100 databases are called like the benchmark, the others get the scale factor
+    scale_factor = get_benchmark_scale_factor(benchmark)
+    if scale_factor == DEFAULT_SCALE_FACTOR:
+        return get_base_benchmark(benchmark)
+    return f"{get_base_benchmark(benchmark)}_sf{scale_factor}"
+
+
+def get_export_directory(benchmark):
+    # chunks and checkpoints of utils/load_data.py. it only exists while a load is unfinished
+    return f"{get_base_benchmark(benchmark)}-sf{get_benchmark_scale_factor(benchmark)}-export"
+
+
+def generate_duckdb_database(benchmark, db_file):
+    # generates into a temporary file first, so an interrupted generation isn't taken for a cached database
+    base = get_base_benchmark(benchmark)
+    generating = f"{db_file}.generating"
+    for path in [generating, f"{generating}.wal"]:
+        if os.path.exists(path):
+            os.remove(path)
+    con = duckdb.connect(generating)
+    con.execute(f"INSTALL {base}")
+    con.execute(f"LOAD {base}")
+    con.execute(f"CALL {GENERATORS[base]}(sf={get_benchmark_scale_factor(benchmark)})")
+    con.execute("CHECKPOINT")
+    con.close()
+    os.rename(generating, db_file)
+
+
+def create_postgres_database(database, host, port, user, password):
+    # returns True if the database had to be created
+    import psycopg2
+    con = psycopg2.connect(database='postgres', user=user, password=password, host=host, port=port)
+    # CREATE DATABASE can't run in a transaction
+    con.autocommit = True
+    try:
+        cursor = con.cursor()
+        cursor.execute("SELECT 1 FROM pg_database WHERE datname = %s", [database])
+        if cursor.fetchone() is not None:
+            return False
+        cursor.execute(f'CREATE DATABASE "{database}"')
+        return True
+    finally:
+        con.close()
+
+
+def prepare_scaled_databases(benchmark, systems, postgres_host, postgres_port, postgres_user, postgres_password):
+    # Makes sure the databases of every system exist at the scale factor of
+    # benchmark. The duckdb database is generated with dbgen/dsdgen, hyper and
+    # postgres are loaded from it with utils/load_data.py. Every database is
+    # only created once and reused by later benchmarks.
+    if get_scale_factor(benchmark) is None:
+        return
+    db_file = get_duckdb_scaled_database(benchmark)
+    if not os.path.isfile(db_file):
+        print(f"generating {db_file}")
+        generate_duckdb_database(benchmark, db_file)
+
+    load_databases(get_base_benchmark(benchmark), db_file, systems, get_hyper_scaled_database(benchmark), get_postgres_database(benchmark), get_export_directory(benchmark),
+                   False, postgres_host, postgres_port, postgres_user, postgres_password)
+
+
+def load_databases(benchmark, db_file, systems, hyper_database, postgres_database, export_dir, reload, postgres_host, postgres_port, postgres_user, postgres_password):
+    # loads the duckdb database db_file into hyper_database and postgres_database with
+    # utils/load_data.py, for the systems that don't have it yet (all of them with reload).
+    # a load that didn't finish left its export_dir behind and is resumed.
+    unfinished = os.path.isdir(export_dir)
+    load_systems = []
+    if 'hyper' in systems and (reload or unfinished or not os.path.isfile(hyper_database)):
+        load_systems.append('hyper')
+    if 'postgres' in systems:
+        created = create_postgres_database(postgres_database, postgres_host, postgres_port, postgres_user, postgres_password)
+        if reload or created or unfinished:
+            load_systems.append('postgres')
+    if len(load_systems) == 0:
+        return
+    print(f"loading {db_file} into {load_systems}")
+    command = ["python3", "utils/load_data.py", f"--benchmark={benchmark}", f"--source={db_file}", f"--systems={','.join(load_systems)}",
+               f"--export_dir={export_dir}", f"--hyper_database={hyper_database}", f"--postgres_database={postgres_database}",
+               f"--postgres_host={postgres_host}", f"--postgres_port={postgres_port}", f"--postgres_user={postgres_user}", "--delete_export"]
+    if postgres_password is not None:
+        command.append(f"--postgres_password={postgres_password}")
+    if subprocess.call(command) != 0:
+        print(f"Error: loading {db_file} failed. running the benchmark again resumes the load")
+        exit(1)
+    shutil.rmtree(export_dir)
+
+
+def write_scaling_fits(data_db, benchmark_name, benchmark, scaled_data_dbs):
+    # scaled_data_dbs maps scale factors to the data.duckdb of the benchmark at that scale factor.
+    # the median peak rss and wall time of every query is fitted against the size of
+    # the duckdb database in log-log space, the exponent is 1 for linear scaling.
+    con = duckdb.connect(data_db)
+    con.execute("DELETE FROM scaling_points WHERE benchmark_name = ? AND benchmark = ?", [benchmark_name, benchmark])
+    con.execute("DELETE FROM scaling_fits WHERE benchmark_name = ? AND benchmark = ?", [benchmark_name, benchmark])
+    host_memory = psutil.virtual_memory().total
+    for scale_factor, scaled_data_db in sorted(scaled_data_dbs.items()):
+        db_file = get_duckdb_scaled_database(get_scaled_benchmark(benchmark, scale_factor))
+        if not os.path.isfile(scaled_data_db) or not os.path.isfile(db_file):
+            continue
+        con.execute(f"ATTACH '{scaled_data_db}' AS sf (READ_ONLY)")
+        try:
+            con.execute(SCALING_POINTS_SQL, [benchmark_name, benchmark, scale_factor, os.path.getsize(db_file), host_memory])
+        finally:
+            con.execute("DETACH sf")
+    con.execute(SCALING_FITS_SQL, [benchmark_name, benchmark])
+    con.sql("""SELECT system, query_name, run_type, memory_limit, scale_factors, round(memory_exponent, 2) AS memory_exponent, round(memory_r2, 2) AS memory_r2,
+                      round(runtime_exponent, 2) AS runtime_exponent, memory_scaling, cliff_scale_factor, outgrows_memory_scale_factor
+               FROM scaling_fits WHERE benchmark_name = ? AND benchmark = ? ORDER BY system, query_name, run_type""", params=[benchmark_name, benchmark]).show(max_rows=1000)
+    con.close()
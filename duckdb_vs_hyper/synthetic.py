@@ -0,0 +1,271 @@
+import itertools
+import json
+import os
+import shutil
+import tomllib
+import duckdb
+
+from scale_factors import load_databases
+
+# the synthetic benchmark runs the generated queries of benchmark-queries/synthetic-queries
+# on synthetic.duckdb, synthetic.hyper and the postgres database synthetic.
+SYNTHETIC_BENCHMARK = 'synthetic'
+SYNTHETIC_DATABASE = 'synthetic.duckdb'
+SYNTHETIC_HYPER_DATABASE = 'synthetic.hyper'
+SYNTHETIC_QUERY_DIRECTORY = 'benchmark-queries/synthetic-queries'
+SYNTHETIC_EXPORT_DIRECTORY = 'synthetic-export'
+DEFAULT_SYNTHETIC_SPEC = 'experiments/synthetic-operators.toml'
+# 2^53, random doubles in [0, 1) are made from the top 53 bits of a hash
+HASH_RANGE = 9007199254740992
+
+# the metadata isn't in main, so it isn't loaded into hyper and postgres with the tables
+SYNTHETIC_METADATA_SQL = """
+create schema if not exists meta;
+create table if not exists meta.synthetic_spec(spec VARCHAR);
+create table if not exists meta.synthetic_queries(
+    query_name VARCHAR,
+    operator VARCHAR,
+    table_names VARCHAR[],
+    rows BIGINT,
+    groups BIGINT,
+    distinct_groups BIGINT,
+    skew DOUBLE,
+    payload_bytes BIGINT,
+    build_rows BIGINT,
+    probe_rows BIGINT
+);
+"""
+
+
+class SyntheticAggregation():
+    # SELECT k, count(*), max(payload) FROM t GROUP BY k over rows rows with groups
+    # distinct keys. payload_bytes is the width of the string every group keeps in
+    # its aggregate state, 0 has no payload.
+    def __init__(self, rows, groups, skew, payload_bytes):
+        self.rows = rows
+        self.groups = groups
+        self.skew = skew
+        self.payload_bytes = payload_bytes
+
+    def get_table(self):
+        # the group cardinalities of the same rows, skew and payload share a table, one key column each
+        return f"aggr_r{self.rows}_z{format_parameter(self.skew)}_p{self.payload_bytes}"
+
+    def get_query_name(self):
+        return f"aggr-r{self.rows}-g{self.groups}-z{format_parameter(self.skew)}-p{self.payload_bytes}"
+
+    def get_query(self):
+        payload = ", max(payload)" if self.payload_bytes > 0 else ""
+        return f"SELECT k_{self.groups}, count(*){payload} FROM {self.get_table()} GROUP BY k_{self.groups};\n"
+
+
+class SyntheticJoin():
+    # probe_rows rows with skewed keys joined with build_rows unique keys, every
+    # probe row finds its partner. payload_bytes is the width of the string every
+    # build row carries into the hash table.
+    def __init__(self, probe_rows, build_rows, skew, payload_bytes):
+        self.probe_rows = probe_rows
+        self.build_rows = build_rows
+        self.skew = skew
+        self.payload_bytes = payload_bytes
+
+    def get_build_table(self):
+        return f"build_r{self.build_rows}_p{self.payload_bytes}"
+
+    def get_probe_table(self):
+        return f"probe_r{self.probe_rows}_b{self.build_rows}_z{format_parameter(self.skew)}"
+
+    def get_query_name(self):
+        return f"join-p{self.probe_rows}-b{self.build_rows}-z{format_parameter(self.skew)}-p{self.payload_bytes}"
+
+    def get_query(self):
+        payload = ", max(b.payload)" if self.payload_bytes > 0 else ""
+        return f"SELECT count(*), max(p.v){payload} FROM {self.get_probe_table()} AS p JOIN {self.get_build_table()} AS b ON p.k = b.k;\n"
+
+
+class SyntheticSpec():
+    def __init__(self, spec, seed, aggregations, joins):
+        # spec is the parsed toml, generated databases are reused as long as it doesn't change
+        self.spec = spec
+        self.seed = seed
+        self.aggregations = aggregations
+        self.joins = joins
+
+    def get_queries(self):
+        return self.aggregations + self.joins
+
+
+def format_parameter(value):
+    # 1.25 -> 1_25, so it can be part of a table name
+    return f"{value:g}".replace('.', '_')
+
+
+def get_list(entry, key, path, default=None):
+    values = entry.get(key, default)
+    if not isinstance(values, list):
+        values = [values]
+    if len(values) == 0 or any([value is None for value in values]):
+        raise ValueError(f"{key} of synthetic {path} must be a value or a non empty list")
+    return values
+
+
+def load_synthetic(path):
+    # [synthetic]
+    # seed = 1
+    # [[aggregations]]
+    # rows = 100_000_000
+    # groups = [1_000, 1_000_000, 100_000_000]
+    # skew = [0, 1.1]                # zipf exponent of the keys, 0 is uniform
+    # payload_bytes = [0, 64]        # width of a string column that ends up in every group
+    # [[joins]]
+    # probe_rows = 100_000_000
+    # build_probe_ratios = [0.01, 0.1, 1]   # or build_rows = [...]
+    # skew = [0, 1.1]
+    # payload_bytes = [8, 128]
+    # every list is a dimension, every combination is one query
+    with open(path, "rb") as f:
+        spec = tomllib.load(f)
+    settings = spec.get('synthetic', {})
+    aggregations = []
+    for entry in spec.get('aggregations', []):
+        for rows, groups, skew, payload_bytes in itertools.product(get_list(entry, 'rows', path), get_list(entry, 'groups', path),
+                                                                    get_list(entry, 'skew', path, 0), get_list(entry, 'payload_bytes', path, 0)):
+            aggregations.append(SyntheticAggregation(int(rows), int(groups), float(skew), int(payload_bytes)))
+    joins = []
+    for entry in spec.get('joins', []):
+        for probe_rows in get_list(entry, 'probe_rows', path):
+            if 'build_rows' in entry:
+                build_rows = [int(rows) for rows in get_list(entry, 'build_rows', path)]
+            else:
+                build_rows = [max(1, int(probe_rows * ratio)) for ratio in get_list(entry, 'build_probe_ratios', path)]
+            for rows, skew, payload_bytes in itertools.product(build_rows, get_list(entry, 'skew', path, 0), get_list(entry, 'payload_bytes', path, 0)):
+                joins.append(SyntheticJoin(int(probe_rows), rows, float(skew), int(payload_bytes)))
+    if len(aggregations) + len(joins) == 0:
+        raise ValueError(f"synthetic {path} has no [[aggregations]] or [[joins]]")
+    for query in aggregations + joins:
+        rows = [query.rows, query.groups] if isinstance(query, SyntheticAggregation) else [query.probe_rows, query.build_rows]
+        if min(rows) < 1 or query.skew < 0 or query.payload_bytes < 0:
+            raise ValueError(f"{query.get_query_name()} of synthetic {path} needs at least 1 row and group, and no negative skew or payload")
+    return SyntheticSpec(spec, settings.get('seed', 1), aggregations, joins)
+
+
+def get_key_sql(values, skew, seed):
+    # a key in [0, values) for every row i. uniform without skew, otherwise
+    # zipf distributed with exponent skew, key 0 being the most frequent. keys
+    # are drawn from a hash of the row, so they don't depend on the threads.
+    u = f"((hash(i, {seed}) >> 11)::DOUBLE / {HASH_RANGE})"
+    if skew == 0:
+        return f"floor({u} * {values})::BIGINT"
+    # inverse cdf of the continuous power law on [1, values + 1)
+    if skew == 1:
+        x = f"exp({u} * ln({values + 1}))"
+    else:
+        x = f"pow(1 + {u} * (pow({values + 1}, {1 - skew}) - 1), {1 / (1 - skew)})"
+    return f"least(floor({x}) - 1, {values - 1})::BIGINT"
+
+
+def get_payload_sql(payload_bytes, seed):
+    # a string of payload_bytes hex characters that differs from row to row
+    return f"left(repeat(md5(hash(i, {seed})::VARCHAR), {(payload_bytes + 31) // 32}), {payload_bytes})"
+
+
+def generate_synthetic_tables(con, spec):
+    aggregation_tables = {}
+    for aggregation in spec.aggregations:
+        aggregation_tables.setdefault(aggregation.get_table(), []).append(aggregation)
+    for table, aggregations in aggregation_tables.items():
+        # every key column gets its own seed, so the keys of different group cardinalities are independent
+        first = aggregations[0]
+        columns = [f"{get_key_sql(groups, first.skew, spec.seed * 1000 + j)} AS k_{groups}" for j, groups in enumerate(sorted(set([aggregation.groups for aggregation in aggregations])))]
+        if first.payload_bytes > 0:
+            columns.append(f"{get_payload_sql(first.payload_bytes, spec.seed * 1000 + 999)} AS payload")
+        print(f"generating {table}")
+        con.execute(f"CREATE TABLE {table} AS SELECT {', '.join(columns)} FROM range({first.rows}) r(i)")
+
+    for join in spec.joins:
+        if join.get_build_table() not in get_tables(con):
+            print(f"generating {join.get_build_table()}")
+            payload = f", {get_payload_sql(join.payload_bytes, spec.seed)} AS payload" if join.payload_bytes > 0 else ""
+            con.execute(f"CREATE TABLE {join.get_build_table()} AS SELECT i AS k{payload} FROM range({join.build_rows}) r(i)")
+        if join.get_probe_table() not in get_tables(con):
+            print(f"generating {join.get_probe_table()}")
+            con.execute(f"CREATE TABLE {join.get_probe_table()} AS SELECT {get_key_sql(join.build_rows, join.skew, spec.seed)} AS k, (hash(i, {spec.seed + 1}) >> 1)::BIGINT AS v FROM range({join.probe_rows}) r(i)")
+
+
+def get_tables(con):
+    return [row[0] for row in con.execute("SELECT table_name FROM duckdb_tables() WHERE schema_name = 'main'").fetchall()]
+
+
+def write_synthetic_metadata(con, spec):
+    # the parameters of every query, so memory and spilling can be plotted against them
+    for aggregation in spec.aggregations:
+        distinct_groups = con.execute(f"SELECT count(DISTINCT k_{aggregation.groups}) FROM {aggregation.get_table()}").fetchone()[0]
+        con.execute("INSERT INTO meta.synthetic_queries VALUES (?, 'aggregation', ?, ?, ?, ?, ?, ?, NULL, NULL)",
+                    [aggregation.get_query_name(), [aggregation.get_table()], aggregation.rows, aggregation.groups, distinct_groups, aggregation.skew, aggregation.payload_bytes])
+    for join in spec.joins:
+        con.execute("INSERT INTO meta.synthetic_queries VALUES (?, 'join', ?, ?, NULL, NULL, ?, ?, ?, ?)",
+                    [join.get_query_name(), [join.get_probe_table(), join.get_build_table()], join.probe_rows, join.skew, join.payload_bytes, join.build_rows, join.probe_rows])
+    con.execute("INSERT INTO meta.synthetic_spec VALUES (?)", [json.dumps(spec.spec, sort_keys=True)])
+
+
+def get_generated_spec(db_file):
+    # the spec synthetic.duckdb was generated from, None if there is none
+    if not os.path.isfile(db_file):
+        return None
+    con = duckdb.connect(db_file, read_only=True)
+    try:
+        return con.execute("SELECT spec FROM meta.synthetic_spec").fetchone()[0]
+    except duckdb.Error:
+        return None
+    finally:
+        con.close()
+
+
+def write_synthetic_queries(spec):
+    # one <query name>.sql per query, the queries of an earlier spec are removed
+    os.makedirs(SYNTHETIC_QUERY_DIRECTORY, exist_ok=True)
+    for query_file in os.listdir(SYNTHETIC_QUERY_DIRECTORY):
+        if query_file.endswith('.sql'):
+            os.remove(os.path.join(SYNTHETIC_QUERY_DIRECTORY, query_file))
+    for query in spec.get_queries():
+        with open(f"{SYNTHETIC_QUERY_DIRECTORY}/{query.get_query_name()}.sql", 'w') as f:
+            f.write(query.get_query())
+
+
+def prepare_synthetic_benchmark(spec, systems, postgres_host, postgres_port, postgres_user, postgres_password):
+    # generates synthetic.duckdb and the queries of spec, unless they were generated
+    # from the same spec before. hyper and postgres are loaded from synthetic.duckdb.
+    regenerated = get_generated_spec(SYNTHETIC_DATABASE) != json.dumps(spec.spec, sort_keys=True)
+    if regenerated:
+        # generated into a temporary file first, so an interrupted generation isn't taken for a cached database
+        generating = f"{SYNTHETIC_DATABASE}.generating"
+        for path in [generating, f"{generating}.wal"]:
+            if os.path.exists(path):
+                os.remove(path)
+        con = duckdb.connect(generating)
+        con.execute(SYNTHETIC_METADATA_SQL)
+        generate_synthetic_tables(con, spec)
+        write_synthetic_metadata(con, spec)
+        con.execute("CHECKPOINT")
+        con.close()
+        if os.path.exists(f"{SYNTHETIC_DATABASE}.wal"):
+            os.remove(f"{SYNTHETIC_DATABASE}.wal")
+        os.replace(generating, SYNTHETIC_DATABASE)
+        # the chunks of an unfinished load are from the old tables
+        if os.path.isdir(SYNTHETIC_EXPORT_DIRECTORY):
+            shutil.rmtree(SYNTHETIC_EXPORT_DIRECTORY)
+    write_synthetic_queries(spec)
+    load_databases(SYNTHETIC_BENCHMARK, SYNTHETIC_DATABASE, systems, SYNTHETIC_HYPER_DATABASE, SYNTHETIC_BENCHMARK, SYNTHETIC_EXPORT_DIRECTORY,
+                   regenerated, postgres_host, postgres_port, postgres_user, postgres_password)
+
+
+def copy_synthetic_queries(data_db, benchmark_name):
+    # the parameters of the queries next to their runs
+    con = duckdb.connect(data_db)
+    con.execute(f"ATTACH '{SYNTHETIC_DATABASE}' AS synthetic (READ_ONLY)")
+    try:
+        con.execute("DELETE FROM synthetic_queries WHERE benchmark_name = ?", [benchmark_name])
+        con.execute("INSERT INTO synthetic_queries SELECT ?, ?, * FROM synthetic.meta.synthetic_queries", [benchmark_name, SYNTHETIC_BENCHMARK])
+    finally:
+        con.execute("DETACH synthetic")
+        con.close()
@@ -0,0 +1,63 @@
+import os
+import duckdb
+
+from memory_utils.summary import KB_PER_GB
+
+# max_parallel_workers_per_gather of a postgres server that isn't configured
+POSTGRES_DEFAULT_WORKERS = 2
+
+# The threads of a query are only comparable within one system, query, run
+# type, memory limit and number of connections. The baseline of each of them
+# is its smallest thread count. Postgres runs a gather with its workers plus
+# the leader, threads 0 of duckdb and hyper are all cpus of the runner.
+# query_summary.peak_rss only covers the sampled process, which misses the
+# postgres parallel workers (and hyperd's helpers). Runs sampled in tree mode
+# use the peak Pss of the whole tree instead, Pss doesn't count the memory
+# the processes share more than once.
+THREAD_SCALING_SQL = f"""
+INSERT INTO thread_scaling
+WITH points AS (
+    SELECT r.benchmark_name, r.benchmark, r.system, r.query_name, r.run_type, r.memory_limit, r.connections, r.threads,
+        max(CASE WHEN r.system = 'postgres' THEN coalesce(p.max_parallel_workers_per_gather, {POSTGRES_DEFAULT_WORKERS}) + 1
+                 WHEN r.threads > 0 THEN r.threads
+                 ELSE ? END) AS effective_threads,
+        count(*) AS runs, median(s.wall_time) AS wall_time, median(coalesce(t.peak_pss, s.peak_rss)) AS peak_rss,
+        CASE WHEN count(t.peak_pss) = count(*) THEN 'tree_pss' WHEN count(t.peak_pss) = 0 THEN 'process_rss' ELSE 'mixed' END AS memory_source
+    FROM runs r JOIN query_summary s USING (run_id) LEFT JOIN postgres_settings p USING (run_id)
+        LEFT JOIN (SELECT run_id, max(Pss) AS peak_pss FROM proc_tree_mem_total GROUP BY run_id) t USING (run_id)
+    WHERE r.benchmark_name = ? AND r.benchmark = ? AND r.run_type IN ('cold', 'hot') AND s.wall_time > 0
+        AND r.run_id NOT IN (SELECT run_id FROM query_outcome WHERE outcome != 'success' AND run_id IS NOT NULL)
+    GROUP BY r.benchmark_name, r.benchmark, r.system, r.query_name, r.run_type, r.memory_limit, r.connections, r.threads
+)
+SELECT benchmark_name, benchmark, system, query_name, run_type, memory_limit, connections, threads, effective_threads, runs, wall_time, peak_rss, memory_source,
+    first_value(effective_threads) OVER w AS baseline_threads,
+    first_value(wall_time) OVER w / wall_time AS speedup,
+    first_value(wall_time) OVER w / wall_time / (effective_threads / first_value(effective_threads) OVER w) AS efficiency,
+    peak_rss / first_value(peak_rss) OVER w AS peak_rss_growth,
+    CASE WHEN effective_threads > first_value(effective_threads) OVER w
+         THEN (peak_rss - first_value(peak_rss) OVER w) / (effective_threads - first_value(effective_threads) OVER w) END AS rss_per_added_thread
+FROM points
+WINDOW w AS (PARTITION BY system, query_name, run_type, memory_limit, connections ORDER BY effective_threads, threads
+             ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING)
+QUALIFY count(*) OVER w >= 2
+"""
+
+
+def write_thread_scaling(data_db, benchmark_name, benchmark):
+    # speedup, parallel efficiency and peak rss of every query that ran with
+    # more than one thread count, at each memory limit. nothing is written for
+    # benchmarks that only ran with one.
+    con = duckdb.connect(data_db)
+    con.execute("DELETE FROM thread_scaling WHERE benchmark_name = ? AND benchmark = ?", [benchmark_name, benchmark])
+    con.execute(THREAD_SCALING_SQL, [len(os.sched_getaffinity(0)), benchmark_name, benchmark])
+    if con.execute("SELECT count(*) FROM thread_scaling WHERE benchmark_name = ? AND benchmark = ? AND system = 'postgres' AND memory_source != 'tree_pss'", [benchmark_name, benchmark]).fetchone()[0] > 0:
+        print("postgres ran without --sampler_mode=tree, its peak rss doesn't include the parallel workers")
+    if con.execute("SELECT count(*) FROM thread_scaling WHERE benchmark_name = ? AND benchmark = ?", [benchmark_name, benchmark]).fetchone()[0] > 0:
+        # geometric mean over the queries, per system, memory limit and thread count
+        con.sql(f"""SELECT system, run_type, memory_limit, connections, effective_threads, count(*) AS queries,
+                          round(exp(avg(ln(speedup))), 2) AS speedup, round(exp(avg(ln(efficiency))), 2) AS efficiency,
+                          round(exp(avg(ln(peak_rss_growth))), 2) AS peak_rss_growth, round(max(peak_rss) / {KB_PER_GB}, 2) AS max_peak_rss_gb
+                   FROM thread_scaling WHERE benchmark_name = ? AND benchmark = ?
+                   GROUP BY system, run_type, memory_limit, connections, effective_threads
+                   ORDER BY system, run_type, memory_limit, connections, effective_threads""", params=[benchmark_name, benchmark]).show(max_rows=1000)
+    con.close()
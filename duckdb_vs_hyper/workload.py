@@ -0,0 +1,139 @@
+import fnmatch
+import random
+import tomllib
+
+THINK_TIME_DISTRIBUTIONS = ['constant', 'exponential']
+
+
+class QueryStream():
+    # The queries one connection runs. Without weights the queries are run
+    # one after the other, starting with the first one. With weights every
+    # query is a weighted random choice, so connections with different seeds
+    # don't run the same query at the same time. The connection waits
+    # start_offset seconds before its first query and think_time seconds
+    # (on average if exponential) between two queries.
+    def __init__(self, name, num_queries, weights=None, seed=None, start_offset=0, think_time=0, think_time_distribution='constant'):
+        self.name = name
+        self.num_queries = num_queries
+        self.weights = weights
+        self.random = random.Random(seed)
+        self.start_offset = start_offset
+        self.think_time = think_time
+        self.think_time_distribution = think_time_distribution
+        self.position = 0
+
+    def next_query(self):
+        # index of the next query to run
+        if self.weights is None:
+            query = self.position % self.num_queries
+            self.position += 1
+            return query
+        return self.random.choices(range(self.num_queries), self.weights)[0]
+
+    def get_think_time(self):
+        if self.think_time <= 0:
+            return 0
+        if self.think_time_distribution == 'exponential':
+            return self.random.expovariate(1 / self.think_time)
+        return self.think_time
+
+
+class StreamSpec():
+    # one [[streams]] entry of a workload file. weights has one entry per query of the workload.
+    def __init__(self, name, connections, weights, seed, start_offset, think_time, think_time_distribution):
+        self.name = name
+        self.connections = connections
+        self.weights = weights
+        self.seed = seed
+        self.start_offset = start_offset
+        self.think_time = think_time
+        self.think_time_distribution = think_time_distribution
+
+
+class Workload():
+    # queries are (benchmark, query file) pairs, the tag of a query is <benchmark>/<query name>
+    def __init__(self, queries, streams):
+        self.queries = queries
+        self.streams = streams
+
+    def get_query_tags(self):
+        return [f"{benchmark}/{query_file.replace('.sql', '')}" for benchmark, query_file in self.queries]
+
+    def get_connections(self):
+        return sum([stream.connections for stream in self.streams])
+
+    def create_query_streams(self):
+        # one stream per connection. the connections of a stream get consecutive seeds.
+        query_streams = []
+        for stream in self.streams:
+            for i in range(stream.connections):
+                seed = stream.seed + i if stream.seed is not None else None
+                query_streams.append(QueryStream(f"{stream.name}_{i}", len(self.queries), stream.weights, seed, stream.start_offset, stream.think_time, stream.think_time_distribution))
+        return query_streams
+
+
+def load_workload(path, get_query_file_names):
+    # [workload]
+    # seed = 1
+    # [[streams]]
+    # name = "light"
+    # connections = 6
+    # think_time = 0.5
+    # think_time_distribution = "exponential"
+    # # 70% q1/q6 of tpch split evenly, 30% the large hash join
+    # mix = [
+    #     { benchmark = "tpch", queries = ["q01.sql", "q06.sql"], weight = 70 },
+    #     { benchmark = "operators", queries = ["hash-join-large.sql"], weight = 30 },
+    # ]
+    # [[streams]]
+    # name = "heavy"
+    # connections = 2
+    # start_offset = 30
+    # mix = [{ benchmark = "operators", queries = ["hash-join-*.sql"] }]
+    #
+    # queries are file name globs of benchmark-queries/<benchmark>-queries (default all),
+    # the weight of an entry (default 1) is split evenly between the queries it matches.
+    with open(path, "rb") as f:
+        spec = tomllib.load(f)
+    return parse_workload(spec, path, get_query_file_names)
+
+
+def parse_workload(spec, path, get_query_file_names, default_benchmark=None):
+    # spec is the parsed toml of a workload (see load_workload), path is only used in errors.
+    # mix entries without a benchmark use default_benchmark.
+    settings = spec.get('workload', {})
+    if 'streams' not in spec or len(spec['streams']) == 0:
+        raise ValueError(f"workload {path} has no [[streams]]")
+    queries = []
+    stream_mixes = []
+    for i, stream in enumerate(spec['streams']):
+        if 'mix' not in stream or len(stream['mix']) == 0:
+            raise ValueError(f"stream {i} of workload {path} has no mix")
+        mix = {}
+        for entry in stream['mix']:
+            benchmark = entry.get('benchmark', default_benchmark)
+            if benchmark is None:
+                raise ValueError(f"a mix entry of stream {i} of workload {path} has no benchmark")
+            patterns = entry.get('queries', ['*'])
+            matched = [query_file for query_file in get_query_file_names(benchmark) if any([fnmatch.fnmatch(query_file, pattern) for pattern in patterns])]
+            if len(matched) == 0:
+                raise ValueError(f"{patterns} match no query of {benchmark} in workload {path}")
+            for query_file in matched:
+                if (benchmark, query_file) not in queries:
+                    queries.append((benchmark, query_file))
+                query = queries.index((benchmark, query_file))
+                mix[query] = mix.get(query, 0) + entry.get('weight', 1) / len(matched)
+        stream_mixes.append(mix)
+
+    streams = []
+    for i, (stream, mix) in enumerate(zip(spec['streams'], stream_mixes)):
+        think_time_distribution = stream.get('think_time_distribution', 'constant')
+        if think_time_distribution not in THINK_TIME_DISTRIBUTIONS:
+            raise ValueError(f"think_time_distribution of stream {i} of workload {path} must be one of {THINK_TIME_DISTRIBUTIONS}")
+        # streams without their own seed continue from the seed of the workload
+        seed = stream.get('seed', settings.get('seed'))
+        if seed is not None and 'seed' not in stream:
+            seed += sum([other.get('connections', 1) for other in spec['streams'][:i]])
+        streams.append(StreamSpec(stream.get('name', f"stream_{i}"), stream.get('connections', 1), [mix.get(query, 0) for query in range(len(queries))],
+                                  seed, stream.get('start_offset', 0), stream.get('think_time', 0), think_time_distribution))
+    return Workload(queries, streams)
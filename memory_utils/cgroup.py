@@ -0,0 +1,141 @@
+import os
+
+from memory_utils.sample_buffer import SampleBuffer
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+DEFAULT_CGROUP_PARENT = "memory-pressure-benchmarks"
+DEFAULT_MEMORY_HIGH_RATIO = 0.9
+CGROUP_READ_SIZE = 16384
+
+# subset of memory.stat that is stored in cgroup_mem_info. sizes in bytes, the rest are event counters.
+memory_stat_keys = ['anon', 'file', 'kernel', 'shmem', 'file_mapped', 'file_dirty', 'file_writeback', 'anon_thp', 'inactive_anon', 'active_anon', 'inactive_file', 'active_file', 'slab', 'sock', 'pgfault', 'pgmajfault', 'workingset_refault_anon', 'workingset_refault_file', 'pgscan', 'pgsteal']
+memory_events_keys = ['low', 'high', 'max', 'oom', 'oom_kill']
+pressure_keys = ['some_avg10', 'some_avg60', 'some_avg300', 'some_total', 'full_avg10', 'full_avg60', 'full_avg300', 'full_total']
+
+cgroup_mem_columns = [('Time', 'BIGINT'), ('memory_current', 'BIGINT')] + [(key, 'BIGINT') for key in memory_stat_keys] + [(f"events_{key}", 'BIGINT') for key in memory_events_keys]
+cgroup_pressure_columns = [('Time', 'BIGINT')] + [(key, 'BIGINT' if key.endswith('total') else 'DOUBLE') for key in pressure_keys]
+
+
+def parse_flat_keyed(raw):
+    # memory.stat and memory.events have one "key value" pair per line
+    result = {}
+    for line in raw.decode().splitlines():
+        key, _, value = line.partition(" ")
+        result[key] = int(value)
+    return result
+
+
+def parse_pressure(raw):
+    # some avg10=0.00 avg60=0.00 avg300=0.00 total=0
+    # full avg10=0.00 avg60=0.00 avg300=0.00 total=0
+    result = {}
+    for line in raw.decode().splitlines():
+        parts = line.split()
+        for field in parts[1:]:
+            key, _, value = field.partition("=")
+            result[f"{parts[0]}_{key}"] = int(value) if key == 'total' else float(value)
+    return result
+
+
+def get_process_cgroup(pid):
+    # unified hierarchy entry looks like "0::/user.slice/..."
+    with open(f"/proc/{pid}/cgroup") as f:
+        for line in f:
+            if line.startswith("0::"):
+                return os.path.normpath(CGROUP_ROOT + line[3:].strip())
+    return CGROUP_ROOT
+
+
+class BenchmarkCgroup():
+    # A cgroup v2 group for a single benchmark run. memory.max is the hard
+    # limit, memory.high (a fraction of it) is where the kernel starts to
+    # throttle and reclaim. Processes are moved back to the cgroup they came
+    # from when the group is removed.
+    # Note that memory a process allocated before it was moved stays charged
+    # to its old cgroup.
+    def __init__(self, name, memory_limit_gb, parent=DEFAULT_CGROUP_PARENT, high_ratio=DEFAULT_MEMORY_HIGH_RATIO):
+        self.parent_path = f"{CGROUP_ROOT}/{parent}"
+        self.path = f"{self.parent_path}/{name}"
+        self.memory_max = int(memory_limit_gb * 1024 * 1024 * 1024)
+        self.memory_high = int(self.memory_max * high_ratio)
+        # pid -> cgroup the process was in before
+        self.original_cgroups = {}
+
+    def write(self, path, value):
+        with open(path, "w") as f:
+            f.write(str(value))
+
+    def create(self):
+        if not os.path.exists(f"{CGROUP_ROOT}/cgroup.controllers"):
+            raise RuntimeError(f"no cgroup v2 hierarchy mounted at {CGROUP_ROOT}")
+        if not os.path.isdir(self.parent_path):
+            os.makedirs(self.parent_path)
+            # the memory controller has to be enabled for the children of every level
+            self.write(f"{CGROUP_ROOT}/cgroup.subtree_control", "+memory")
+        self.write(f"{self.parent_path}/cgroup.subtree_control", "+memory")
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        self.write(f"{self.path}/memory.max", self.memory_max)
+        self.write(f"{self.path}/memory.high", self.memory_high)
+
+    def add_pid(self, pid):
+        self.original_cgroups[pid] = get_process_cgroup(pid)
+        self.write(f"{self.path}/cgroup.procs", pid)
+
+    def remove(self):
+        for pid, original_cgroup in self.original_cgroups.items():
+            try:
+                self.write(f"{original_cgroup}/cgroup.procs", pid)
+            except (ProcessLookupError, FileNotFoundError):
+                # the process already exited
+                pass
+        self.original_cgroups = {}
+        try:
+            os.rmdir(self.path)
+        except OSError as e:
+            print(f"Error: could not remove cgroup {self.path}: {e}")
+
+
+class CgroupCollector():
+    # Samples memory.current, memory.stat, memory.events and memory.pressure
+    # of a cgroup into cgroup_mem_info and cgroup_mem_pressure.
+    def __init__(self, cgroup_path, capacity, flush_interval):
+        self.cgroup_path = cgroup_path
+        self.fds = {}
+        self.mem_samples = SampleBuffer('cgroup_mem_info', cgroup_mem_columns, capacity, flush_interval)
+        self.pressure_samples = SampleBuffer('cgroup_mem_pressure', cgroup_pressure_columns, capacity, flush_interval)
+
+    def open(self):
+        for file_name in ['memory.current', 'memory.stat', 'memory.events', 'memory.pressure']:
+            self.fds[file_name] = os.open(f"{self.cgroup_path}/{file_name}", os.O_RDONLY)
+
+    def close(self):
+        for fd in self.fds.values():
+            os.close(fd)
+        self.fds = {}
+
+    def read(self, file_name):
+        return os.pread(self.fds[file_name], CGROUP_READ_SIZE, 0)
+
+    def sample(self, now):
+        try:
+            row = {'Time': now, 'memory_current': int(self.read('memory.current'))}
+            stat = parse_flat_keyed(self.read('memory.stat'))
+            events = parse_flat_keyed(self.read('memory.events'))
+            pressure = parse_pressure(self.read('memory.pressure'))
+        except OSError as e:
+            print(f"Error: cannot read cgroup {self.cgroup_path}: {e}")
+            return False
+        for key in memory_stat_keys:
+            row[key] = stat.get(key)
+        for key in memory_events_keys:
+            row[f"events_{key}"] = events.get(key)
+        self.mem_samples.append(row)
+        pressure['Time'] = now
+        self.pressure_samples.append(pressure)
+        return True
+
+    def flush(self, con, identifiers, force=False):
+        if force or self.mem_samples.should_flush() or self.pressure_samples.should_flush():
+            self.mem_samples.flush(con, identifiers)
+            self.pressure_samples.flush(con, identifiers)
@@ -1,10 +1,6 @@
 CREATE TABLE IF NOT EXISTS time_info(
-	benchmark_name VARCHAR,
-	benchmark VARCHAR,
-	system VARCHAR, 
-	run_type VARCHAR,
-	query_name VARCHAR,
-	"Time" DOUBLE,
+	run_id BIGINT,
+	"Time" BIGINT, -- monotonic clock in ns, see runs.start_monotonic
 	Active BIGINT,
 	"Active(anon)" BIGINT,
 	"Active(file)" BIGINT,
@@ -61,16 +57,24 @@ CREATE TABLE IF NOT EXISTS time_info(
 	Zswapped BIGINT
 );
 
-create table if not exists proc_mem_info(
+-- one row per sampled run of a query. the attributes of /proc/<pid>/status that
+-- don't change while a query runs are stored here once instead of with every sample.
+create sequence if not exists run_id_seq;
+
+create table if not exists runs(
+	run_id BIGINT PRIMARY KEY DEFAULT nextval('run_id_seq'),
 	benchmark_name VARCHAR,
 	benchmark VARCHAR,
-	system VARCHAR, 
+	system VARCHAR,
 	run_type VARCHAR,
 	query_name VARCHAR,
-	"Time" DOUBLE,
+	connections BIGINT,
+	memory_limit DOUBLE, -- GB, 0 means no limit
+	threads BIGINT, -- 0 means the default of the system
+	start_time DOUBLE, -- wall clock (unix time in seconds) when the run was registered
+	start_monotonic BIGINT, -- monotonic clock (ns) at start_time
 	Name VARCHAR, -- hyperdMain
 	Umask VARCHAR, -- 0002
-	State VARCHAR, -- S (sleeping)
 	Tgid BIGINT, -- 2125
 	Ngid BIGINT, -- 0
 	Pid BIGINT, -- 2125
@@ -78,31 +82,13 @@ create table if not exists proc_mem_info(
 	TracerPid BIGINT, -- 0
 	Uid VARCHAR, -- 1000	1000	1000	1000
 	Gid VARCHAR, -- 1000	1000	1000	1000
-	FDSize BIGINT, -- 64
 	Groups VARCHAR, -- 4 20 24 25 27 29 30 44 46 119 120 1000
 	NStgid BIGINT, -- 2125
 	NSpid BIGINT, -- 2125
 	NSpgid BIGINT, -- 2125
 	NSsid BIGINT, -- 1151
-	VmPeak BIGINT, --  5762476 kB
-	VmSize BIGINT, --  5762476 kB
-	VmLck BIGINT, --        0 kB
-	VmPin BIGINT, --        0 kB
-	VmHWM BIGINT, --  1583052 kB
-	VmRSS BIGINT, --  1583052 kB
-	RssAnon BIGINT, --   198604 kB
-	RssFile BIGINT, --  1384448 kB
-	RssShmem BIGINT, --        0 kB
-	VmData BIGINT, --   694184 kB
-	VmStk BIGINT, --      132 kB
-	VmExe BIGINT, --    77972 kB
-	VmLib BIGINT, --     2348 kB
-	VmPTE BIGINT, --     3912 kB
-	VmSwap BIGINT, --        0 kB
-	HugetlbPages BIGINT, --        0 kB
 	CoreDumping BIGINT, -- 0
 	THP_enabled BIGINT, -- 1
-	Threads BIGINT, -- 56
 	SigQ VARCHAR, -- 0/126203
 	SigPnd VARCHAR, -- 0000000000000000
 	ShdPnd VARCHAR, -- 0000000000000000
@@ -122,7 +108,510 @@ create table if not exists proc_mem_info(
 	Cpus_allowed VARCHAR, -- ffff
 	Cpus_allowed_list VARCHAR, -- 0-15
 	Mems_allowed VARCHAR, -- 00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000000,00000001
-	Mems_allowed_list BIGINT, -- 0
+	Mems_allowed_list VARCHAR -- 0
+);
+
+-- the changing counters of /proc/<pid>/status, one row per sample
+create table if not exists samples(
+	run_id BIGINT,
+	"Time" BIGINT, -- monotonic clock in ns, see runs.start_monotonic
+	FDSize BIGINT, -- 64
+	VmPeak BIGINT, --  5762476 kB
+	VmSize BIGINT, --  5762476 kB
+	VmLck BIGINT, --        0 kB
+	VmPin BIGINT, --        0 kB
+	VmHWM BIGINT, --  1583052 kB
+	VmRSS BIGINT, --  1583052 kB
+	RssAnon BIGINT, --   198604 kB
+	RssFile BIGINT, --  1384448 kB
+	RssShmem BIGINT, --        0 kB
+	VmData BIGINT, --   694184 kB
+	VmStk BIGINT, --      132 kB
+	VmExe BIGINT, --    77972 kB
+	VmLib BIGINT, --     2348 kB
+	VmPTE BIGINT, --     3912 kB
+	VmSwap BIGINT, --        0 kB
+	HugetlbPages BIGINT, --        0 kB
+	Threads BIGINT, -- 56
 	voluntary_ctxt_switches BIGINT, -- 46
 	nonvoluntary_ctxt_switches BIGINT -- 0
-);
\ No newline at end of file
+);
+
+-- the samples in the wide layout the graph_utils scripts read (Time in unix seconds)
+create or replace view proc_mem_info as
+select r.benchmark_name,
+	r.benchmark,
+	r.system,
+	r.run_type,
+	r.query_name,
+	r.start_time + (s."Time" - r.start_monotonic) / 1000000000 AS "Time",
+	r.Name,
+	r.Umask,
+	r.Tgid,
+	r.Ngid,
+	r.Pid,
+	r.PPid,
+	r.TracerPid,
+	r.Uid,
+	r.Gid,
+	s.FDSize,
+	r.Groups,
+	r.NStgid,
+	r.NSpid,
+	r.NSpgid,
+	r.NSsid,
+	s.VmPeak,
+	s.VmSize,
+	s.VmLck,
+	s.VmPin,
+	s.VmHWM,
+	s.VmRSS,
+	s.RssAnon,
+	s.RssFile,
+	s.RssShmem,
+	s.VmData,
+	s.VmStk,
+	s.VmExe,
+	s.VmLib,
+	s.VmPTE,
+	s.VmSwap,
+	s.HugetlbPages,
+	r.CoreDumping,
+	r.THP_enabled,
+	s.Threads,
+	r.SigQ,
+	r.SigPnd,
+	r.ShdPnd,
+	r.SigBlk,
+	r.SigIgn,
+	r.SigCgt,
+	r.CapInh,
+	r.CapPrm,
+	r.CapEff,
+	r.CapBnd,
+	r.CapAmb,
+	r.NoNewPrivs,
+	r.Seccomp,
+	r.Seccomp_filters,
+	r.Speculation_Store_Bypass,
+	r.SpeculationIndirectBranch,
+	r.Cpus_allowed,
+	r.Cpus_allowed_list,
+	r.Mems_allowed,
+	r.Mems_allowed_list,
+	s.voluntary_ctxt_switches,
+	s.nonvoluntary_ctxt_switches
+from samples s join runs r using (run_id);
+
+-- one row per process in the sampled process tree (sampler mode 'tree'). values in kB.
+create table if not exists proc_tree_mem_info(
+	run_id BIGINT,
+	"Time" BIGINT, -- monotonic clock in ns, see runs.start_monotonic
+	Pid BIGINT,
+	PPid BIGINT,
+	Name VARCHAR,
+	Rss BIGINT,
+	Pss BIGINT,
+	Uss BIGINT, -- Private_Clean + Private_Dirty
+	Pss_Anon BIGINT,
+	Pss_File BIGINT,
+	Pss_Shmem BIGINT,
+	Anonymous BIGINT,
+	File BIGINT, -- Rss - Anonymous (file backed and shared memory)
+	Swap BIGINT,
+	SwapPss BIGINT
+);
+
+-- sum over the whole process tree per sample. Rss double counts shared pages, Pss does not.
+create table if not exists proc_tree_mem_total(
+	run_id BIGINT,
+	"Time" BIGINT, -- monotonic clock in ns, see runs.start_monotonic
+	Processes BIGINT,
+	Rss BIGINT,
+	Pss BIGINT,
+	Uss BIGINT,
+	Pss_Anon BIGINT,
+	Pss_File BIGINT,
+	Pss_Shmem BIGINT,
+	Anonymous BIGINT,
+	File BIGINT,
+	Swap BIGINT,
+	SwapPss BIGINT
+);
+
+-- memory counters of the cgroup the engine runs in (--cgroup). memory_current and sizes from memory.stat in bytes.
+create table if not exists cgroup_mem_info(
+	run_id BIGINT,
+	"Time" BIGINT, -- monotonic clock in ns, see runs.start_monotonic
+	memory_current BIGINT,
+	anon BIGINT,
+	file BIGINT,
+	kernel BIGINT,
+	shmem BIGINT,
+	file_mapped BIGINT,
+	file_dirty BIGINT,
+	file_writeback BIGINT,
+	anon_thp BIGINT,
+	inactive_anon BIGINT,
+	active_anon BIGINT,
+	inactive_file BIGINT,
+	active_file BIGINT,
+	slab BIGINT,
+	sock BIGINT,
+	pgfault BIGINT,
+	pgmajfault BIGINT,
+	workingset_refault_anon BIGINT,
+	workingset_refault_file BIGINT,
+	pgscan BIGINT,
+	pgsteal BIGINT,
+	events_low BIGINT, -- memory.events counters (cumulative)
+	events_high BIGINT,
+	events_max BIGINT,
+	events_oom BIGINT,
+	events_oom_kill BIGINT
+);
+
+-- pressure stall information (memory.pressure) of the cgroup. avg* in percent, total in microseconds.
+create table if not exists cgroup_mem_pressure(
+	run_id BIGINT,
+	"Time" BIGINT, -- monotonic clock in ns, see runs.start_monotonic
+	some_avg10 DOUBLE,
+	some_avg60 DOUBLE,
+	some_avg300 DOUBLE,
+	some_total BIGINT,
+	full_avg10 DOUBLE,
+	full_avg60 DOUBLE,
+	full_avg300 DOUBLE,
+	full_total BIGINT
+);
+
+-- host wide reclaim, fault and swap counters from /proc/vmstat. every value is the delta to the previous sample.
+create table if not exists vmstat_info(
+	run_id BIGINT,
+	"Time" BIGINT, -- monotonic clock in ns, see runs.start_monotonic
+	pgscan BIGINT, -- pgscan_ of kswapd, direct, khugepaged and proactive reclaim (not pgscan_anon/pgscan_file, they split the same scans)
+	pgsteal BIGINT, -- pgsteal_ of the same reclaim sources
+	pgscan_kswapd BIGINT,
+	pgscan_direct BIGINT,
+	pgsteal_kswapd BIGINT,
+	pgsteal_direct BIGINT,
+	pgfault BIGINT,
+	pgmajfault BIGINT,
+	pswpin BIGINT,
+	pswpout BIGINT,
+	workingset_refault_anon BIGINT,
+	workingset_refault_file BIGINT,
+	allocstall_normal BIGINT,
+	compact_stall BIGINT,
+	oom_kill BIGINT
+);
+
+-- minor and major page faults of the sampled process (/proc/<pid>/stat). deltas to the previous sample.
+create table if not exists proc_fault_info(
+	run_id BIGINT,
+	"Time" BIGINT, -- monotonic clock in ns, see runs.start_monotonic
+	Pid BIGINT,
+	minflt BIGINT,
+	majflt BIGINT
+);
+
+-- bytes read and written by the sampled processes since the previous sample (the whole tree in tree mode).
+-- read_bytes/write_bytes reached the block layer, rchar/wchar include I/O served by the page cache.
+create table if not exists proc_io_info(
+	run_id BIGINT,
+	"Time" BIGINT, -- monotonic clock in ns, see runs.start_monotonic
+	Processes BIGINT,
+	rchar BIGINT,
+	wchar BIGINT,
+	read_bytes BIGINT,
+	write_bytes BIGINT,
+	cancelled_write_bytes BIGINT
+);
+
+-- size of the directories the engine spills to, scanned every 100ms.
+create table if not exists spill_info(
+	run_id BIGINT,
+	"Time" BIGINT, -- monotonic clock in ns, see runs.start_monotonic
+	Directory VARCHAR,
+	Files BIGINT,
+	Bytes BIGINT -- allocated bytes of all files below Directory
+);
+
+-- one row per executed query, written when its memory sampler stops. memory in kB.
+create table if not exists query_summary(
+	run_id BIGINT,
+	wall_time DOUBLE, -- seconds
+	peak_rss BIGINT,
+	time_to_peak DOUBLE, -- seconds from the first sample to the peak
+	mean_rss DOUBLE,
+	rss_area_gb_s DOUBLE, -- area under the VmRSS curve in GB*s
+	samples BIGINT,
+	peak_rss_anon BIGINT,
+	peak_rss_file BIGINT,
+	read_bytes BIGINT, -- read from disk by the sampled processes, see proc_io_info
+	write_bytes BIGINT, -- written to disk by the sampled processes
+	peak_spill_bytes BIGINT -- largest size of all spill directories together, see spill_info
+);
+
+-- every run of a query in --find_min_memory mode
+create table if not exists memory_limit_probes(
+	benchmark_name VARCHAR,
+	benchmark VARCHAR,
+	system VARCHAR,
+	query_name VARCHAR,
+	run_id BIGINT, -- the samples of the probe
+	memory_limit_mb BIGINT, -- memory_limit (duckdb, hyper) or work_mem (postgres)
+	success BOOLEAN,
+	runtime DOUBLE, -- seconds
+	peak_rss BIGINT, -- kB
+	error VARCHAR
+);
+
+create table if not exists min_memory_limits(
+	benchmark_name VARCHAR,
+	benchmark VARCHAR,
+	system VARCHAR,
+	query_name VARCHAR,
+	baseline_limit_mb BIGINT,
+	baseline_runtime DOUBLE,
+	min_success_mb BIGINT, -- smallest limit the query succeeds with, NULL if it fails at the baseline
+	min_no_degradation_mb BIGINT, -- smallest limit with runtime <= degradation_factor * baseline_runtime
+	degradation_factor DOUBLE
+);
+
+-- progress of an experiment matrix (--experiment). status is running, done or failed.
+create table if not exists experiment_checkpoints(
+	benchmark VARCHAR,
+	query_file VARCHAR,
+	system VARCHAR,
+	memory_limit DOUBLE, -- GB
+	connections BIGINT,
+	threads BIGINT,
+	work_mem BIGINT, -- MB, postgres only
+	hash_mem_multiplier DOUBLE, -- postgres only
+	status VARCHAR, -- running, done, failed or skipped (an earlier outcome of the query, doesn't count as an attempt)
+	attempts BIGINT,
+	started DOUBLE,
+	finished DOUBLE,
+	error VARCHAR,
+	PRIMARY KEY (benchmark, query_file, system, memory_limit, connections, threads, work_mem, hash_mem_multiplier)
+);
+
+-- statistics over the measured hot runs of a query. peak_rss in kB, runtime in seconds.
+-- cv is the coefficient of variation, ci the half width of the 95% confidence interval relative to the mean.
+create table if not exists query_statistics(
+	benchmark_name VARCHAR,
+	benchmark VARCHAR,
+	system VARCHAR,
+	query_name VARCHAR,
+	connections BIGINT,
+	memory_limit DOUBLE,
+	threads BIGINT,
+	hot_runs BIGINT,
+	stop_reason VARCHAR, -- runs, ci, max_runs or time_budget
+	runtime_median DOUBLE,
+	runtime_p95 DOUBLE,
+	runtime_cv DOUBLE,
+	runtime_ci DOUBLE,
+	peak_rss_median DOUBLE,
+	peak_rss_p95 DOUBLE,
+	peak_rss_cv DOUBLE,
+	peak_rss_ci DOUBLE,
+	runtime_mean DOUBLE
+);
+
+-- how every measured run of a query ended. runtime and timeout in seconds, timeout 0 means none.
+-- signal is the signal that killed the process, only known if it ran in a cgroup worker.
+create table if not exists query_outcome(
+	benchmark_name VARCHAR,
+	benchmark VARCHAR,
+	system VARCHAR,
+	query_file VARCHAR,
+	memory_limit DOUBLE,
+	connections BIGINT,
+	threads BIGINT,
+	run_id BIGINT,
+	outcome VARCHAR, -- success, timeout, oom, spill_full, killed or error
+	error_class VARCHAR,
+	message VARCHAR,
+	signal BIGINT,
+	runtime DOUBLE,
+	timeout DOUBLE,
+	work_mem BIGINT, -- MB, postgres only, 0 is the server default
+	hash_mem_multiplier DOUBLE -- postgres only, 0 is the server default
+);
+-- databases of earlier benchmarks (--known_outcomes, resumed experiments) don't have them yet
+alter table query_outcome add column if not exists work_mem BIGINT default 0;
+alter table query_outcome add column if not exists hash_mem_multiplier DOUBLE default 0;
+
+-- every start of hyperd. hyperd keeps running across queries, query_file is the query it was started for.
+-- reason is start, cold (--hyper_cold_restart), parameters (memory limit or database changed), threads (--threads changed) or failure.
+-- startup_time in seconds until the connection to the database is open, startup_rss in kB of all hyperd processes after that.
+create table if not exists hyper_startups(
+	benchmark_name VARCHAR,
+	benchmark VARCHAR,
+	query_file VARCHAR,
+	memory_limit DOUBLE,
+	reason VARCHAR,
+	start_time DOUBLE,
+	startup_time DOUBLE,
+	startup_rss BIGINT
+);
+
+-- session settings of the postgres connections of a run, as reported by the server.
+create table if not exists postgres_settings(
+	run_id BIGINT,
+	work_mem VARCHAR,
+	hash_mem_multiplier DOUBLE,
+	max_parallel_workers_per_gather BIGINT
+);
+
+-- the worker processes of a run with --client_mode=processes|instances, one row per worker
+create table if not exists client_workers(
+	run_id BIGINT,
+	client_mode VARCHAR,
+	worker BIGINT,
+	pid BIGINT,
+	memory_limit DOUBLE, -- GB, memory_limit of the duckdb instance of the worker
+	temp_directory VARCHAR,
+	runtime DOUBLE, -- seconds the worker needed for its query
+	error VARCHAR,
+	signal BIGINT -- set if the worker was killed
+);
+
+-- memory of every worker process over time (values in kB, see proc_tree_mem_info)
+create or replace view client_worker_mem as
+select w.run_id, w.client_mode, w.worker, w.memory_limit, t."Time", t.Rss, t.Pss, t.Uss, t.Anonymous, t.File, t.Swap
+from client_workers w join proc_tree_mem_info t on t.run_id = w.run_id and t.Pid = w.pid;
+
+-- every query of a contention run (--contention). run_id is the sampler run of the system in its phase
+-- (runs.run_type is solo or contention). start_time and end_time are on the monotonic clock of the samples.
+create table if not exists contention_queries(
+	run_id BIGINT,
+	client VARCHAR,
+	query_tag VARCHAR,
+	start_time BIGINT,
+	end_time BIGINT,
+	runtime DOUBLE, -- seconds
+	outcome VARCHAR -- success, cancelled at the end of the phase, or the outcome of the error
+);
+
+-- mean runtime of the successful queries of every system alone and under contention. slowdown is contention_runtime / solo_runtime.
+-- the row without query_tag summarizes the system, its slowdown is the geometric mean over its queries.
+create table if not exists contention_slowdown(
+	benchmark_name VARCHAR,
+	benchmark VARCHAR,
+	contention_name VARCHAR,
+	system VARCHAR,
+	query_tag VARCHAR,
+	solo_queries BIGINT,
+	solo_runtime DOUBLE,
+	contention_queries BIGINT,
+	contention_runtime DOUBLE,
+	slowdown DOUBLE
+);
+
+-- how much of the database files of the system is in the page cache, scanned with mincore every --residency_interval seconds.
+-- Path is the database file or the postgres database directory, Bytes and Resident are summed over its files.
+create table if not exists page_cache_info(
+	run_id BIGINT,
+	"Time" BIGINT, -- monotonic clock in ns, see runs.start_monotonic
+	Path VARCHAR,
+	Files BIGINT,
+	Bytes BIGINT,
+	Resident BIGINT -- bytes in the page cache
+);
+
+-- every eviction of the database files of a system before a cold run (--cold_mode=evict). sizes in bytes.
+create table if not exists page_cache_evictions(
+	benchmark_name VARCHAR,
+	benchmark VARCHAR,
+	system VARCHAR,
+	evict_time DOUBLE, -- unix time
+	files BIGINT,
+	bytes BIGINT,
+	resident_before BIGINT,
+	resident_after BIGINT
+);
+
+-- median peak rss (kB) and wall time (seconds) of the successful runs of every query at every scale factor of a --scale_factors sweep.
+-- stored in the data.duckdb of the benchmark without scale factor (tpch), the runs are in the data.duckdb of every scale factor (tpch-sf10).
+create table if not exists scaling_points(
+	benchmark_name VARCHAR,
+	benchmark VARCHAR,
+	scale_factor BIGINT,
+	system VARCHAR,
+	query_name VARCHAR,
+	run_type VARCHAR,
+	memory_limit DOUBLE,
+	threads BIGINT,
+	runs BIGINT,
+	peak_rss DOUBLE,
+	wall_time DOUBLE,
+	data_bytes BIGINT, -- size of the duckdb database at the scale factor
+	memory_bytes BIGINT -- memory_limit or the memory of the host
+);
+
+-- log(peak_rss) and log(wall_time) fitted against log(data_bytes) over the scale factors of every query. an exponent of 1 is linear scaling.
+-- the step exponents are between two neighbouring scale factors, a cliff is a step whose runtime exponent is above 2.
+create table if not exists scaling_fits(
+	benchmark_name VARCHAR,
+	benchmark VARCHAR,
+	system VARCHAR,
+	query_name VARCHAR,
+	run_type VARCHAR,
+	memory_limit DOUBLE,
+	threads BIGINT,
+	scale_factors BIGINT,
+	memory_exponent DOUBLE,
+	memory_intercept DOUBLE,
+	memory_r2 DOUBLE,
+	runtime_exponent DOUBLE,
+	runtime_intercept DOUBLE,
+	runtime_r2 DOUBLE,
+	max_memory_step_exponent DOUBLE,
+	max_runtime_step_exponent DOUBLE,
+	cliff_scale_factor BIGINT, -- first scale factor reached with a runtime cliff
+	outgrows_memory_scale_factor BIGINT, -- first scale factor whose database is larger than memory_bytes
+	memory_scaling VARCHAR -- sublinear, linear or superlinear
+);
+
+-- the parameters of every query of the synthetic benchmark (see experiments/synthetic-operators.toml), query_name is runs.query_name.
+-- rows is the number of rows aggregated or probed. distinct_groups is the number of groups the (skewed) keys actually hit.
+create table if not exists synthetic_queries(
+	benchmark_name VARCHAR,
+	benchmark VARCHAR,
+	query_name VARCHAR,
+	operator VARCHAR, -- aggregation or join
+	table_names VARCHAR[],
+	rows BIGINT,
+	groups BIGINT,
+	distinct_groups BIGINT,
+	skew DOUBLE, -- zipf exponent of the keys, 0 is uniform
+	payload_bytes BIGINT,
+	build_rows BIGINT,
+	probe_rows BIGINT
+);
+
+-- median wall time and peak rss of every query at each thread count, compared to the smallest thread count (baseline_threads) it ran with at the same memory limit and connections.
+-- effective_threads is threads, the cpus of the host for 0 and the parallel workers plus the leader for postgres. efficiency is speedup / (effective_threads / baseline_threads).
+create table if not exists thread_scaling(
+	benchmark_name VARCHAR,
+	benchmark VARCHAR,
+	system VARCHAR,
+	query_name VARCHAR,
+	run_type VARCHAR,
+	memory_limit DOUBLE,
+	connections BIGINT,
+	threads BIGINT,
+	effective_threads BIGINT,
+	runs BIGINT,
+	wall_time DOUBLE,
+	peak_rss DOUBLE, -- kB, peak Pss of the process tree for runs sampled with --sampler_mode=tree, else peak VmRSS of the process
+	memory_source VARCHAR, -- tree_pss, process_rss or mixed (some runs of each)
+	baseline_threads BIGINT,
+	speedup DOUBLE,
+	efficiency DOUBLE,
+	peak_rss_growth DOUBLE, -- peak_rss / peak_rss at baseline_threads
+	rss_per_added_thread DOUBLE -- kB of peak rss per thread over baseline_threads
+);
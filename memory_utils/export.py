@@ -0,0 +1,61 @@
+import os
+
+PARTITION_COLUMNS = ['system', 'benchmark', 'run_type']
+RUN_COLUMNS = ['benchmark_name', 'benchmark', 'system', 'run_type', 'query_name']
+ORDER_COLUMNS = ['query_name', 'Time']
+EXPORTED_VIEWS = ['proc_mem_info']
+
+
+def get_table_columns(con, table):
+    return [row[0] for row in con.execute("SELECT column_name FROM duckdb_columns() WHERE database_name = current_database() AND table_name = ? ORDER BY column_index", [table]).fetchall()]
+
+
+def get_tables(con):
+    # the result tables and the views the graph_utils scripts read
+    tables = [row[0] for row in con.execute("SELECT table_name FROM duckdb_tables() WHERE database_name = current_database() ORDER BY table_name").fetchall()]
+    views = [row[0] for row in con.execute("SELECT view_name FROM duckdb_views() WHERE database_name = current_database() AND view_name IN ? ORDER BY view_name", [EXPORTED_VIEWS]).fetchall()]
+    return tables + views
+
+
+def export_parquet(con, output_dir, benchmark):
+    # Writes every non empty table to <output_dir>/<table>/ as ZSTD compressed parquet.
+    # Sample tables are hive partitioned by system/benchmark/run_type, so readers
+    # only open the partitions they filter on. Rows are sorted by query_name and
+    # Time, which keeps the min/max statistics of the row groups selective.
+    # Tables with a run_id get the identifiers of the run they don't have from runs.
+    # Tables that can't be partitioned go to <output_dir>/<table>/<benchmark>.parquet.
+    os.makedirs(output_dir, exist_ok=True)
+    for table in get_tables(con):
+        if con.execute(f'SELECT count(*) FROM "{table}"').fetchone()[0] == 0:
+            continue
+        columns = get_table_columns(con, table)
+        query = f'SELECT * FROM "{table}" t'
+        # only the identifiers the table doesn't have itself are taken from runs. rows
+        # without a run (e.g. hyperd failed to start before the sampler) are kept.
+        run_columns = []
+        if 'run_id' in columns and table != 'runs':
+            run_columns = [column for column in RUN_COLUMNS if column not in columns]
+        if len(run_columns) > 0:
+            query = f"SELECT {', '.join([f'runs.{column}' for column in run_columns])}, t.* FROM \"{table}\" t LEFT JOIN runs USING (run_id)"
+        order_by = [f't."{column}"' if column in columns else f'runs."{column}"' for column in ORDER_COLUMNS if column in columns + run_columns]
+        if len(order_by) > 0:
+            query += f" ORDER BY {', '.join(order_by)}"
+        columns = columns + run_columns
+        options = "FORMAT PARQUET, COMPRESSION ZSTD"
+        if all([column in columns for column in PARTITION_COLUMNS]):
+            # the partitions of other benchmarks written to the same directory are kept
+            target = f"{output_dir}/{table}"
+            options += f", PARTITION_BY ({', '.join(PARTITION_COLUMNS)}), OVERWRITE_OR_IGNORE 1"
+        else:
+            os.makedirs(f"{output_dir}/{table}", exist_ok=True)
+            target = f"{output_dir}/{table}/{benchmark}.parquet"
+        con.sql(f"COPY ({query}) TO '{target}' ({options})")
+
+
+def export_csv(con, output_dir):
+    # one <table>.csv per non empty table
+    os.makedirs(output_dir, exist_ok=True)
+    for table in get_tables(con):
+        if con.execute(f'SELECT count(*) FROM "{table}"').fetchone()[0] == 0:
+            continue
+        con.sql(f"COPY \"{table}\" TO '{output_dir}/{table}.csv' (FORMAT CSV, HEADER 1)")
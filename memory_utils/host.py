@@ -0,0 +1,77 @@
+import os
+
+from memory_utils import poll_memory
+from memory_utils.sample_buffer import SampleBuffer
+
+PROC_READ_SIZE = 16384
+
+# reclaim, fault and swap counters from /proc/vmstat. stored as the delta to the previous sample.
+# pgscan/pgsteal are summed over kswapd, direct, khugepaged and proactive reclaim. newer kernels also
+# split the same scans into pgscan_anon/pgscan_file, those must not be added on top.
+reclaim_sources = ['kswapd', 'direct', 'khugepaged', 'proactive']
+vmstat_keys = ['pgscan_kswapd', 'pgscan_direct', 'pgsteal_kswapd', 'pgsteal_direct', 'pgfault', 'pgmajfault', 'pswpin', 'pswpout', 'workingset_refault_anon', 'workingset_refault_file', 'allocstall_normal', 'compact_stall', 'oom_kill']
+vmstat_columns = [('Time', 'BIGINT'), ('pgscan', 'BIGINT'), ('pgsteal', 'BIGINT')] + [(key, 'BIGINT') for key in vmstat_keys]
+
+
+def parse_meminfo(raw):
+    result = {}
+    for line in raw.decode().splitlines():
+        parts = line.split()
+        result[parts[0].replace(":", "")] = parts[1]
+    return result
+
+
+def parse_vmstat(raw):
+    result = {}
+    for line in raw.decode().splitlines():
+        key, _, value = line.partition(" ")
+        result[key] = int(value)
+    # older kernels don't split refaults into anon and file
+    if 'workingset_refault' in result and 'workingset_refault_file' not in result:
+        result['workingset_refault_file'] = result['workingset_refault']
+    result['pgscan'] = sum([result.get(f'pgscan_{source}', 0) for source in reclaim_sources])
+    result['pgsteal'] = sum([result.get(f'pgsteal_{source}', 0) for source in reclaim_sources])
+    return result
+
+
+class HostMemoryCollector():
+    # Samples the host wide /proc/meminfo into time_info and the reclaim
+    # and swap counters of /proc/vmstat as deltas into vmstat_info.
+    def __init__(self, capacity, flush_interval):
+        self.meminfo_fd = None
+        self.vmstat_fd = None
+        self.previous_vmstat = None
+        self.meminfo_samples = SampleBuffer('time_info', poll_memory.sample_columns, capacity, flush_interval)
+        self.vmstat_samples = SampleBuffer('vmstat_info', vmstat_columns, capacity, flush_interval)
+
+    def open(self):
+        self.meminfo_fd = os.open(poll_memory.MEM_INFO_FILE, os.O_RDONLY)
+        self.vmstat_fd = os.open("/proc/vmstat", os.O_RDONLY)
+        # deltas of the first sample are relative to the moment sampling starts
+        self.previous_vmstat = parse_vmstat(os.pread(self.vmstat_fd, PROC_READ_SIZE, 0))
+
+    def close(self):
+        for fd in [self.meminfo_fd, self.vmstat_fd]:
+            if fd is not None:
+                os.close(fd)
+        self.meminfo_fd = None
+        self.vmstat_fd = None
+
+    def sample(self, now):
+        meminfo = poll_memory.convert_values(parse_meminfo(os.pread(self.meminfo_fd, PROC_READ_SIZE, 0)))
+        meminfo['Time'] = now
+        self.meminfo_samples.append(meminfo)
+
+        vmstat = parse_vmstat(os.pread(self.vmstat_fd, PROC_READ_SIZE, 0))
+        row = {'Time': now}
+        for key, _ in vmstat_columns[1:]:
+            if key in vmstat and key in self.previous_vmstat:
+                row[key] = vmstat[key] - self.previous_vmstat[key]
+        self.vmstat_samples.append(row)
+        self.previous_vmstat = vmstat
+        return True
+
+    def flush(self, con, identifiers, force=False):
+        if force or self.meminfo_samples.should_flush() or self.vmstat_samples.should_flush():
+            self.meminfo_samples.flush(con, identifiers)
+            self.vmstat_samples.flush(con, identifiers)
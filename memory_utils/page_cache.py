@@ -0,0 +1,182 @@
+import ctypes
+import ctypes.util
+import mmap
+import os
+import time
+import threading
+import duckdb
+
+from memory_utils.sample_buffer import SampleBuffer
+
+# mincore of a large database walks one byte per page, so the residency is scanned less often than the sample interval
+DEFAULT_RESIDENCY_SCAN_INTERVAL = 1.0
+# files are mapped and checked in windows of this size, so the vector mincore fills stays small (256KB for 4KB pages)
+MINCORE_WINDOW = 1024 * 1024 * 1024
+PAGE_SIZE = mmap.PAGESIZE
+
+page_cache_columns = [('Time', 'BIGINT'), ('Path', 'VARCHAR'), ('Files', 'BIGINT'), ('Bytes', 'BIGINT'), ('Resident', 'BIGINT')]
+
+libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+libc.mmap.restype = ctypes.c_void_p
+libc.mmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_long]
+libc.munmap.argtypes = [ctypes.c_void_p, ctypes.c_size_t]
+libc.mincore.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.POINTER(ctypes.c_ubyte)]
+MAP_FAILED = ctypes.c_void_p(-1).value
+
+
+def get_files(paths):
+    # the regular files of paths, directories (e.g. the postgres database directory) are walked recursively.
+    # paths that don't exist are skipped.
+    files = []
+    for path in paths:
+        if os.path.isfile(path):
+            files.append(path)
+        for directory, _, names in os.walk(path):
+            files += [os.path.join(directory, name) for name in names if os.path.isfile(os.path.join(directory, name))]
+    return files
+
+
+def get_resident_bytes(path):
+    # size of the file and how many of its bytes are in the page cache.
+    # the file is mapped without being read, mincore only reports which of the pages are resident.
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        resident_pages = 0
+        offset = 0
+        while offset < size:
+            length = min(MINCORE_WINDOW, size - offset)
+            address = libc.mmap(None, length, mmap.PROT_READ, mmap.MAP_SHARED, fd, offset)
+            if address == MAP_FAILED:
+                raise OSError(ctypes.get_errno(), f"mmap of {path} failed")
+            try:
+                pages = (length + PAGE_SIZE - 1) // PAGE_SIZE
+                vector = (ctypes.c_ubyte * pages)()
+                if libc.mincore(address, length, vector) != 0:
+                    raise OSError(ctypes.get_errno(), f"mincore of {path} failed")
+                # only the lowest bit is defined, the others are reserved and 0
+                resident_pages += pages - bytes(vector).count(0)
+            finally:
+                libc.munmap(address, length)
+            offset += length
+        return size, min(resident_pages * PAGE_SIZE, size)
+    finally:
+        os.close(fd)
+
+
+def get_residency(paths):
+    # number of files, bytes and resident bytes of all files below paths
+    files = 0
+    size = 0
+    resident = 0
+    for path in get_files(paths):
+        try:
+            file_size, file_resident = get_resident_bytes(path)
+        except FileNotFoundError:
+            # the engine removed the file (e.g. a postgres temp relation) while we were scanning
+            continue
+        except PermissionError:
+            continue
+        files += 1
+        size += file_size
+        resident += file_resident
+    return files, size, resident
+
+
+def evict_files(paths):
+    # Drops the clean pages of the files below paths from the page cache with
+    # POSIX_FADV_DONTNEED. Unlike drop_caches this doesn't need root (only read
+    # access to the files) and leaves the page cache of everything else on the
+    # host alone. Pages that are mapped by a process stay in memory.
+    # Returns the number of evicted files.
+    evicted = 0
+    for path in get_files(paths):
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            continue
+        except PermissionError as e:
+            print(f"Error: cannot evict {path}: {e}")
+            continue
+        try:
+            # dirty pages can't be dropped, write them back first
+            os.fdatasync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            evicted += 1
+        finally:
+            os.close(fd)
+    return evicted
+
+
+def write_page_cache_eviction(data_db, identifiers, files, size, resident_before, resident_after):
+    # identifiers are benchmark_name, benchmark, system
+    con = duckdb.connect(data_db)
+    con.execute("INSERT INTO page_cache_evictions VALUES (?, ?, ?, ?, ?, ?, ?, ?)", identifiers + [time.time(), files, size, resident_before, resident_after])
+    con.close()
+
+
+class PageCacheCollector():
+    # Samples how many bytes of the database files of the engine (the duckdb
+    # or hyper file, the postgres database directory) are in the page cache
+    # into page_cache_info, one row per path and scan. Together with the RSS
+    # of the engine it separates the page cache from the memory of the engine
+    # and shows how fast the engine brings its working set into memory.
+    # A scan of a large database takes longer than the sample interval, so it
+    # runs in its own thread. The sampler thread only moves the finished scans
+    # into the buffer.
+    def __init__(self, paths, capacity, flush_interval, scan_interval=DEFAULT_RESIDENCY_SCAN_INTERVAL):
+        self.paths = paths
+        self.scan_interval = scan_interval
+        self.scanner = None
+        self.stop_event = threading.Event()
+        # scans the sampler thread didn't pick up yet
+        self.pending = []
+        self.lock = threading.Lock()
+        self.samples = SampleBuffer('page_cache_info', page_cache_columns, capacity, flush_interval)
+
+    def open(self):
+        readable = []
+        for path in self.paths:
+            if os.access(path, os.R_OK):
+                readable.append(path)
+            elif os.path.exists(path):
+                # the postgres data directory belongs to the postgres user
+                print(f"Error: cannot read the page cache residency of {path}, permission denied")
+        self.paths = readable
+        if len(self.paths) > 0:
+            self.scanner = threading.Thread(target=self.scan, name="page_cache_scanner", daemon=True)
+            self.scanner.start()
+
+    def scan(self):
+        while not self.stop_event.is_set():
+            for path in self.paths:
+                now = time.monotonic_ns()
+                files, size, resident = get_residency([path])
+                with self.lock:
+                    self.pending.append({'Time': now, 'Path': path, 'Files': files, 'Bytes': size, 'Resident': resident})
+            self.stop_event.wait(self.scan_interval)
+
+    def collect(self):
+        # a full buffer takes the rest after its next flush
+        with self.lock:
+            free = self.samples.capacity - self.samples.size
+            rows = self.pending[:free]
+            self.pending = self.pending[free:]
+        for row in rows:
+            self.samples.append(row)
+
+    def close(self):
+        # waits for a scan that is still running, its result is flushed with the rest
+        self.stop_event.set()
+        if self.scanner is not None:
+            self.scanner.join()
+            self.scanner = None
+        self.collect()
+
+    def sample(self, now):
+        self.collect()
+        return True
+
+    def flush(self, con, identifiers, force=False):
+        if force or self.samples.should_flush():
+            self.samples.flush(con, identifiers)
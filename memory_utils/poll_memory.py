@@ -3,10 +3,18 @@ import sys
 import os
 import duckdb
 
+SYSTEM_DIR = os.path.dirname(__file__)
+sys.path.append(f'{SYSTEM_DIR}/..')
+from memory_utils.sample_buffer import SampleBuffer
+from memory_utils.runs import register_run
+
 MEM_INFO_FILE = "/proc/meminfo"
 
 known_keys = ['Active', 'Active(anon)', 'Active(file)', 'AnonHugePages', 'AnonPages', 'Bounce', 'Buffers', 'Cached', 'CommitLimit', 'Committed_AS', 'DirectMap1G', 'DirectMap2M', 'DirectMap4k', 'Dirty', 'FileHugePages', 'FilePmdMapped', 'HardwareCorrupted', 'HugePages_Free', 'HugePages_Rsvd', 'HugePages_Surp', 'HugePages_Total', 'Hugepagesize', 'Hugetlb', 'Inactive', 'Inactive(anon)', 'Inactive(file)', 'KReclaimable', 'KernelStack', 'Mapped', 'MemAvailable', 'MemFree', 'MemTotal', 'Mlocked', 'NFS_Unstable', 'PageTables', 'Percpu', 'SReclaimable', 'SUnreclaim', 'SecPageTables', 'Shmem', 'ShmemHugePages', 'ShmemPmdMapped', 'Slab', 'SwapCached', 'SwapFree', 'SwapTotal', 'Unevictable', 'VmallocChunk', 'VmallocTotal', 'VmallocUsed', 'Writeback', 'WritebackTmp', 'Zswap', 'Zswapped']
 
+# all meminfo values are stored as BIGINT (see time_info in data_schema.sql)
+sample_columns = [('Time', 'BIGINT')] + [(key, 'BIGINT') for key in known_keys]
+
 
 def parse_memory_info(file_path):
     result = {}
@@ -35,33 +43,16 @@ def parse_memory_info(file_path):
     return result
 
 
-def get_csv_line(parsed_mem_info):
-    try:
-        # Get the sorted values from the dictionary
-        sorted_keys = sorted(parsed_mem_info.keys())
-
-        csv_string = ""
-        separator = ""
-        # Convert the sorted values to some separated thing
-        for key in known_keys:
-            if key in parsed_mem_info:
-                csv_string += separator + f"'{parsed_mem_info[key]}'"
-            else:
-                csv_string += separator + separator
-            separator = ","
-
-        return csv_string
-    except Exception as e:
-        print(f"Error: {e}")
-        return None
-
-def get_query_specific_values(benchmark_name, benchmark, system, run, query):
-    benchmark_name_quoted = f"\'{benchmark_name}'"
-    benchmark_quoted = f"'{benchmark}'"
-    system_quoted = f"'{system}'"
-    run_quoted = f"'{run}'"
-    query_quoted = f"'{query}'"
-    return ",".join([benchmark_name_quoted, benchmark_quoted, system_quoted, run_quoted, query_quoted])
+def convert_values(parsed_mem_info):
+    row = {}
+    for key in known_keys:
+        if key not in parsed_mem_info:
+            continue
+        try:
+            row[key] = int(parsed_mem_info[key])
+        except ValueError:
+            row[key] = None
+    return row
 
 
 def poll_meminfo_duckdb(data_db, lock_file, benchmark_name, benchmark, system, run, query):
@@ -69,17 +60,21 @@ def poll_meminfo_duckdb(data_db, lock_file, benchmark_name, benchmark, system, r
 
     con = duckdb.connect(data_db)
 
-    benchmark_identifiers = get_query_specific_values(benchmark_name, benchmark, system, run, query)
+    benchmark_identifiers = [register_run(con, benchmark_name, benchmark, system, run, query)]
+    samples = SampleBuffer('time_info', sample_columns)
     while os.path.exists(lock_file):
         parsed_mem_info = parse_memory_info(MEM_INFO_FILE)
 
-        now = time.time()
-        log = benchmark_identifiers + "," + str(now) + "," + get_csv_line(parsed_mem_info) + "\n"
-        con.sql(f"INSERT INTO time_info VALUES ({log})")
+        row = convert_values(parsed_mem_info)
+        row['Time'] = time.monotonic_ns()
+        samples.append(row)
+        if samples.should_flush():
+            samples.flush(con, benchmark_identifiers)
 
         # Wait for 0.2 seconds before polling again
         time.sleep(0.2)
 
+    samples.flush(con, benchmark_identifiers)
     con.close()
 
 
@@ -4,11 +4,27 @@ import os
 import duckdb
 import re
 
+SYSTEM_DIR = os.path.dirname(__file__)
+sys.path.append(f'{SYSTEM_DIR}/..')
+from memory_utils.sample_buffer import SampleBuffer
+from memory_utils.runs import register_run
+
 def get_proc_status_file(pid):
     return f"/proc/{pid}/status"
 
 known_keys = ['Name', 'Umask', 'State', 'Tgid', 'Ngid', 'Pid', 'PPid', 'TracerPid', 'Uid', 'Gid', 'FDSize', 'Groups', 'NStgid', 'NSpid', 'NSpgid', 'NSsid', 'VmPeak', 'VmSize', 'VmLck', 'VmPin', 'VmHWM', 'VmRSS', 'RssAnon', 'RssFile', 'RssShmem', 'VmData', 'VmStk', 'VmExe', 'VmLib', 'VmPTE', 'VmSwap', 'HugetlbPages', 'CoreDumping', 'THP_enabled', 'Threads', 'SigQ', 'SigPnd', 'ShdPnd', 'SigBlk', 'SigIgn', 'SigCgt', 'CapInh', 'CapPrm', 'CapEff', 'CapBnd', 'CapAmb', 'NoNewPrivs', 'Seccomp', 'Seccomp_filters', 'Speculation_Store_Bypass', 'SpeculationIndirectBranch', 'Cpus_allowed', 'Cpus_allowed_list', 'Mems_allowed', 'Mems_allowed_list', 'voluntary_ctxt_switches', 'nonvoluntary_ctxt_switches']
 
+# every other key is stored as a BIGINT (see runs and samples in data_schema.sql)
+varchar_keys = ['Name', 'Umask', 'State', 'Uid', 'Gid', 'Groups', 'SigQ', 'SigPnd', 'ShdPnd', 'SigBlk', 'SigIgn', 'SigCgt', 'CapInh', 'CapPrm', 'CapEff', 'CapBnd', 'CapAmb', 'Speculation_Store_Bypass', 'SpeculationIndirectBranch', 'Cpus_allowed', 'Cpus_allowed_list', 'Mems_allowed', 'Mems_allowed_list']
+
+# keys that change while a query runs. they are stored with every sample, the
+# other keys (except State) only once per run in the runs table.
+sample_keys = ['FDSize', 'VmPeak', 'VmSize', 'VmLck', 'VmPin', 'VmHWM', 'VmRSS', 'RssAnon', 'RssFile', 'RssShmem', 'VmData', 'VmStk', 'VmExe', 'VmLib', 'VmPTE', 'VmSwap', 'HugetlbPages', 'Threads', 'voluntary_ctxt_switches', 'nonvoluntary_ctxt_switches']
+run_keys = [key for key in known_keys if key not in sample_keys and key != 'State']
+
+sample_columns = [('Time', 'BIGINT')] + [(key, 'BIGINT') for key in sample_keys]
+run_columns = [(key, 'VARCHAR' if key in varchar_keys else 'BIGINT') for key in run_keys]
+
 
 def parse_memory_info(file_path):
     result = {}
@@ -32,31 +48,19 @@ def parse_memory_info(file_path):
         print(f"Error: {e}")
     return result
 
-def get_csv_line(parsed_mem_info):
-    try:
-        # Get the sorted values from the dictionary
-        sorted_keys = sorted(parsed_mem_info.keys())
-        csv_string = ""
-        separator = ","
-        # Convert the sorted values to some separated thing
-        for key in known_keys:
-            if key in parsed_mem_info:
-                csv_string += f"'{parsed_mem_info[key]}'" + separator
-            else:
-                csv_string += "NULL" + separator
-            separator = ","
-        return csv_string
-    except Exception as e:
-        print(f"Error: {e}")
-        return None
-
-def get_query_specific_values(benchmark_name, benchmark, system, run, query):
-    benchmark_name_quoted = f"\'{benchmark_name}'"
-    benchmark_quoted = f"'{benchmark}'"
-    system_quoted = f"'{system}'"
-    run_quoted = f"'{run}'"
-    query_quoted = f"'{query}'"
-    return ",".join([benchmark_name_quoted, benchmark_quoted, system_quoted, run_quoted, query_quoted])
+def convert_values(parsed_mem_info, columns=sample_columns):
+    row = {}
+    for key, column_type in columns:
+        if key not in parsed_mem_info:
+            continue
+        value = parsed_mem_info[key]
+        if column_type == 'BIGINT':
+            try:
+                value = int(value)
+            except ValueError:
+                value = None
+        row[key] = value
+    return row
 
 
 def poll_meminfo_duckdb(data_db, lock_file, benchmark_name, benchmark, system, run, query, pid):
@@ -64,7 +68,8 @@ def poll_meminfo_duckdb(data_db, lock_file, benchmark_name, benchmark, system, r
 
     con = duckdb.connect(data_db)
 
-    benchmark_identifiers = get_query_specific_values(benchmark_name, benchmark, system, run, query)
+    benchmark_identifiers = None
+    samples = SampleBuffer('samples', sample_columns)
     while os.path.exists(lock_file):
         process_status_file = get_proc_status_file(pid)
         try:
@@ -72,13 +77,20 @@ def poll_meminfo_duckdb(data_db, lock_file, benchmark_name, benchmark, system, r
         except FileNotFoundError as e:
             print(f"seems like process {pid} no longer exists.")
             break
-        now = time.time()
-        log = benchmark_identifiers + "," + str(now) + "," + get_csv_line(parsed_mem_info) + "\n"
-        con.sql(f"INSERT INTO proc_mem_info VALUES ({log})")
+        if benchmark_identifiers is None:
+            run_id = register_run(con, benchmark_name, benchmark, system, run, query, attributes=convert_values(parsed_mem_info, run_columns))
+            benchmark_identifiers = [run_id]
+        row = convert_values(parsed_mem_info)
+        row['Time'] = time.monotonic_ns()
+        samples.append(row)
+        if samples.should_flush():
+            samples.flush(con, benchmark_identifiers)
 
         # Wait for 0.2 seconds before polling again
         time.sleep(0.2)
 
+    if benchmark_identifiers is not None:
+        samples.flush(con, benchmark_identifiers)
     con.close()
 
 
@@ -0,0 +1,24 @@
+import time
+
+
+def register_run(con, benchmark_name, benchmark, system, run_type, query_name, connections=1, memory_limit=0, threads=0, attributes={}):
+    # Inserts a row into runs and returns its run_id. attributes are the static
+    # values of /proc/<pid>/status of the sampled process (see run_columns in
+    # poll_process_mem.py). Both clocks are read here, samples store the
+    # monotonic clock and can be mapped back to wall clock time with them.
+    row = {
+        'benchmark_name': benchmark_name,
+        'benchmark': benchmark,
+        'system': system,
+        'run_type': run_type,
+        'query_name': query_name,
+        'connections': connections,
+        'memory_limit': memory_limit,
+        'threads': threads,
+        'start_time': time.time(),
+        'start_monotonic': time.monotonic_ns(),
+    }
+    row.update(attributes)
+    column_list = ", ".join([f'"{name}"' for name in row.keys()])
+    placeholders = ", ".join(["?"] * len(row))
+    return con.execute(f"INSERT INTO runs ({column_list}) VALUES ({placeholders}) RETURNING run_id", list(row.values())).fetchone()[0]
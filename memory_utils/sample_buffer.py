@@ -0,0 +1,73 @@
+import time
+import numpy as np
+import pyarrow as pa
+
+DEFAULT_CAPACITY = 8192
+# seconds between two flushes while sampling. the rest is flushed when sampling stops.
+DEFAULT_FLUSH_INTERVAL = 10
+
+NUMPY_TYPES = {
+    'BIGINT': np.int64,
+    'DOUBLE': np.float64,
+}
+
+
+class SampleBuffer():
+    # Column-oriented buffer for samples. Numeric columns are preallocated numpy
+    # arrays with a null mask, VARCHAR columns are plain lists. A flush turns
+    # the filled part into an arrow table and inserts it with one statement.
+    def __init__(self, table, columns, capacity=DEFAULT_CAPACITY, flush_interval=DEFAULT_FLUSH_INTERVAL):
+        self.table = table
+        self.columns = columns
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.values = {}
+        self.nulls = {}
+        for name, column_type in self.columns:
+            if column_type in NUMPY_TYPES:
+                self.values[name] = np.zeros(capacity, dtype=NUMPY_TYPES[column_type])
+            else:
+                self.values[name] = [None] * capacity
+            self.nulls[name] = np.zeros(capacity, dtype=bool)
+        self.size = 0
+        self.last_flush = time.monotonic()
+
+    def append(self, row):
+        # row is a dict from column name to an already converted value (or None)
+        for name, _ in self.columns:
+            value = row.get(name)
+            if value is None:
+                self.nulls[name][self.size] = True
+            else:
+                self.values[name][self.size] = value
+                self.nulls[name][self.size] = False
+        self.size += 1
+
+    def is_full(self):
+        return self.size >= self.capacity
+
+    def should_flush(self):
+        return self.is_full() or (self.size > 0 and time.monotonic() - self.last_flush >= self.flush_interval)
+
+    def to_arrow(self):
+        arrays = []
+        for name, column_type in self.columns:
+            if column_type in NUMPY_TYPES:
+                arrays.append(pa.array(self.values[name][:self.size], mask=self.nulls[name][:self.size]))
+            else:
+                arrays.append(pa.array(self.values[name][:self.size], type=pa.string()))
+        return pa.Table.from_arrays(arrays, names=[name for name, _ in self.columns])
+
+    def flush(self, con, constants=[]):
+        # constants are written in front of the buffered columns, e.g. the
+        # benchmark identifiers that are the same for every sample of a run.
+        self.last_flush = time.monotonic()
+        if self.size == 0:
+            return
+        samples = self.to_arrow()
+        column_list = ", ".join([f'"{name}"' for name, _ in self.columns])
+        placeholders = "".join(["?, "] * len(constants))
+        con.register('sample_buffer', samples)
+        con.execute(f"INSERT INTO {self.table} SELECT {placeholders}{column_list} FROM sample_buffer", constants)
+        con.unregister('sample_buffer')
+        self.size = 0
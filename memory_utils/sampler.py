@@ -0,0 +1,473 @@
+import os
+import time
+import threading
+import duckdb
+import psutil
+
+from memory_utils.poll_process_mem import sample_columns, run_columns, convert_values
+from memory_utils.sample_buffer import SampleBuffer, DEFAULT_CAPACITY, DEFAULT_FLUSH_INTERVAL
+from memory_utils.cgroup import CgroupCollector
+from memory_utils.host import HostMemoryCollector
+from memory_utils.spill import SpillDirectoryCollector
+from memory_utils.page_cache import PageCacheCollector, DEFAULT_RESIDENCY_SCAN_INTERVAL
+from memory_utils.summary import write_query_summary, NS_PER_SECOND
+from memory_utils.runs import register_run
+
+DEFAULT_SAMPLE_INTERVAL = 0.01
+# how often (in seconds) the process tree is walked again to find new or exited processes
+DEFAULT_TREE_REFRESH_INTERVAL = 0.1
+PROC_READ_SIZE = 8192
+
+SAMPLER_MODES = ['status', 'tree']
+
+# values from /proc/<pid>/smaps_rollup that end up in proc_tree_mem_info (all in kB)
+smaps_rollup_keys = ['Rss', 'Pss', 'Pss_Anon', 'Pss_File', 'Pss_Shmem', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty', 'Anonymous', 'Swap', 'SwapPss']
+tree_memory_columns = ['Rss', 'Pss', 'Uss', 'Pss_Anon', 'Pss_File', 'Pss_Shmem', 'Anonymous', 'File', 'Swap', 'SwapPss']
+
+tree_process_columns = [('Time', 'BIGINT'), ('Pid', 'BIGINT'), ('PPid', 'BIGINT'), ('Name', 'VARCHAR')] + [(key, 'BIGINT') for key in tree_memory_columns]
+tree_total_columns = [('Time', 'BIGINT'), ('Processes', 'BIGINT')] + [(key, 'BIGINT') for key in tree_memory_columns]
+
+proc_fault_columns = [('Time', 'BIGINT'), ('Pid', 'BIGINT'), ('minflt', 'BIGINT'), ('majflt', 'BIGINT')]
+
+# byte counters of /proc/<pid>/io, stored as the delta to the previous sample summed over the processes
+io_keys = ['rchar', 'wchar', 'read_bytes', 'write_bytes', 'cancelled_write_bytes']
+proc_io_columns = [('Time', 'BIGINT'), ('Processes', 'BIGINT')] + [(key, 'BIGINT') for key in io_keys]
+
+
+def parse_proc_status(raw):
+    result = {}
+    for line in raw.decode().splitlines():
+        name, _, value = line.partition(":")
+        value = value.strip()
+        if value.endswith(" kB"):
+            value = value[:-3]
+        result[name] = value
+    return result
+
+
+def parse_smaps_rollup(raw):
+    result = {}
+    for line in raw.decode().splitlines():
+        parts = line.split()
+        # the first line is the address range header
+        if len(parts) != 3:
+            continue
+        name = parts[0].replace(":", "")
+        if name in smaps_rollup_keys:
+            result[name] = int(parts[1])
+    rss = result.get('Rss', 0)
+    anonymous = result.get('Anonymous', 0)
+    result['Uss'] = result.get('Private_Clean', 0) + result.get('Private_Dirty', 0)
+    result['File'] = rss - anonymous
+    return result
+
+
+class ProcessStatusCollector():
+    # Samples /proc/<pid>/status of one process into samples. The values that
+    # don't change during a run are kept from the first sample in attributes.
+    # The status file is opened once and re-read with pread, so a sample costs
+    # one syscall + parsing instead of an open/read/close per poll.
+    def __init__(self, pid, capacity, flush_interval):
+        self.pid = pid
+        self.samples = SampleBuffer('samples', sample_columns, capacity, flush_interval)
+        self.status_fd = None
+        self.attributes = None
+        # highest VmRSS (kB) seen while sampling. VmHWM can't be used since it covers the whole process lifetime.
+        self.peak_rss = None
+
+    def open(self):
+        self.status_fd = os.open(f"/proc/{self.pid}/status", os.O_RDONLY)
+
+    def close(self):
+        if self.status_fd is not None:
+            os.close(self.status_fd)
+            self.status_fd = None
+
+    def sample(self, now):
+        try:
+            raw = os.pread(self.status_fd, PROC_READ_SIZE, 0)
+        except (OSError, TypeError):
+            # process is gone (ESRCH) or the file was already closed.
+            print(f"seems like process {self.pid} no longer exists.")
+            return False
+        parsed = parse_proc_status(raw)
+        if self.attributes is None:
+            self.attributes = convert_values(parsed, run_columns)
+        row = convert_values(parsed)
+        row['Time'] = now
+        if row.get('VmRSS') is not None and (self.peak_rss is None or row['VmRSS'] > self.peak_rss):
+            self.peak_rss = row['VmRSS']
+        self.samples.append(row)
+        return True
+
+    def flush(self, con, identifiers, force=False):
+        if force or self.samples.should_flush():
+            self.samples.flush(con, identifiers)
+
+
+def parse_proc_stat_faults(raw):
+    # the command name (field 2) is in parentheses and may contain spaces,
+    # so split after the last ')'. minflt and majflt are fields 10 and 12.
+    fields = raw.decode().rsplit(")", 1)[1].split()
+    return int(fields[7]), int(fields[9])
+
+
+class ProcessFaultCollector():
+    # Samples the minor and major page faults of one process from
+    # /proc/<pid>/stat into proc_fault_info, as deltas to the previous sample.
+    def __init__(self, pid, capacity, flush_interval):
+        self.pid = pid
+        self.stat_fd = None
+        self.previous = None
+        self.samples = SampleBuffer('proc_fault_info', proc_fault_columns, capacity, flush_interval)
+
+    def open(self):
+        self.stat_fd = os.open(f"/proc/{self.pid}/stat", os.O_RDONLY)
+        self.previous = parse_proc_stat_faults(os.pread(self.stat_fd, PROC_READ_SIZE, 0))
+
+    def close(self):
+        if self.stat_fd is not None:
+            os.close(self.stat_fd)
+            self.stat_fd = None
+
+    def sample(self, now):
+        try:
+            faults = parse_proc_stat_faults(os.pread(self.stat_fd, PROC_READ_SIZE, 0))
+        except (OSError, TypeError):
+            return False
+        self.samples.append({'Time': now, 'Pid': self.pid, 'minflt': faults[0] - self.previous[0], 'majflt': faults[1] - self.previous[1]})
+        self.previous = faults
+        return True
+
+    def flush(self, con, identifiers, force=False):
+        if force or self.samples.should_flush():
+            self.samples.flush(con, identifiers)
+
+
+def parse_proc_io(raw):
+    result = {}
+    for line in raw.decode().splitlines():
+        name, _, value = line.partition(":")
+        if name in io_keys:
+            result[name] = int(value)
+    return result
+
+
+def get_process_tree(root_pids, excluded_roots=[]):
+    # the processes below excluded_roots and the excluded roots themselves are left out
+    excluded = set([process.pid for process in get_process_tree(excluded_roots)]) if len(excluded_roots) > 0 else set()
+    tree = []
+    for root_pid in root_pids:
+        try:
+            root = psutil.Process(root_pid)
+            tree.extend([process for process in [root] + root.children(recursive=True) if process.pid not in excluded])
+        except psutil.NoSuchProcess:
+            continue
+    return tree
+
+
+class ProcessIoCollector():
+    # Samples /proc/<pid>/io of the engine processes into proc_io_info as the
+    # bytes read and written since the previous sample, summed over the
+    # processes. read_bytes/write_bytes are what reached the block layer (e.g.
+    # spilling), rchar/wchar also count I/O served by the page cache. With
+    # recursive all processes below root_pids are sampled. Processes that
+    # start during the run (e.g. parallel workers) count from 0.
+    # The kernel adds the counters of a child to its parent once the parent
+    # reaps it, so what was already counted for an exited child is taken off
+    # the next deltas of its parent. That also keeps the I/O the child did
+    # after its last sample.
+    def __init__(self, root_pids, recursive, capacity, flush_interval, refresh_interval=DEFAULT_TREE_REFRESH_INTERVAL, excluded_roots=[]):
+        self.root_pids = root_pids
+        self.excluded_roots = excluded_roots
+        self.recursive = recursive
+        self.refresh_interval = refresh_interval
+        self.last_refresh = 0
+        # pid -> (io fd, ppid, counters of the previous sample, bytes counted so far)
+        self.processes = {}
+        # ppid -> bytes counted for its exited children the parent didn't report yet
+        self.reaped = {}
+        self.warned = False
+        self.samples = SampleBuffer('proc_io_info', proc_io_columns, capacity, flush_interval)
+
+    def get_processes(self):
+        # (pid, ppid) of the sampled processes
+        if not self.recursive:
+            return [(pid, None) for pid in self.root_pids]
+        processes = []
+        for process in get_process_tree(self.root_pids, self.excluded_roots):
+            try:
+                processes.append((process.pid, process.ppid()))
+            except psutil.NoSuchProcess:
+                continue
+        return processes
+
+    def refresh(self, baseline):
+        alive = set()
+        for pid, ppid in self.get_processes():
+            alive.add(pid)
+            if pid in self.processes:
+                continue
+            try:
+                fd = os.open(f"/proc/{pid}/io", os.O_RDONLY)
+                previous = parse_proc_io(os.pread(fd, PROC_READ_SIZE, 0)) if baseline else {key: 0 for key in io_keys}
+                self.processes[pid] = (fd, ppid, previous, {key: 0 for key in io_keys})
+            except PermissionError as e:
+                # the io file of other users' processes needs root
+                if not self.warned:
+                    print(f"Error: cannot read the io of process {pid}: {e}")
+                    self.warned = True
+            except OSError:
+                continue
+        for pid in list(self.processes.keys()):
+            if pid not in alive:
+                self.remove(pid, exited=True)
+        self.last_refresh = time.monotonic()
+
+    def remove(self, pid, exited=False):
+        fd, ppid, previous, counted = self.processes[pid]
+        os.close(fd)
+        del self.processes[pid]
+        if exited and ppid in self.processes:
+            reaped = self.reaped.setdefault(ppid, {key: 0 for key in io_keys})
+            for key in io_keys:
+                reaped[key] += counted[key]
+
+    def open(self):
+        # deltas of the first sample are relative to the moment sampling starts
+        self.refresh(baseline=True)
+
+    def close(self):
+        for pid in list(self.processes.keys()):
+            self.remove(pid)
+
+    def sample(self, now):
+        if time.monotonic() - self.last_refresh >= self.refresh_interval:
+            self.refresh(baseline=False)
+        total = {key: 0 for key in io_keys}
+        for pid, (fd, ppid, previous, counted) in list(self.processes.items()):
+            try:
+                current = parse_proc_io(os.pread(fd, PROC_READ_SIZE, 0))
+            except OSError:
+                self.remove(pid, exited=True)
+                continue
+            reaped = self.reaped.get(pid)
+            for key in io_keys:
+                delta = current[key] - previous[key]
+                if reaped is not None:
+                    already_counted = min(delta, reaped[key])
+                    reaped[key] -= already_counted
+                    delta -= already_counted
+                total[key] += delta
+                counted[key] += delta
+            self.processes[pid] = (fd, ppid, current, counted)
+        total['Time'] = now
+        total['Processes'] = len(self.processes)
+        self.samples.append(total)
+        return True
+
+    def flush(self, con, identifiers, force=False):
+        if force or self.samples.should_flush():
+            self.samples.flush(con, identifiers)
+
+
+class ProcessTreeCollector():
+    # Samples /proc/<pid>/smaps_rollup of every process below the given root
+    # pids (e.g. the postmaster and all its backends and parallel workers).
+    # Per process rows go to proc_tree_mem_info, the sum over the tree to
+    # proc_tree_mem_total. Pss divides shared pages between the processes
+    # mapping them, so the Pss total does not double count shared memory.
+    def __init__(self, root_pids, capacity, flush_interval, refresh_interval=DEFAULT_TREE_REFRESH_INTERVAL, excluded_roots=[]):
+        self.root_pids = root_pids
+        self.excluded_roots = excluded_roots
+        self.refresh_interval = refresh_interval
+        self.last_refresh = 0
+        # pid -> (ppid, name, smaps_rollup fd)
+        self.processes = {}
+        self.process_samples = SampleBuffer('proc_tree_mem_info', tree_process_columns, capacity, flush_interval)
+        self.total_samples = SampleBuffer('proc_tree_mem_total', tree_total_columns, capacity, flush_interval)
+
+    def refresh(self):
+        alive = set()
+        for process in get_process_tree(self.root_pids, self.excluded_roots):
+            alive.add(process.pid)
+            if process.pid in self.processes:
+                continue
+            try:
+                fd = os.open(f"/proc/{process.pid}/smaps_rollup", os.O_RDONLY)
+                self.processes[process.pid] = (process.ppid(), process.name(), fd)
+            except (OSError, psutil.NoSuchProcess) as e:
+                # the process exited in the meantime or we are not allowed to read it
+                # (smaps_rollup of other users' processes needs root)
+                if not isinstance(e, FileNotFoundError) and not isinstance(e, psutil.NoSuchProcess):
+                    print(f"Error: cannot read smaps_rollup of process {process.pid}: {e}")
+                continue
+        for pid in list(self.processes.keys()):
+            if pid not in alive:
+                self.remove(pid)
+        self.last_refresh = time.monotonic()
+
+    def remove(self, pid):
+        os.close(self.processes[pid][2])
+        del self.processes[pid]
+
+    def open(self):
+        self.refresh()
+
+    def close(self):
+        for pid in list(self.processes.keys()):
+            self.remove(pid)
+
+    def sample(self, now):
+        if time.monotonic() - self.last_refresh >= self.refresh_interval:
+            self.refresh()
+        total = {key: 0 for key in tree_memory_columns}
+        num_processes = 0
+        for pid, (ppid, name, fd) in list(self.processes.items()):
+            try:
+                raw = os.pread(fd, PROC_READ_SIZE, 0)
+            except OSError:
+                self.remove(pid)
+                continue
+            row = parse_smaps_rollup(raw)
+            for key in tree_memory_columns:
+                total[key] += row.get(key, 0)
+            num_processes += 1
+            row['Time'] = now
+            row['Pid'] = pid
+            row['PPid'] = ppid
+            row['Name'] = name
+            if not self.process_samples.is_full():
+                self.process_samples.append(row)
+        total['Time'] = now
+        total['Processes'] = num_processes
+        self.total_samples.append(total)
+        # exited processes are dropped from the tree, that does not stop sampling.
+        return True
+
+    def flush(self, con, identifiers, force=False):
+        # the per process buffer fills up faster than the total buffer, so
+        # both are always flushed together to keep them on the same timeline.
+        no_room = self.process_samples.size + len(self.processes) > self.process_samples.capacity
+        if force or no_room or self.process_samples.should_flush() or self.total_samples.should_flush():
+            self.process_samples.flush(con, identifiers)
+            self.total_samples.flush(con, identifiers)
+
+
+class MemorySampler(threading.Thread):
+    # Runs a set of collectors at a fixed interval from a thread inside the
+    # runner. Samples are buffered in columnar form and flushed in bulk
+    # whenever a buffer is full or flush_interval seconds have passed, and
+    # once on stop. Every sampled query gets a row in runs, the samples of all
+    # collectors only carry its run_id and the monotonic clock in ns. After the
+    # last flush a row with the wall time and the memory statistics of the run
+    # is written to query_summary.
+    def __init__(self, data_db, benchmark_name, benchmark, system, run, query, collectors, interval=DEFAULT_SAMPLE_INTERVAL, connections=1, memory_limit=0, threads=0):
+        threading.Thread.__init__(self, name=f"mem_sampler_{query}", daemon=True)
+        self._stop_event = threading.Event()
+        self.data_db = data_db
+        self.run_identifiers = [benchmark_name, benchmark, system, run, query]
+        self.run_id = None
+        self.identifiers = None
+        self.collectors = collectors
+        self.interval = interval
+        self.connections = connections
+        self.memory_limit = memory_limit
+        self.threads = threads
+        self.con = None
+        self.started = None
+
+    def sample(self, now=None):
+        if now is None:
+            now = time.monotonic_ns()
+        alive = True
+        for collector in self.collectors:
+            alive = collector.sample(now) and alive
+        return alive
+
+    def flush(self, force=False):
+        for collector in self.collectors:
+            collector.flush(self.con, self.identifiers, force)
+
+    def peak_rss(self):
+        peaks = [collector.peak_rss for collector in self.collectors if isinstance(collector, ProcessStatusCollector) and collector.peak_rss is not None]
+        return max(peaks) if len(peaks) > 0 else None
+
+    def start(self):
+        opened = []
+        for collector in self.collectors:
+            try:
+                collector.open()
+                opened.append(collector)
+            except FileNotFoundError as e:
+                print(f"seems like the process to sample no longer exists: {e}")
+        self.collectors = opened
+        if len(self.collectors) == 0:
+            return
+        self.con = duckdb.connect(self.data_db)
+        # take the first sample before the query starts so even very short
+        # queries have a start and an end point. the wall time starts at the
+        # same timestamp, so time_to_peak and wall_time share one origin.
+        self.started = time.monotonic_ns()
+        self.sample(self.started)
+        attributes = {}
+        for collector in self.collectors:
+            if isinstance(collector, ProcessStatusCollector) and collector.attributes is not None:
+                attributes = collector.attributes
+        self.run_id = register_run(self.con, *self.run_identifiers, self.connections, self.memory_limit, self.threads, attributes)
+        self.identifiers = [self.run_id]
+        threading.Thread.start(self)
+
+    def run(self):
+        next_sample = time.perf_counter() + self.interval
+        while not self._stop_event.wait(max(0, next_sample - time.perf_counter())):
+            if not self.sample():
+                break
+            self.flush()
+            next_sample += self.interval
+            # we fell behind (e.g. the GIL was busy), don't try to catch up with a burst of samples
+            if next_sample < time.perf_counter():
+                next_sample = time.perf_counter() + self.interval
+
+    def stop(self):
+        end = time.monotonic_ns()
+        wall_time = (end - self.started) / NS_PER_SECOND if self.started is not None else None
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+            self.flush()
+            self.sample()
+        for collector in self.collectors:
+            collector.close()
+        if self.con is not None:
+            self.flush(force=True)
+            write_query_summary(self.con, self.run_id, wall_time)
+            self.con.close()
+            self.con = None
+
+
+def create_memory_sampler(data_db, benchmark_name, benchmark, system, run, query, pid, interval=DEFAULT_SAMPLE_INTERVAL,
+                          mode='status', tree_roots=None, cgroup_path=None, connections=1, memory_limit=0, threads=0,
+                          spill_directories=[], cache_paths=[], cache_interval=DEFAULT_RESIDENCY_SCAN_INTERVAL, capacity=DEFAULT_CAPACITY, flush_interval=DEFAULT_FLUSH_INTERVAL, excluded_roots=[]):
+    # status mode samples /proc/<pid>/status of the engine process.
+    # tree mode additionally samples smaps_rollup of every process below tree_roots (default: pid),
+    # except the processes below excluded_roots.
+    # if the engine runs in its own cgroup, the memory counters of the cgroup are sampled as well.
+    # host wide memory, reclaim and swap counters and the page faults of the process are always sampled.
+    # the io of the process (of the whole tree in tree mode) and the size of the spill directories as well.
+    # the page cache residency of the database files (cache_paths) is scanned every cache_interval seconds.
+    if tree_roots is None:
+        tree_roots = [pid]
+    collectors = [ProcessStatusCollector(pid, capacity, flush_interval), ProcessFaultCollector(pid, capacity, flush_interval), HostMemoryCollector(capacity, flush_interval)]
+    if mode == 'tree':
+        collectors.append(ProcessTreeCollector(tree_roots, capacity, flush_interval, excluded_roots=excluded_roots))
+        collectors.append(ProcessIoCollector(tree_roots, True, capacity, flush_interval, excluded_roots=excluded_roots))
+    else:
+        collectors.append(ProcessIoCollector([pid], False, capacity, flush_interval))
+    if len(spill_directories) > 0:
+        collectors.append(SpillDirectoryCollector(spill_directories, capacity, flush_interval))
+    if len(cache_paths) > 0:
+        collectors.append(PageCacheCollector(cache_paths, capacity, flush_interval, cache_interval))
+    if cgroup_path is not None:
+        collectors.append(CgroupCollector(cgroup_path, capacity, flush_interval))
+    return MemorySampler(data_db, benchmark_name, benchmark, system, run, query, collectors, interval, connections, memory_limit, threads)
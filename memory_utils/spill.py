@@ -0,0 +1,73 @@
+import os
+import time
+
+from memory_utils.sample_buffer import SampleBuffer
+
+# walking a directory costs more than reading a /proc file, so spill directories are scanned less often than the sample interval
+DEFAULT_SPILL_SCAN_INTERVAL = 0.1
+
+spill_columns = [('Time', 'BIGINT'), ('Directory', 'VARCHAR'), ('Files', 'BIGINT'), ('Bytes', 'BIGINT')]
+
+
+def get_directory_size(path):
+    # number of files and allocated bytes below path. a directory that
+    # doesn't exist (yet) is empty.
+    files = 0
+    size = 0
+    try:
+        entries = os.scandir(path)
+    except FileNotFoundError:
+        return 0, 0
+    with entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    sub_files, sub_size = get_directory_size(entry.path)
+                    files += sub_files
+                    size += sub_size
+                elif entry.is_file(follow_symlinks=False):
+                    files += 1
+                    # allocated blocks, temp files may be sparse after blocks were freed
+                    size += entry.stat(follow_symlinks=False).st_blocks * 512
+            except OSError:
+                # the engine deleted the temp file while we were scanning
+                continue
+    return files, size
+
+
+class SpillDirectoryCollector():
+    # Samples the number of files and the allocated bytes of the directories
+    # an engine spills to (duckdb's <database>.tmp, postgres' pgsql_tmp) into
+    # spill_info, one row per directory and scan.
+    def __init__(self, directories, capacity, flush_interval, scan_interval=DEFAULT_SPILL_SCAN_INTERVAL):
+        self.directories = directories
+        self.scan_interval = scan_interval
+        self.last_scan = 0
+        self.samples = SampleBuffer('spill_info', spill_columns, capacity, flush_interval)
+
+    def open(self):
+        readable = []
+        for directory in self.directories:
+            try:
+                get_directory_size(directory)
+                readable.append(directory)
+            except PermissionError as e:
+                # pgsql_tmp belongs to the postgres user
+                print(f"Error: cannot read spill directory {directory}: {e}")
+        self.directories = readable
+
+    def close(self):
+        pass
+
+    def sample(self, now):
+        if time.monotonic() - self.last_scan < self.scan_interval:
+            return True
+        self.last_scan = time.monotonic()
+        for directory in self.directories:
+            files, size = get_directory_size(directory)
+            self.samples.append({'Time': now, 'Directory': directory, 'Files': files, 'Bytes': size})
+        return True
+
+    def flush(self, con, identifiers, force=False):
+        if force or self.samples.should_flush():
+            self.samples.flush(con, identifiers)
@@ -0,0 +1,31 @@
+# VmRSS is in kB. memory in query_summary is in kB as well, the area under the
+# curve in GB*s using the same 1000000 kB per GB as graph_utils/plot_summary.R
+KB_PER_GB = 1000000
+# Time of a sample is the monotonic clock in ns
+NS_PER_SECOND = 1000000000
+
+QUERY_SUMMARY_SQL = f"""
+INSERT INTO query_summary
+SELECT ?, ?,
+    max(VmRSS),
+    (arg_max("Time", VmRSS) - min("Time")) / {NS_PER_SECOND},
+    avg(VmRSS),
+    coalesce(sum(("Time" - previous_time) / {NS_PER_SECOND} * (VmRSS + previous_rss) / 2), 0) / {KB_PER_GB},
+    count(*),
+    max(RssAnon),
+    max(RssFile),
+    (SELECT sum(read_bytes) FROM proc_io_info WHERE run_id = ?),
+    (SELECT sum(write_bytes) FROM proc_io_info WHERE run_id = ?),
+    (SELECT max(Bytes) FROM (SELECT sum(Bytes) AS Bytes FROM spill_info WHERE run_id = ? GROUP BY "Time"))
+FROM (
+    SELECT "Time", VmRSS, RssAnon, RssFile,
+        lag("Time") OVER (ORDER BY "Time") AS previous_time,
+        lag(VmRSS) OVER (ORDER BY "Time") AS previous_rss
+    FROM samples
+    WHERE run_id = ?
+)
+"""
+
+
+def write_query_summary(con, run_id, wall_time):
+    con.execute(QUERY_SUMMARY_SQL, [run_id, wall_time, run_id, run_id, run_id, run_id])
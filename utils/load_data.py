@@ -0,0 +1,383 @@
+import argparse
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import duckdb
+
+# Loads the tables of a benchmark from its duckdb database into hyper and postgres.
+# Every table is exported once into chunks (csv or parquet) of --chunk_size_mb and
+# loaded by a pool of --workers, so the export of the next table overlaps the loads of
+# the tables before it. Every table is loaded in its own transaction on its own
+# connection, the state of every table is checkpointed in <export_dir>/load_checkpoints.duckdb,
+# so a load that was interrupted resumes with the tables that aren't done yet.
+
+LOAD_SYSTEMS = ['hyper', 'postgres']
+EXPORT_FORMATS = ['csv', 'parquet']
+DEFAULT_CHUNK_SIZE_MB = 1024
+DEFAULT_WORKERS = 4
+# chunks hyper reads with one COPY ... FROM ARRAY[...], hyperd parses the chunks of a COPY in parallel
+DEFAULT_HYPER_BATCH = 8
+DEFAULT_PROGRESS_INTERVAL = 10
+# bytes psycopg2 sends to the server per message of COPY FROM STDIN
+POSTGRES_COPY_BUFFER_SIZE = 1024 * 1024
+
+CHECKPOINT_SCHEMA = """
+create table if not exists load_checkpoints(
+	target VARCHAR, -- export, hyper or postgres
+	table_name VARCHAR,
+	status VARCHAR, -- running, done, failed or deleted (export only, the chunks were removed with --delete_export)
+	rows BIGINT, -- rows in the source (export) or the loaded table
+	bytes BIGINT, -- size of the chunks of the table
+	chunks BIGINT,
+	started DOUBLE,
+	finished DOUBLE,
+	error VARCHAR,
+	PRIMARY KEY (target, table_name)
+);
+"""
+
+
+class LoadCheckpoints():
+    # state of the export and of the load of every table into every system.
+    # the load threads update it concurrently, the connection isn't shared.
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.con = duckdb.connect(path)
+        self.con.execute(CHECKPOINT_SCHEMA)
+
+    def get(self, target, table):
+        # (status, rows, bytes, chunks) or None if the table wasn't started
+        with self.lock:
+            return self.con.execute("SELECT status, rows, bytes, chunks FROM load_checkpoints WHERE target = ? AND table_name = ?", [target, table]).fetchone()
+
+    def is_done(self, target, table):
+        checkpoint = self.get(target, table)
+        return checkpoint is not None and checkpoint[0] == 'done'
+
+    def start(self, target, table):
+        with self.lock:
+            self.con.execute("INSERT OR REPLACE INTO load_checkpoints VALUES (?, ?, 'running', NULL, NULL, NULL, ?, NULL, NULL)", [target, table, time.time()])
+
+    def finish(self, target, table, rows, size, chunks):
+        with self.lock:
+            self.con.execute("UPDATE load_checkpoints SET status = 'done', rows = ?, bytes = ?, chunks = ?, finished = ? WHERE target = ? AND table_name = ?",
+                             [rows, size, chunks, time.time(), target, table])
+
+    def fail(self, target, table, error):
+        with self.lock:
+            self.con.execute("UPDATE load_checkpoints SET status = 'failed', finished = ?, error = ? WHERE target = ? AND table_name = ?", [time.time(), error, target, table])
+
+    def set_status(self, target, table, status):
+        with self.lock:
+            self.con.execute("UPDATE load_checkpoints SET status = ? WHERE target = ? AND table_name = ?", [status, target, table])
+
+    def show(self):
+        with self.lock:
+            self.con.sql("""SELECT target, table_name, status, rows, round(bytes / 1e9, 2) AS gb, chunks, round(finished - started, 1) AS seconds,
+                            round(rows / (finished - started)) AS rows_per_second, round(bytes / 1e6 / (finished - started), 1) AS mb_per_second, error
+                            FROM load_checkpoints ORDER BY target, bytes DESC NULLS LAST""").show(max_rows=1000)
+
+    def close(self):
+        self.con.close()
+
+
+class LoadProgress(threading.Thread):
+    # prints the tables and bytes every system has loaded and the throughput
+    # since the last and since the first report every interval seconds
+    def __init__(self, systems, interval):
+        threading.Thread.__init__(self, name="load_progress", daemon=True)
+        self._stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.interval = interval
+        self.start_time = time.monotonic()
+        self.tables = {system: 0 for system in systems}
+        self.tables_done = {system: 0 for system in systems}
+        self.expected_bytes = {system: 0 for system in systems}
+        self.loaded_bytes = {system: 0 for system in systems}
+        self.last_bytes = {system: 0 for system in systems}
+
+    def add_table(self, system, size):
+        with self.lock:
+            self.tables[system] += 1
+            self.expected_bytes[system] += size
+
+    def add_bytes(self, system, size):
+        with self.lock:
+            self.loaded_bytes[system] += size
+
+    def finish_table(self, system):
+        with self.lock:
+            self.tables_done[system] += 1
+
+    def stop(self):
+        self._stop_event.set()
+
+    def report(self, elapsed_since_report):
+        elapsed = time.monotonic() - self.start_time
+        with self.lock:
+            for system in self.tables:
+                loaded = self.loaded_bytes[system]
+                print(f"{system}: {self.tables_done[system]}/{self.tables[system]} tables, {loaded / 1e9:.2f}/{self.expected_bytes[system] / 1e9:.2f}GB, "
+                      f"{(loaded - self.last_bytes[system]) / 1e6 / elapsed_since_report:.1f}MB/s ({loaded / 1e6 / elapsed:.1f}MB/s since the start)")
+                self.last_bytes[system] = loaded
+
+    def run(self):
+        last_report = time.monotonic()
+        while not self._stop_event.wait(self.interval):
+            now = time.monotonic()
+            self.report(now - last_report)
+            last_report = now
+
+
+class ProgressReader():
+    # file wrapper for copy_expert that counts the bytes sent to postgres
+    def __init__(self, file, progress, system):
+        self.file = file
+        self.progress = progress
+        self.system = system
+
+    def read(self, size=-1):
+        data = self.file.read(size)
+        self.progress.add_bytes(self.system, len(data))
+        return data
+
+    def readline(self, size=-1):
+        data = self.file.readline(size)
+        self.progress.add_bytes(self.system, len(data))
+        return data
+
+
+def get_table_statements(benchmark, system, source):
+    # the DROP and CREATE statements of every table of tpch/<benchmark>-schema.sql by (lower case) table name.
+    # every table is recreated in the transaction that loads it, so a resumed load doesn't drop the tables that are done.
+    if not os.path.isfile(f"tpch/{benchmark}-schema.sql"):
+        return get_source_table_statements(source)
+    with open(f"tpch/{benchmark}-schema.sql", 'r') as file:
+        schema = file.read()
+    if system == 'postgres':
+        # hyper only. postgres would build an index during the load
+        schema = schema.replace("ASSUMED PRIMARY KEY", "")
+    statements = {}
+    for statement in schema.split(";"):
+        match = re.search(r'(?:DROP TABLE IF EXISTS|CREATE TABLE)\s+(\w+)', statement, re.IGNORECASE)
+        if match is None:
+            continue
+        statements.setdefault(match.group(1).lower(), []).append(statement.strip())
+    return statements
+
+
+def get_source_table_statements(source):
+    # benchmarks without a schema file (e.g. synthetic) get the tables of the source with their duckdb types
+    statements = {}
+    columns = source.execute("""SELECT table_name, list(column_name || ' ' || data_type ORDER BY column_index) FROM duckdb_columns()
+                                WHERE schema_name = 'main' GROUP BY table_name""").fetchall()
+    for table, definitions in columns:
+        definitions = [re.sub(r' DOUBLE$', ' DOUBLE PRECISION', definition) for definition in definitions]
+        statements[table] = [f"DROP TABLE IF EXISTS {table} CASCADE", f"CREATE TABLE {table} ({', '.join(definitions)})"]
+    return statements
+
+
+def get_source_tables(source):
+    # largest tables first, so the long loads start early and the small tables fill the gaps at the end
+    return [row[0] for row in source.execute("SELECT table_name FROM duckdb_tables() WHERE schema_name = 'main' ORDER BY estimated_size DESC").fetchall()]
+
+
+def get_chunks(directory):
+    # data_0.csv, data_1.csv, ... in the order duckdb wrote them
+    chunks = [name for name in os.listdir(directory) if name.startswith('data_')]
+    chunks.sort(key=lambda name: int(re.search(r'data_(\d+)', name).group(1)))
+    return [os.path.abspath(os.path.join(directory, name)) for name in chunks]
+
+
+def export_table(source, table, directory, export_format, chunk_size, checkpoints):
+    # writes table into chunks of about chunk_size bytes, returns the chunks and the rows of the table
+    checkpoint = checkpoints.get('export', table)
+    if checkpoint is not None and checkpoint[0] == 'done' and os.path.isdir(directory):
+        return get_chunks(directory), checkpoint[1]
+    checkpoints.start('export', table)
+    shutil.rmtree(directory, ignore_errors=True)
+    options = f"FORMAT {export_format}, FILE_SIZE_BYTES {chunk_size}"
+    if export_format == 'csv':
+        options += ", HEADER 1"
+    start = time.perf_counter()
+    source.execute(f"COPY \"{table}\" TO '{directory}' ({options})")
+    rows = source.execute(f"SELECT count(*) FROM \"{table}\"").fetchone()[0]
+    chunks = get_chunks(directory)
+    size = sum([os.path.getsize(chunk) for chunk in chunks])
+    checkpoints.finish('export', table, rows, size, len(chunks))
+    print(f"exported {table}: {rows} rows, {len(chunks)} chunks, {size / 1e9:.2f}GB in {time.perf_counter() - start:.1f}s")
+    return chunks, rows
+
+
+def load_hyper_table(endpoint, database, table, statements, chunks, export_format, batch, progress):
+    # one connection per table. the chunks are copied in batches, hyperd reads
+    # the files of a batch in parallel. returns the rows of the loaded table.
+    from tableauhyperapi import Connection
+    with Connection(endpoint, database) as con:
+        con.execute_command("START TRANSACTION")
+        for statement in statements:
+            con.execute_command(statement)
+        header = ", HEADER 1" if export_format == 'csv' else ""
+        for i in range(0, len(chunks), batch):
+            files = ", ".join([f"'{chunk}'" for chunk in chunks[i:i + batch]])
+            con.execute_command(f"COPY \"{table}\" FROM ARRAY[{files}] WITH (FORMAT {export_format}{header})")
+            progress.add_bytes('hyper', sum([os.path.getsize(chunk) for chunk in chunks[i:i + batch]]))
+        rows = con.execute_scalar_query(f"SELECT count(*) FROM \"{table}\"")
+        con.execute_command("COMMIT")
+        return rows
+
+
+def load_postgres_table(args, table, statements, chunks, progress):
+    # one connection per table, the chunks are streamed with COPY FROM STDIN, so
+    # the server doesn't have to be able to read the export directory.
+    # returns the rows of the loaded table.
+    import psycopg2
+    con = psycopg2.connect(database=args.postgres_database, user=args.postgres_user, password=args.postgres_password, host=args.postgres_host, port=args.postgres_port)
+    try:
+        cursor = con.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        for chunk in chunks:
+            with open(chunk, 'rb') as file:
+                cursor.copy_expert(f"COPY {table} FROM STDIN WITH (FORMAT CSV, HEADER true)", ProgressReader(file, progress, 'postgres'), size=POSTGRES_COPY_BUFFER_SIZE)
+        cursor.execute(f"SELECT count(*) FROM {table}")
+        rows = cursor.fetchone()[0]
+        con.commit()
+        return rows
+    except Exception:
+        con.rollback()
+        raise
+    finally:
+        con.close()
+
+
+def load_table(system, table, statements, chunks, expected_rows, args, hyper_endpoint, checkpoints, progress):
+    checkpoints.start(system, table)
+    start = time.perf_counter()
+    try:
+        if system == 'hyper':
+            rows = load_hyper_table(hyper_endpoint, args.hyper_database, table, statements, chunks, args.format, args.hyper_batch, progress)
+        else:
+            rows = load_postgres_table(args, table, statements, chunks, progress)
+        if rows != expected_rows:
+            raise ValueError(f"{table} has {rows} rows in {system}, but {expected_rows} in {args.source}")
+    except Exception as e:
+        print(f"Error: loading {table} into {system} failed: {e}")
+        checkpoints.fail(system, table, str(e))
+        return False
+    size = sum([os.path.getsize(chunk) for chunk in chunks])
+    runtime = time.perf_counter() - start
+    checkpoints.finish(system, table, rows, size, len(chunks))
+    progress.finish_table(system)
+    print(f"loaded {table} into {system}: {rows} rows in {runtime:.1f}s, {rows / runtime:.0f} rows/s, {size / 1e6 / runtime:.1f}MB/s")
+    return True
+
+
+def start_hyper(database):
+    # hyperd runs as long as the load, the database is created if it doesn't exist
+    from tableauhyperapi import HyperProcess, Telemetry, Connection, CreateMode
+    hyper = HyperProcess(telemetry=Telemetry.DO_NOT_SEND_USAGE_DATA_TO_TABLEAU, parameters={"default_database_version": "2"})
+    with Connection(hyper.endpoint, database, CreateMode.CREATE_IF_NOT_EXISTS):
+        pass
+    return hyper
+
+
+def main(args):
+    systems = args.systems.split(",")
+    os.makedirs(args.export_dir, exist_ok=True)
+    checkpoints = LoadCheckpoints(os.path.join(args.export_dir, "load_checkpoints.duckdb"))
+    source = duckdb.connect(args.source, read_only=True)
+    tables = get_source_tables(source)
+    statements = {system: get_table_statements(args.benchmark, system, source) for system in systems}
+    for table in tables:
+        if table not in statements[systems[0]]:
+            print(f"{table} is not in tpch/{args.benchmark}-schema.sql, skipping it")
+    tables = [table for table in tables if table in statements[systems[0]]]
+
+    hyper = start_hyper(args.hyper_database) if 'hyper' in systems else None
+    progress = LoadProgress(systems, args.progress_interval)
+    progress.start()
+    executor = ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="load")
+    loads = {}
+    start = time.perf_counter()
+    try:
+        for table in tables:
+            targets = [system for system in systems if not checkpoints.is_done(system, table)]
+            if len(targets) == 0:
+                print(f"{table} is already loaded into {systems}, skipping it")
+                continue
+            chunks, rows = export_table(source, table, os.path.join(args.export_dir, table), args.format, args.chunk_size_mb * 1024 * 1024, checkpoints)
+            size = sum([os.path.getsize(chunk) for chunk in chunks])
+            for system in targets:
+                progress.add_table(system, size)
+                loads[(system, table)] = executor.submit(load_table, system, table, statements[system][table], chunks, rows, args, hyper.endpoint if hyper is not None else None, checkpoints, progress)
+        executor.shutdown(wait=True)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        progress.stop()
+        source.close()
+        if hyper is not None:
+            hyper.close()
+
+    failed = [key for key, load in loads.items() if not load.result()]
+    if args.delete_export:
+        for table in tables:
+            if all([checkpoints.is_done(system, table) for system in systems]) and checkpoints.is_done('export', table):
+                shutil.rmtree(os.path.join(args.export_dir, table), ignore_errors=True)
+                checkpoints.set_status('export', table, 'deleted')
+    checkpoints.show()
+    checkpoints.close()
+    print(f"loading {args.benchmark} took {time.perf_counter() - start:.1f}s")
+    if len(failed) > 0:
+        print(f"Error: {len(failed)} loads failed: {failed}. run the same command again to retry them")
+        exit(1)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='export a benchmark from duckdb once and load it into hyper and postgres in parallel')
+    parser.add_argument('--benchmark', type=str, help='tpch, tpcds or synthetic. the tables of benchmarks without tpch/<benchmark>-schema.sql are created like in the source', default='tpch')
+    parser.add_argument('--source', type=str, help='duckdb database the data is exported from. default <benchmark>-sf100.duckdb')
+    parser.add_argument('--systems', type=str, help=f'comma separated systems to load into, of {LOAD_SYSTEMS}', default='hyper')
+    parser.add_argument('--export_dir', type=str, help='directory of the exported chunks and the checkpoints. default <benchmark>-export')
+    parser.add_argument('--format', type=str, help=f'format of the exported chunks, one of {EXPORT_FORMATS}. postgres can only load csv', default='csv')
+    parser.add_argument('--chunk_size_mb', type=int, help='size of the exported chunks', default=DEFAULT_CHUNK_SIZE_MB)
+    parser.add_argument('--workers', type=int, help='tables that are loaded at the same time', default=DEFAULT_WORKERS)
+    parser.add_argument('--hyper_database', type=str, help='hyper database to load into. default <benchmark>-sf100.hyper')
+    parser.add_argument('--hyper_batch', type=int, help='chunks hyper loads with one COPY', default=DEFAULT_HYPER_BATCH)
+    parser.add_argument('--postgres_database', type=str, help='postgres database to load into. default <benchmark>')
+    parser.add_argument('--postgres_host', type=str, help='host of the postgres server', default='localhost')
+    parser.add_argument('--postgres_port', type=int, help='port of the postgres server', default=5432)
+    parser.add_argument('--postgres_user', type=str, help='postgres user', default='postgres')
+    parser.add_argument('--postgres_password', type=str, help='password of the postgres user. defaults to PGPASSWORD or ~/.pgpass')
+    parser.add_argument('--progress_interval', type=int, help='seconds between two progress reports', default=DEFAULT_PROGRESS_INTERVAL)
+    parser.add_argument('--delete_export', action='store_true', help='delete the chunks of a table once it is loaded into all systems')
+    args = parser.parse_args()
+
+    if args.benchmark not in ['tpch', 'tpcds', 'synthetic']:
+        print("benchmark must be tpch, tpcds or synthetic")
+        exit(1)
+    for system in args.systems.split(","):
+        if system not in LOAD_SYSTEMS:
+            print(f"systems must be of {LOAD_SYSTEMS}")
+            exit(1)
+    if args.format not in EXPORT_FORMATS:
+        print(f"format must be one of {EXPORT_FORMATS}")
+        exit(1)
+    if args.format == 'parquet' and 'postgres' in args.systems.split(","):
+        print("postgres can't load parquet, use --format=csv")
+        exit(1)
+    if args.workers < 1 or args.hyper_batch < 1 or args.chunk_size_mb < 1:
+        print("workers, hyper_batch and chunk_size_mb must be at least 1")
+        exit(1)
+    if args.source is None:
+        args.source = f"{args.benchmark}-sf100.duckdb"
+    if args.export_dir is None:
+        args.export_dir = f"{args.benchmark}-export"
+    if args.hyper_database is None:
+        args.hyper_database = f"{args.benchmark}-sf100.hyper"
+    if args.postgres_database is None:
+        args.postgres_database = args.benchmark
+    main(args)